@@ -1,36 +1,36 @@
 #!/usr/bin/env python
 """
-Import data from JSON fixture into production database
-Run this on Railway after uploading data_export.json
+Import data from an export file into the production database.
+Run this on Railway after uploading data_export.jsonl (or data_export.json).
+
+Thin wrapper around `python manage.py import_data`; any arguments are passed
+through. Re-running is safe: existing gangs, cases, users, etc. are matched by
+natural key and updated instead of duplicated, and an interrupted import
+resumes from its last checkpoint.
 """
 import os
+import sys
 import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sa_doj.settings')
 django.setup()
 
 from django.core.management import call_command
+from intelligence.datafiles import default_source
 from intelligence.models import Gang
 
-print("Importing data into production database...")
+args = sys.argv[1:]
+if not args:
+    args = [default_source()]
 
-# Check if data already exists
-existing_gangs = Gang.objects.count()
-if existing_gangs > 0:
-    print(f"Database already has {existing_gangs} gangs. Skipping import to avoid duplicates.")
-    print("If you want to re-import, clear the database first.")
-else:
-    try:
-        # Load the data
-        call_command('loaddata', 'data_export.json', verbosity=2)
-        print("\nData import completed successfully!")
-        
-        # Verify
-        gangs = Gang.objects.count()
-        print(f"Verification: {gangs} gangs now in database")
-        
-    except Exception as e:
-        print(f"Error importing data: {e}")
-        import traceback
-        traceback.print_exc()
+print(f"Importing {args[0]} into production database...")
 
+try:
+    call_command('import_data', *args)
+    print("\nData import completed successfully!")
+    print(f"Verification: {Gang.objects.count()} gangs now in database")
+except Exception as e:
+    print(f"Error importing data: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
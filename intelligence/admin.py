@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Gang, GangMember, Incident, GangRelationship, CaseFile
+from .models import (
+    Gang, GangMember, Incident, GangRelationship, CaseFile, GangStats, IncidentBucket, MemberCentrality,
+    Hotspot, HotspotRun, Job,
+)
 
 
 @admin.register(Gang)
@@ -37,3 +40,51 @@ class CaseFileAdmin(admin.ModelAdmin):
     search_fields = ['case_number', 'title']
     date_hierarchy = 'opened_date'
 
+
+@admin.register(GangStats)
+class GangStatsAdmin(admin.ModelAdmin):
+    list_display = ['gang', 'active_member_count', 'incident_count', 'open_case_count', 'last_incident_at']
+    readonly_fields = [
+        'gang', 'active_member_count', 'incident_count', 'incidents_by_type',
+        'incidents_by_severity', 'last_incident_at', 'open_case_count', 'updated_at',
+    ]
+
+
+@admin.register(IncidentBucket)
+class IncidentBucketAdmin(admin.ModelAdmin):
+    list_display = ['bucket_start', 'granularity', 'incident_type', 'severity', 'gang', 'count']
+    list_filter = ['granularity', 'incident_type', 'severity']
+    date_hierarchy = 'bucket_start'
+    readonly_fields = ['granularity', 'bucket_start', 'incident_type', 'severity', 'gang', 'count']
+
+
+@admin.register(MemberCentrality)
+class MemberCentralityAdmin(admin.ModelAdmin):
+    list_display = ['member', 'key_player_score', 'degree', 'betweenness', 'pagerank', 'computed_at']
+    readonly_fields = [
+        'member', 'degree', 'weighted_degree', 'betweenness', 'pagerank', 'key_player_score', 'computed_at',
+    ]
+
+
+@admin.register(Hotspot)
+class HotspotAdmin(admin.ModelAdmin):
+    list_display = ['rank', 'score', 'incident_count', 'center_x', 'center_y', 'computed_at']
+    readonly_fields = [
+        'rank', 'score', 'peak_density', 'incident_count', 'center_x', 'center_y', 'polygon',
+        'window_start', 'window_end', 'computed_at',
+    ]
+
+
+@admin.register(HotspotRun)
+class HotspotRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'cell_size', 'window_days', 'days_rebinned', 'hotspot_count']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'key', 'status', 'attempts', 'run_after', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['key']
+    readonly_fields = [
+        'kind', 'key', 'payload', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at',
+    ]
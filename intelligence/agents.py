@@ -0,0 +1,106 @@
+"""
+Sign-in of DOJ agents, hashing the passcode at most once per attempt.
+
+Password hashing (PBKDF2 with Django's default iteration count) is the
+whole cost of a login, so each path below does it no more than once:
+
+- Quick access (doj_agent, doj_agent2, ...) with the shared passcode is
+  recognised by comparing strings and needs no hash at all. The account is
+  created on first use, with its password hashed once for the admin and
+  the regular path, and afterwards only written when its flags had been
+  changed.
+- Any other agent ID is resolved to one account, the exact username first
+  and then a case-insensitive match, and that account's password is
+  checked once. An unknown ID hashes the passcode anyway, so response
+  times do not reveal which IDs exist. Before that, the attempt has to get
+  past the client IP's and the agent ID's throttling buckets (see
+  throttle.py), which refuse a burst of attempts without hashing.
+"""
+import hmac
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+
+from . import throttle
+
+
+QUICK_ACCESS_PREFIX = 'doj_agent'
+QUICK_ACCESS_PASSCODE = 'agent123'
+QUICK_ACCESS_FLAGS = ('is_staff', 'is_superuser', 'is_active')
+
+
+class LoginFailed(Exception):
+    """A sign-in attempt was refused; the message is shown to the agent"""
+
+
+class LoginThrottled(LoginFailed):
+    """Refused without checking the passcode, for too many recent attempts"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Too many sign-in attempts. Try again in {retry_after} seconds.')
+        self.retry_after = retry_after
+
+
+def is_quick_access(agent_id, passcode):
+    return (
+        agent_id.lower().startswith(QUICK_ACCESS_PREFIX)
+        and hmac.compare_digest(passcode.encode(), QUICK_ACCESS_PASSCODE.encode())
+    )
+
+
+def quick_access_agent(agent_id):
+    """The shared agent account for this ID, created or repaired as needed"""
+    username = agent_id.lower()
+    user, created = User.objects.get_or_create(
+        username=username,
+        defaults={
+            'email': f'{username}@doj.com',
+            # Callable, so the passcode is only hashed when the account is created
+            'password': lambda: make_password(QUICK_ACCESS_PASSCODE),
+            **{flag: True for flag in QUICK_ACCESS_FLAGS},
+        },
+    )
+    changed = [flag for flag in QUICK_ACCESS_FLAGS if not getattr(user, flag)]
+    if not created and not user.has_usable_password():
+        user.set_password(QUICK_ACCESS_PASSCODE)
+        changed.append('password')
+    if changed:
+        for flag in QUICK_ACCESS_FLAGS:
+            setattr(user, flag, True)
+        user.save(update_fields=changed)
+    return user
+
+
+def find_agent(agent_id):
+    """The account an agent ID names: the exact username, else a unique case-insensitive match"""
+    candidates = list(User.objects.filter(username__iexact=agent_id)[:10])
+    exact = [user for user in candidates if user.username == agent_id]
+    if exact:
+        return exact[0]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def authenticate_agent(request, agent_id, passcode):
+    """The active account the credentials sign in to; raises LoginFailed otherwise"""
+    if is_quick_access(agent_id, passcode):
+        return quick_access_agent(agent_id)
+
+    try:
+        throttle.check(request, agent_id)
+    except throttle.Throttled as e:
+        raise LoginThrottled(e.retry_after)
+    user = find_agent(agent_id)
+    if user is None:
+        # Same cost as a real check
+        make_password(passcode)
+        valid = False
+    else:
+        # Also upgrades a hash made with older hasher settings, its only write
+        valid = user.check_password(passcode)
+    if not valid:
+        user_login_failed.send(sender=__name__, credentials={'username': agent_id}, request=request)
+        raise LoginFailed('Invalid credentials. Access Denied.')
+    if not user.is_active:
+        raise LoginFailed('Account is inactive.')
+    return user
@@ -0,0 +1,120 @@
+"""
+In-memory graph of gang relationships.
+
+Loads every GangRelationship (one row per pair, see RelationshipQuerySet)
+into a pair map for O(1) "how do A and B stand" lookups and per-gang
+adjacency, then derives:
+
+- allied blocs: connected groups of gangs linked by ALLIED relationships
+- war clusters: connected groups of gangs linked by WAR relationships
+- conflict candidates: "enemy of my ally" pairs, i.e. gangs A and C with no
+  recorded hostility where an ally of A is a rival of, or at war with, C
+
+Derived views are computed once per loaded graph. The graph is cached per
+process and reloaded in every worker when a relationship is saved or
+deleted, which bumps a generation kept in the DataVersion table.
+"""
+import threading
+from functools import cached_property
+
+from . import versions
+from .models import GangRelationship, canonical_pair
+
+
+HOSTILE_TYPES = ('RIVAL', 'WAR')
+GENERATION_KEY = 'alliances:generation'
+
+_lock = threading.Lock()
+_state = {'graph': None, 'generation': None}
+
+
+class AllianceGraph:
+    """Relationship types keyed by canonical gang pair, plus per-gang adjacency"""
+
+    def __init__(self, rows):
+        # rows: iterable of (gang_1_id, gang_2_id, relationship_type)
+        self.pairs = {}
+        self.adjacent = {}
+        for gang_1, gang_2, relationship_type in rows:
+            self.pairs[canonical_pair(gang_1, gang_2)] = relationship_type
+            self.adjacent.setdefault(gang_1, {})[gang_2] = relationship_type
+            self.adjacent.setdefault(gang_2, {})[gang_1] = relationship_type
+
+    @classmethod
+    def from_database(cls):
+        return cls(GangRelationship.objects.values_list('gang_1_id', 'gang_2_id', 'relationship_type'))
+
+    def relation(self, gang_a, gang_b):
+        """Relationship type between two gangs in either order, or None"""
+        return self.pairs.get(canonical_pair(gang_a, gang_b))
+
+    def partners(self, gang, *types):
+        return {other for other, kind in self.adjacent.get(gang, {}).items() if kind in types}
+
+    def _components(self, *types):
+        seen = set()
+        found = []
+        for start in sorted(self.adjacent):
+            if start in seen or not self.partners(start, *types):
+                continue
+            component = {start}
+            stack = [start]
+            while stack:
+                for other in self.partners(stack.pop(), *types):
+                    if other not in component:
+                        component.add(other)
+                        stack.append(other)
+            seen |= component
+            found.append(component)
+        found.sort(key=lambda gangs: (-len(gangs), min(gangs)))
+        return found
+
+    @cached_property
+    def allied_blocs(self):
+        """Groups of two or more gangs connected through alliances, largest first"""
+        return self._components('ALLIED')
+
+    @cached_property
+    def war_clusters(self):
+        """Groups of two or more gangs connected through open wars, largest first"""
+        return self._components('WAR')
+
+    @cached_property
+    def conflict_candidates(self):
+        """
+        "Enemy of my ally" pairs that are not already hostile, most bridging allies first.
+
+        Each entry is {'gangs': (a, c), 'via': [allies], 'current': type or None}.
+        """
+        candidates = {}
+        for gang in sorted(self.adjacent):
+            for ally in self.partners(gang, 'ALLIED'):
+                for enemy in self.partners(ally, *HOSTILE_TYPES):
+                    if enemy == gang or self.relation(gang, enemy) in HOSTILE_TYPES:
+                        continue
+                    candidates.setdefault(canonical_pair(gang, enemy), set()).add(ally)
+        return sorted(
+            (
+                {'gangs': pair, 'via': sorted(via), 'current': self.pairs.get(pair)}
+                for pair, via in candidates.items()
+            ),
+            key=lambda candidate: (-len(candidate['via']), candidate['gangs']),
+        )
+
+
+def get_alliance_graph():
+    """The process-wide relationship graph, reloaded after any relationship change"""
+    generation = versions.current_keys(GENERATION_KEY)[0]
+    graph = _state['graph']
+    if graph is not None and _state['generation'] == generation:
+        return graph
+    with _lock:
+        if _state['graph'] is None or _state['generation'] != generation:
+            _state['graph'] = AllianceGraph.from_database()
+            _state['generation'] = generation
+        return _state['graph']
+
+
+def invalidate():
+    """Reload the graph in every process once the surrounding transaction commits"""
+    versions.bump_keys([GENERATION_KEY])
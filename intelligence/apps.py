@@ -6,3 +6,9 @@ class IntelligenceConfig(AppConfig):
     name = 'intelligence'
     verbose_name = 'Gang Intelligence System'
 
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals  # noqa: F401
+        from .search import repair_after_migrate
+        post_migrate.connect(repair_after_migrate, sender=self)
@@ -0,0 +1,140 @@
+"""
+In-memory prefix index behind the autocomplete endpoint.
+
+Each process keeps, per result type, sorted arrays of search terms (each
+name, alias and tag, plus the inner words of each) with the record each term
+points at. A lookup is
+a bisect to the first term carrying the prefix followed by a scan that stops
+after `limit` distinct records, so its cost does not grow with the roster.
+
+The index is built on first use and rebuilt whenever a gang or member name
+changes (signals, bulk writes): the write bumps a generation kept in the
+DataVersion table, which every worker process checks before a lookup.
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from . import versions
+from .models import Gang, GangMember
+
+
+GENERATION_KEY = 'autocomplete:generation'
+MAX_RESULTS = 25
+KINDS = ('member', 'gang')
+
+_lock = threading.Lock()
+_state = {'index': None, 'generation': None}
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').casefold()))
+
+
+def split_terms(*values):
+    """
+    Terms for the given values: the whole normalised value ("head") and each
+    inner word suffix ("tail"), so "holl" finds "Daron Holland"
+    """
+    heads, tails = set(), set()
+    for value in values:
+        words = normalize(value).split()
+        if words:
+            heads.add(' '.join(words))
+            tails.update(' '.join(words[start:]) for start in range(1, len(words)))
+    return heads, tails - heads
+
+
+class PrefixIndex:
+    """Sorted (term, id) arrays per result type, searched with bisect"""
+
+    def __init__(self, records):
+        # records: iterable of (kind, id, searchable values, result dict)
+        self.results = {}
+        heads = {kind: [] for kind in KINDS}
+        tails = {kind: [] for kind in KINDS}
+        for kind, pk, values, result in records:
+            self.results[(kind, pk)] = result
+            head_terms, tail_terms = split_terms(*values)
+            heads[kind].extend((term, pk) for term in head_terms)
+            tails[kind].extend((term, pk) for term in tail_terms)
+        # Matches at the start of a name, alias or tag rank ahead of inner words
+        self.tiers = [self._arrays(heads), self._arrays(tails)]
+
+    @staticmethod
+    def _arrays(entries):
+        arrays = {}
+        for kind, rows in entries.items():
+            rows.sort()
+            arrays[kind] = ([term for term, _ in rows], [pk for _, pk in rows])
+        return arrays
+
+    def lookup(self, prefix, kinds=KINDS, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        for tier in self.tiers:
+            matches = []
+            for kind in kinds:
+                terms, ids = tier[kind]
+                position = bisect_left(terms, prefix)
+                taken = 0
+                while position < len(terms) and taken < limit and terms[position].startswith(prefix):
+                    key = (kind, ids[position])
+                    if key not in seen:
+                        seen.add(key)
+                        matches.append((terms[position], key))
+                        taken += 1
+                    position += 1
+            matches.sort()
+            found.extend(key for _, key in matches)
+            if len(found) >= limit:
+                break
+        return [self.results[key] for key in found[:limit]]
+
+
+def build_index():
+    """Read every member and gang name into a fresh PrefixIndex (two queries)"""
+    records = []
+    for pk, name, alias, gang_tag, status in GangMember.objects.values_list(
+        'id', 'name', 'alias', 'gang__tag', 'status'
+    ):
+        records.append(('member', pk, (name, alias), {
+            'type': 'member',
+            'id': pk,
+            'label': name,
+            'detail': ' · '.join(part for part in (f'"{alias}"' if alias else '', gang_tag, status) if part),
+        }))
+    for pk, name, tag in Gang.objects.values_list('id', 'name', 'tag'):
+        records.append(('gang', pk, (name, tag), {
+            'type': 'gang',
+            'id': pk,
+            'label': name,
+            'detail': tag,
+        }))
+    return PrefixIndex(records)
+
+
+def get_index():
+    """The process-wide index, rebuilt if it was invalidated here or elsewhere"""
+    generation = versions.current_keys(GENERATION_KEY)[0]
+    index = _state['index']
+    if index is not None and _state['generation'] == generation:
+        return index
+    with _lock:
+        if _state['index'] is None or _state['generation'] != generation:
+            _state['index'] = build_index()
+            _state['generation'] = generation
+        return _state['index']
+
+
+def lookup(prefix, kinds=None, limit=10):
+    kinds = [kind for kind in (kinds or KINDS) if kind in KINDS]
+    return get_index().lookup(prefix, kinds, max(1, min(limit, MAX_RESULTS)))
+
+
+def invalidate():
+    """Rebuild the index in every process once the surrounding transaction commits"""
+    versions.bump_keys([GENERATION_KEY])
@@ -0,0 +1,334 @@
+"""
+Batch create/update for the bulk JSON API endpoints.
+
+A batch is a list of item dicts. Items with an "id" update that record, the
+rest create new ones. Every item is validated before anything is written;
+the writes then happen in one transaction using bulk_create/bulk_update,
+with M2M links inserted straight into the through tables.
+
+Bulk writes bypass model signals, so the dashboard counters are marked stale,
+the affected gang rollups and incident trend buckets are refreshed, and the
+autocomplete index, associate graph, spatial index and map tiles are updated
+explicitly.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import autocomplete, graph, rollups, spatial, stats, tiles, trends, versions
+from .models import Gang, GangMember, Incident
+
+
+class BulkValidationError(Exception):
+    """Raised with per-item errors when any item in a batch is invalid"""
+
+    def __init__(self, errors):
+        super().__init__('Validation failed')
+        self.errors = errors
+
+
+class BulkSpec:
+    """Describes which request keys map onto a model for bulk writes"""
+
+    def __init__(self, model, fields, required=(), datetime_fields=(), coordinate_fields=(),
+                 foreign_keys=None, many_to_many=None):
+        self.model = model
+        self.fields = fields                        # field name -> default used on create
+        self.required = required                    # must be non-empty on create
+        self.datetime_fields = datetime_fields      # ISO 8601 strings
+        self.coordinate_fields = coordinate_fields  # map coordinates: numbers, or null to clear
+        self.foreign_keys = foreign_keys or {}      # request key -> related model
+        self.many_to_many = many_to_many or {}      # request key -> (m2m field name, related model)
+
+    def choices(self, field_name):
+        field = self.model._meta.get_field(field_name)
+        return {value for value, _ in field.choices} if field.choices else None
+
+
+INCIDENT_SPEC = BulkSpec(
+    Incident,
+    fields={
+        'title': '',
+        'incident_type': 'OTHER',
+        'location': '',
+        'description': '',
+        'severity': 'MEDIUM',
+        'status': 'OPEN',
+        'evidence': '',
+    },
+    required=('title',),
+    datetime_fields=('date_time',),
+    coordinate_fields=('map_x', 'map_y'),
+    many_to_many={
+        'gang_ids': ('gangs_involved', Gang),
+        'member_ids': ('members_involved', GangMember),
+    },
+)
+
+MEMBER_SPEC = BulkSpec(
+    GangMember,
+    fields={
+        'name': '',
+        'alias': '',
+        'rank': '',
+        'threat_level': 'LOW',
+        'status': 'ACTIVE',
+        'criminal_record': '',
+        'notes': '',
+    },
+    required=('name',),
+    foreign_keys={'gang_id': Gang},
+)
+
+
+def _is_id(value):
+    # bool is an int subclass; True must not pass for id 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _as_id_list(value):
+    if not isinstance(value, list) or not all(_is_id(v) for v in value):
+        return None
+    return value
+
+
+def _parse_moment(value):
+    """An aware datetime from an ISO 8601 string (naive ones are in TIME_ZONE), or None if unreadable"""
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        # Well-formed but impossible, e.g. month 13
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def validate(spec, items):
+    """
+    Check every item and resolve referenced ids with one query per model.
+
+    Returns the records being updated keyed by id; raises BulkValidationError
+    listing the problems for every invalid item.
+    """
+    if not isinstance(items, list) or not items:
+        raise BulkValidationError([{'index': None, 'errors': {'items': 'Expected a non-empty list'}}])
+    if len(items) > settings.BULK_API_MAX_ITEMS:
+        raise BulkValidationError([{
+            'index': None,
+            'errors': {'items': f'At most {settings.BULK_API_MAX_ITEMS} items per request'},
+        }])
+
+    update_ids = [item.get('id') for item in items if isinstance(item, dict) and item.get('id') is not None]
+    existing = spec.model.objects.in_bulk([i for i in update_ids if _is_id(i)])
+
+    # Every id referenced through a FK or M2M, grouped by target model
+    referenced = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for key, related in spec.foreign_keys.items():
+            if _is_id(item.get(key)):
+                referenced.setdefault(related, set()).add(item[key])
+        for key, (_, related) in spec.many_to_many.items():
+            referenced.setdefault(related, set()).update(_as_id_list(item.get(key)) or [])
+    known = {
+        related: set(related.objects.filter(id__in=ids).values_list('id', flat=True))
+        for related, ids in referenced.items()
+    }
+
+    errors = []
+    seen_ids = set()
+    for index, item in enumerate(items):
+        item_errors = {}
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'errors': {'item': 'Expected an object'}})
+            continue
+
+        record_id = item.get('id')
+        creating = record_id is None
+        if not creating:
+            if not _is_id(record_id):
+                item_errors['id'] = 'Expected an integer id'
+            elif record_id not in existing:
+                item_errors['id'] = f'{spec.model.__name__} {record_id} does not exist'
+            elif record_id in seen_ids:
+                item_errors['id'] = 'Duplicate id in batch'
+            else:
+                seen_ids.add(record_id)
+
+        for field in spec.fields:
+            if field not in item:
+                continue
+            value = item[field]
+            allowed = spec.choices(field)
+            if not isinstance(value, str):
+                item_errors[field] = 'Expected a string'
+            elif allowed is not None and value not in allowed:
+                item_errors[field] = f'Invalid choice {value!r}'
+        if creating:
+            for field in spec.required:
+                if not str(item.get(field, '')).strip():
+                    item_errors[field] = 'This field is required'
+
+        for field in spec.datetime_fields:
+            if field in item and _parse_moment(item[field]) is None:
+                item_errors[field] = 'Expected an ISO 8601 datetime'
+
+        for field in spec.coordinate_fields:
+            if field in item:
+                try:
+                    spatial.clean_coordinate(item[field])
+                except ValueError as e:
+                    item_errors[field] = str(e)
+
+        for key, related in spec.foreign_keys.items():
+            if key not in item:
+                if creating:
+                    item_errors[key] = 'This field is required'
+            elif not _is_id(item[key]):
+                item_errors[key] = 'Expected an integer id'
+            elif item[key] not in known.get(related, ()):
+                item_errors[key] = f'{related.__name__} {item[key]} does not exist'
+
+        for key, (_, related) in spec.many_to_many.items():
+            if key not in item:
+                continue
+            ids = _as_id_list(item[key])
+            if ids is None:
+                item_errors[key] = 'Expected a list of ids'
+            else:
+                missing = sorted(set(ids) - known.get(related, set()))
+                if missing:
+                    item_errors[key] = f'Unknown {related.__name__} ids: {missing}'
+
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+
+    if errors:
+        raise BulkValidationError(errors)
+    return existing
+
+
+def _assign(spec, obj, item):
+    """Copy request values onto obj; returns the concrete fields that were set"""
+    changed = []
+    for field in spec.fields:
+        if field in item:
+            setattr(obj, field, item[field])
+            changed.append(field)
+    for field in spec.datetime_fields:
+        if field in item:
+            setattr(obj, field, _parse_moment(item[field]))
+            changed.append(field)
+    for field in spec.coordinate_fields:
+        if field in item:
+            setattr(obj, field, spatial.clean_coordinate(item[field]))
+            changed.append(field)
+    for key in spec.foreign_keys:
+        if key in item:
+            setattr(obj, key, item[key])
+            changed.append(key.removesuffix('_id'))
+    return changed
+
+
+def _replace_links(spec, objs_by_index, items):
+    """Rewrite M2M links with one delete and one bulk insert per relation"""
+    for key, (attr, _) in spec.many_to_many.items():
+        m2m_field = spec.model._meta.get_field(attr)
+        through = m2m_field.remote_field.through
+        source, target = m2m_field.m2m_column_name(), m2m_field.m2m_reverse_name()
+
+        touched = {index: items[index][key] for index in objs_by_index if key in items[index]}
+        if not touched:
+            continue
+        owner_ids = [objs_by_index[index].pk for index in touched]
+        through.objects.filter(**{f'{source}__in': owner_ids}).delete()
+        through.objects.bulk_create([
+            through(**{source: objs_by_index[index].pk, target: target_id})
+            for index, target_ids in touched.items()
+            for target_id in dict.fromkeys(target_ids)
+        ])
+
+
+def _linked_gang_ids(spec, record_ids):
+    """Gangs currently linked to the given records (for rollup refreshes)"""
+    if not record_ids:
+        return set()
+    if spec.model is GangMember:
+        return set(GangMember.objects.filter(id__in=record_ids).values_list('gang_id', flat=True))
+    if spec.model is Incident:
+        return set(
+            Incident.gangs_involved.through.objects.filter(incident_id__in=record_ids)
+            .values_list('gang_id', flat=True)
+        )
+    return set()
+
+
+def _linked_member_ids(spec, record_ids):
+    """Members currently linked to the given incidents (for the associate graph)"""
+    if spec.model is not Incident or not record_ids:
+        return set()
+    return set(
+        Incident.members_involved.through.objects.filter(incident_id__in=record_ids)
+        .values_list('gangmember_id', flat=True)
+    )
+
+
+def apply(spec, items, user=None):
+    """Validate and write a batch, returning per-item results"""
+    existing = validate(spec, items)
+    now = timezone.now()
+
+    with transaction.atomic():
+        gangs_before = _linked_gang_ids(spec, list(existing))
+        members_before = _linked_member_ids(spec, list(existing))
+        # Captured before the items overwrite date_time
+        moments_before = [obj.date_time for obj in existing.values()] if spec.model is Incident else []
+        positions_before = [(obj.map_x, obj.map_y) for obj in existing.values()] if spec.model is Incident else []
+
+        objs_by_index = {}
+        to_create, to_update, update_fields = [], [], {'updated_at'}
+        for index, item in enumerate(items):
+            if item.get('id') is None:
+                obj = spec.model(**spec.fields)
+                if spec.model is Incident:
+                    obj.reported_by = user
+                _assign(spec, obj, item)
+                to_create.append(obj)
+            else:
+                obj = existing[item['id']]
+                update_fields.update(_assign(spec, obj, item))
+                obj.updated_at = now
+                to_update.append(obj)
+            objs_by_index[index] = obj
+
+        spec.model.objects.bulk_create(to_create)
+        if to_update:
+            spec.model.objects.bulk_update(to_update, sorted(update_fields))
+        _replace_links(spec, objs_by_index, items)
+
+        gangs_after = _linked_gang_ids(spec, [obj.pk for obj in objs_by_index.values()])
+        rollups.schedule_refresh(gangs_before | gangs_after)
+        versions.bump(spec.model)
+        members_after = _linked_member_ids(spec, [obj.pk for obj in objs_by_index.values()])
+        if spec.model is GangMember:
+            # New members join the graph as isolated nodes
+            members_after = {obj.pk for obj in to_create}
+        graph.mark_dirty(members_before | members_after)
+        if spec.model is Incident:
+            spatial.mark_dirty(obj.pk for obj in objs_by_index.values())
+            tiles.touch_points(positions_before + [(obj.map_x, obj.map_y) for obj in objs_by_index.values()])
+            trends.schedule_refresh(moments_before + [obj.date_time for obj in objs_by_index.values()])
+        stats.mark_stale()
+        stats.invalidate_lists()
+        if spec.model is GangMember:
+            autocomplete.invalidate()
+
+    return [
+        {'index': index, 'id': obj.pk, 'action': 'updated' if items[index].get('id') is not None else 'created'}
+        for index, obj in objs_by_index.items()
+    ]
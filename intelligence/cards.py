@@ -0,0 +1,129 @@
+"""
+Per-record cards of the list pages, rendered from cache where unchanged.
+
+Each list page draws one card per row from an include under
+templates/intelligence/includes/. render_cards looks every card of a page up
+with one cache.get_many, keyed on the row's identity and on whatever the card
+shows that can change: the row's updated_at, the updated_at or version of the
+related rows it draws from (versions read once per page), edit mode and the
+template files. Only the cards
+missing from the cache are rendered, after prefetching their relations for
+them alone, and stored for the next request. Nothing is ever deleted: a save
+moves updated_at, so the next render looks under a new key and the old entry
+expires. With a shared cache backend one worker's render serves every worker.
+
+M2M link changes touch the owning row's updated_at (see signals.py), so a
+card's key also moves when, say, the gangs linked to an incident change.
+
+The CRUD endpoints render single cards through card_fragment (see
+views.saved_response).
+"""
+import hashlib
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import versions
+from .models import CaseFile, Gang, GangMember, GangRelationship, Incident
+from .rollups import ensure_gang_stats
+
+
+CARD_KEY = 'card:{}:{}:{}'
+CARD_TIMEOUT = 24 * 3600
+
+
+class CardSpec:
+    """How a list page loads and draws the card of one of a model's rows"""
+
+    def __init__(self, template, name, prefix, load, prefetch=(), state=None, depends=()):
+        self.template = template    # include rendering one card
+        self.name = name            # context name of the row in the include
+        self.prefix = prefix        # DOM id of a card: '<prefix>-<pk>'
+        self.load = load            # queryset -> the rows as the list page loads them
+        self.prefetch = prefetch    # relations the card reads, prefetched only for cards being rendered
+        self.state = state          # row -> what the card shows that can change; None: not cached
+        self.depends = depends      # models any of whose changes can change every card, by their version
+
+    def dom_id(self, pk):
+        return f'{self.prefix}-{pk}'
+
+
+def gang_card_rows(gangs):
+    """Active gangs with their rollup, as gang_intelligence loads them"""
+    gangs = gangs.filter(is_active=True).select_related('stats')
+    if ensure_gang_stats(gangs):
+        gangs = gangs.all()
+    return gangs
+
+
+CARDS = {
+    Gang: CardSpec('intelligence/includes/gang_card.html', 'gang', 'gang', gang_card_rows),
+    GangMember: CardSpec(
+        'intelligence/includes/member_card.html', 'member', 'member',
+        lambda rows: rows.filter(status='ACTIVE').select_related('gang', 'centrality'),
+        state=lambda member: (
+            member.updated_at,
+            member.gang.updated_at,
+            member.centrality.computed_at if hasattr(member, 'centrality') else None,
+        ),
+    ),
+    Incident: CardSpec(
+        'intelligence/includes/incident_card.html', 'incident', 'incident',
+        lambda rows: rows,
+        prefetch=('gangs_involved',),
+        state=lambda incident: (incident.updated_at,),
+        # The linked gangs' tags and colours
+        depends=(Gang,),
+    ),
+    CaseFile: CardSpec(
+        'intelligence/includes/case_card.html', 'case', 'case',
+        lambda rows: rows.select_related('lead_agent'),
+        state=lambda case: (case.updated_at,),
+        depends=(User,),
+    ),
+    GangRelationship: CardSpec(
+        'intelligence/includes/relationship_card.html', 'rel', 'relationship',
+        lambda rows: rows.select_related('gang_1', 'gang_2'),
+    ),
+}
+
+
+def render_card(request, spec, row, edit_mode):
+    return render_to_string(spec.template, {spec.name: row, 'edit_mode': edit_mode}, request=request).strip()
+
+
+def card_key(spec, row, common):
+    """`common`: what every card of the page shares in its key, see render_cards"""
+    state = repr((spec.state(row), common))
+    return CARD_KEY.format(spec.prefix, row.pk, hashlib.sha256(state.encode()).hexdigest()[:24])
+
+
+def render_cards(request, model, rows, edit_mode):
+    """The HTML of each row's card, in order: cached ones fetched in one round trip, the rest rendered and stored"""
+    spec = CARDS[model]
+    rows = list(rows)
+    common = (versions.current(*spec.depends), edit_mode, versions.templates_stamp())
+    keys = [card_key(spec, row, common) for row in rows]
+    html = cache.get_many(keys)
+
+    missing = [(key, row) for key, row in zip(keys, rows) if key not in html]
+    if missing:
+        if spec.prefetch:
+            prefetch_related_objects([row for _, row in missing], *spec.prefetch)
+        rendered = {key: render_card(request, spec, row, edit_mode) for key, row in missing}
+        cache.set_many(rendered, CARD_TIMEOUT)
+        html.update(rendered)
+    # Rendered by the template engine, so already escaped
+    return [mark_safe(html[key]) for key in keys]
+
+
+def card_fragment(request, model, pk):
+    """{DOM id: HTML} of one row's card re-rendered; the HTML is empty once the row is off its list page"""
+    spec = CARDS[model]
+    rows = list(spec.load(model.objects.filter(pk=pk)))
+    if rows and spec.prefetch:
+        prefetch_related_objects(rows, *spec.prefetch)
+    return {spec.dom_id(pk): render_card(request, spec, rows[0], True) if rows else ''}
@@ -0,0 +1,98 @@
+"""
+Shared file handling for the export_data / import_data commands.
+
+Exports are Django "jsonl" records (one serialized object per line), written
+in EXPORT_MODELS order and optionally gzip or zstd compressed. The loader
+also accepts the legacy indented JSON array written by dumpdata.
+"""
+import gzip
+import io
+import json
+import os
+
+from django.core.management.base import CommandError
+
+
+# Written by a full export_data run, and loaded by import_data and boot by default
+FULL_EXPORT = 'data_export.jsonl'
+# The dumpdata fixture older checkouts ship instead
+LEGACY_EXPORT = 'data_export.json'
+
+# Dependency order, so a streaming loader can resolve references as it goes
+EXPORT_MODELS = [
+    'contenttypes.ContentType',
+    'auth.Group',
+    'auth.User',
+    'intelligence.Gang',
+    'intelligence.GangMember',
+    'intelligence.Incident',
+    'intelligence.GangRelationship',
+    'intelligence.CaseFile',
+]
+
+
+def default_source():
+    """The data file to load when none is named: the full export, else the legacy fixture"""
+    return FULL_EXPORT if os.path.exists(FULL_EXPORT) else LEGACY_EXPORT
+
+
+def infer_compression(path):
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise CommandError('zstd compression requires the zstandard package (pip install zstandard)')
+    return zstandard
+
+
+def open_output(path, compression):
+    """Open a text stream for writing, optionally compressed"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, 'wb')), encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_input(path):
+    """Open a text stream for reading, decompressing by file extension"""
+    compression = infer_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb')), encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def is_legacy_fixture(path):
+    """True for dumpdata-style JSON arrays (data_export.json)"""
+    return path.removesuffix('.gz').removesuffix('.zst').endswith('.json')
+
+
+def read_records(path):
+    """
+    Yield (position, record) pairs. Positions are stable across runs, so they
+    can be used as resume checkpoints.
+
+    jsonl files are streamed line by line. Legacy JSON arrays have to be read
+    whole; their records are put into EXPORT_MODELS order first because
+    dumpdata writes users after the rows that reference them.
+    """
+    with open_input(path) as stream:
+        if is_legacy_fixture(path):
+            order = {label.lower(): index for index, label in enumerate(EXPORT_MODELS)}
+            records = sorted(json.load(stream), key=lambda record: order.get(record['model'], len(order)))
+            yield from enumerate(records, start=1)
+            return
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
@@ -0,0 +1,321 @@
+"""
+In-memory graph of the links between gang members.
+
+Two members are adjacent when they are known associates, were involved in
+the same incident, or appear on the same case file. Each edge carries a
+bitmask of those link kinds and a weight (the number of ties). The graph is
+held in compressed sparse row form: `indptr`/`indices`/`kinds`/`weights`
+arrays over dense node numbers, so neighbourhood, shortest path and
+connected component queries are plain array walks with no queries.
+
+Changes are applied incrementally. Signal handlers bump the graph's
+generation, a DataVersion row (see versions.bump_key) written in the same
+transaction, so every process sees the change once it commits. The ids of
+the members whose links changed are logged under that generation in the
+default cache as a hint: a process re-reads only those members' edges and
+patches them into an overlay, folding the overlay back into fresh arrays once
+it grows. When the log is unavailable (evicted, or a per-process cache in
+another worker) the graph is rebuilt in full.
+"""
+import threading
+from array import array
+from collections import deque
+
+from django.core.cache import cache
+
+from . import versions
+from .models import GangMember, Incident, CaseFile
+
+
+ASSOCIATE = 1
+INCIDENT = 2
+CASE = 4
+ALL_LINKS = ASSOCIATE | INCIDENT | CASE
+
+LINK_KINDS = {'associate': ASSOCIATE, 'incident': INCIDENT, 'case': CASE}
+
+GENERATION_KEY = 'graph:generation'
+DIRTY_KEY = 'graph:dirty:{}'
+DIRTY_LOG_TIMEOUT = 3600
+MAX_PATCH_GENERATIONS = 200
+
+_lock = threading.Lock()
+_state = {'graph': None}
+
+
+def link_names(mask):
+    return [name for name, bit in LINK_KINDS.items() if mask & bit]
+
+
+def load_edges(member_ids=None):
+    """
+    Read edges from the database as {(a, b): [kinds, weight]}, both directions.
+
+    With member_ids, only edges touching those members are read.
+    """
+    edges = {}
+
+    def add(a, b, kind):
+        if a == b:
+            return
+        for key in ((a, b), (b, a)):
+            edge = edges.setdefault(key, [0, 0])
+            edge[0] |= kind
+            edge[1] += 1
+
+    associates = GangMember.known_associates.through.objects.all()
+    if member_ids is not None:
+        associates = associates.filter(from_gangmember_id__in=member_ids)
+    for a, b in associates.values_list('from_gangmember_id', 'to_gangmember_id'):
+        # Symmetrical M2M stores both directions; count each pair once
+        if a < b or (member_ids is not None and b not in member_ids):
+            add(a, b, ASSOCIATE)
+
+    for through, owner, kind in (
+        (Incident.members_involved.through, 'incident_id', INCIDENT),
+        (CaseFile.members.through, 'casefile_id', CASE),
+    ):
+        rows = through.objects.all()
+        if member_ids is not None:
+            owners = through.objects.filter(gangmember_id__in=member_ids).values(owner)
+            rows = rows.filter(**{f'{owner}__in': owners})
+        members_by_owner = {}
+        for owner_id, member_id in rows.values_list(owner, 'gangmember_id'):
+            members_by_owner.setdefault(owner_id, []).append(member_id)
+        for members in members_by_owner.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if member_ids is None or a in member_ids or b in member_ids:
+                        add(a, b, kind)
+    return edges
+
+
+class AssociateGraph:
+    """CSR adjacency over member ids plus an overlay of patched adjacency lists"""
+
+    def __init__(self, member_ids, edges, generation=None):
+        self.generation = generation
+        adjacency = {member_id: {} for member_id in member_ids}
+        for (a, b), (kinds, weight) in edges.items():
+            if a in adjacency and b in adjacency:
+                adjacency[a][b] = (kinds, weight)
+        self._compact(adjacency)
+
+    def _compact(self, adjacency):
+        self.ids = array('q', sorted(adjacency))
+        self.index = {member_id: i for i, member_id in enumerate(self.ids)}
+        self.indptr = array('q', [0])
+        self.indices = array('q')
+        self.kinds = array('B')
+        self.weights = array('L')
+        for member_id in self.ids:
+            for neighbour, (kinds, weight) in sorted(adjacency[member_id].items()):
+                self.indices.append(self.index[neighbour])
+                self.kinds.append(kinds)
+                self.weights.append(weight)
+            self.indptr.append(len(self.indices))
+        self.overlay = {}
+        self.nodes = set(self.ids)
+
+    @classmethod
+    def from_database(cls, generation=None):
+        member_ids = GangMember.objects.values_list('id', flat=True)
+        return cls(list(member_ids), load_edges(), generation)
+
+    # -- adjacency ---------------------------------------------------------
+
+    def __contains__(self, member_id):
+        return member_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def neighbours(self, member_id, links=ALL_LINKS):
+        """{neighbour id: (kinds, weight)} for the edges matching links"""
+        if member_id not in self.nodes:
+            return {}
+        if member_id in self.overlay:
+            return {n: e for n, e in self.overlay[member_id].items() if e[0] & links}
+        i = self.index.get(member_id)
+        if i is None:
+            return {}
+        ids, indices, kinds, weights = self.ids, self.indices, self.kinds, self.weights
+        return {
+            ids[indices[j]]: (kinds[j], weights[j])
+            for j in range(self.indptr[i], self.indptr[i + 1])
+            if kinds[j] & links
+        }
+
+    def _neighbour_ids(self, member_id, links):
+        if member_id not in self.nodes:
+            return []
+        if member_id in self.overlay:
+            return [n for n, (kinds, _) in self.overlay[member_id].items() if kinds & links]
+        i = self.index.get(member_id)
+        if i is None:
+            return []
+        ids, indices, kinds = self.ids, self.indices, self.kinds
+        return [ids[indices[j]] for j in range(self.indptr[i], self.indptr[i + 1]) if kinds[j] & links]
+
+    def edge_count(self):
+        return sum(len(self.neighbours(member_id)) for member_id in self.nodes) // 2
+
+    # -- queries -----------------------------------------------------------
+
+    def neighbourhood(self, member_id, hops=2, links=ALL_LINKS):
+        """{member id: distance} for everyone within `hops` links, excluding the member"""
+        if member_id not in self.nodes:
+            return {}
+        distances = {member_id: 0}
+        frontier = [member_id]
+        for distance in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbour in self._neighbour_ids(node, links):
+                    if neighbour not in distances:
+                        distances[neighbour] = distance
+                        next_frontier.append(neighbour)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        del distances[member_id]
+        return distances
+
+    def shortest_path(self, source, target, links=ALL_LINKS, max_hops=None):
+        """Fewest-links path as a list of member ids from source to target, or None"""
+        if source not in self.nodes or target not in self.nodes:
+            return None
+        if source == target:
+            return [source]
+        # Bidirectional BFS: expand the smaller frontier each round
+        parents = {source: None}
+        children = {target: None}
+        forward, backward = [source], [target]
+        hops = 0
+        while forward and backward and (max_hops is None or hops < max_hops):
+            hops += 1
+            expand_forward = len(forward) <= len(backward)
+            frontier, seen, other = (forward, parents, children) if expand_forward else (backward, children, parents)
+            next_frontier = []
+            for node in frontier:
+                for neighbour in self._neighbour_ids(node, links):
+                    if neighbour in seen:
+                        continue
+                    seen[neighbour] = node
+                    if neighbour in other:
+                        return self._join_path(neighbour, parents, children)
+                    next_frontier.append(neighbour)
+            if expand_forward:
+                forward = next_frontier
+            else:
+                backward = next_frontier
+        return None
+
+    @staticmethod
+    def _join_path(meeting, parents, children):
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        node = children[meeting]
+        while node is not None:
+            path.append(node)
+            node = children[node]
+        return path
+
+    def component(self, member_id, links=ALL_LINKS):
+        """Every member reachable from member_id, including itself"""
+        if member_id not in self.nodes:
+            return set()
+        seen = {member_id}
+        queue = deque([member_id])
+        while queue:
+            for neighbour in self._neighbour_ids(queue.popleft(), links):
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return seen
+
+    def components(self, links=ALL_LINKS, min_size=1):
+        """Connected components as sets of member ids, largest first"""
+        seen = set()
+        found = []
+        for member_id in sorted(self.nodes):
+            if member_id in seen:
+                continue
+            members = self.component(member_id, links)
+            seen |= members
+            if len(members) >= min_size:
+                found.append(members)
+        found.sort(key=lambda members: (-len(members), min(members)))
+        return found
+
+    # -- incremental updates -----------------------------------------------
+
+    def patch(self, member_ids):
+        """Re-read the edges of the given members and splice them in"""
+        dirty = set(member_ids)
+        if not dirty:
+            return
+        alive = set(GangMember.objects.filter(id__in=dirty).values_list('id', flat=True))
+        fresh = {}
+        for (a, b), (kinds, weight) in load_edges(dirty).items():
+            fresh.setdefault(a, {})[b] = (kinds, weight)
+
+        affected = set(dirty)
+        for member_id in dirty:
+            affected.update(self.neighbours(member_id))
+        affected.update(fresh)
+
+        for member_id in affected:
+            if member_id in dirty:
+                adjacency = fresh.get(member_id, {}) if member_id in alive else {}
+            else:
+                # Keep links to untouched members, take links to dirty ones from the database
+                adjacency = {n: e for n, e in self.neighbours(member_id).items() if n not in dirty}
+                adjacency.update(fresh.get(member_id, {}))
+            self.overlay[member_id] = adjacency
+
+        self.nodes |= alive
+        self.nodes -= dirty - alive
+
+        if len(self.overlay) > max(64, len(self.nodes) // 10):
+            self._compact({member_id: self.neighbours(member_id) for member_id in self.nodes})
+
+
+# -- process-wide graph ----------------------------------------------------
+
+def get_graph():
+    """The process-wide graph, patched or rebuilt to the latest generation"""
+    with _lock:
+        generation = versions.current_keys(GENERATION_KEY)[0]
+        graph = _state['graph']
+        if graph is not None and graph.generation == generation:
+            return graph
+
+        if graph is not None and 0 < generation - graph.generation <= MAX_PATCH_GENERATIONS:
+            keys = [DIRTY_KEY.format(n) for n in range(graph.generation + 1, generation + 1)]
+            log = cache.get_many(keys)
+            if len(log) == len(keys):
+                graph.patch(set().union(*log.values()))
+                graph.generation = generation
+                return graph
+
+        _state['graph'] = AssociateGraph.from_database(generation)
+        return _state['graph']
+
+
+def mark_dirty(member_ids):
+    """Record that these members' links changed, as part of the current transaction"""
+    member_ids = {member_id for member_id in member_ids if member_id is not None}
+    if member_ids:
+        generation = versions.bump_key(GENERATION_KEY)
+        # Other writers wait for this transaction, so a rolled back entry is overwritten by the next one
+        cache.set(DIRTY_KEY.format(generation), member_ids, timeout=DIRTY_LOG_TIMEOUT)
+
+
+def invalidate():
+    """Force a full rebuild in every process once the transaction commits"""
+    versions.bump_key(GENERATION_KEY)
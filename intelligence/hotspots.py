@@ -0,0 +1,206 @@
+"""
+Incident hotspots: where located incidents concentrate over a recent window.
+
+compute_hotspots bins incidents with map coordinates into HotspotBin rows, one
+per local day and grid cell, holding the incident count and the severity
+weighted count (LOW 1, MEDIUM 2, HIGH 4, CRITICAL 8). Bins outlive the run, so
+each run only rebins the days that changed since the previous one: the days of
+incidents saved since it started, plus any day in the window whose binned count
+no longer matches its incidents, which catches deletions and incidents moved to
+another day. The full history is binned once, or again when the cell size
+changes.
+
+Hotspots come from the bins of the window summed into a dense NumPy grid and
+smoothed with a Gaussian kernel, a kernel density estimate at grid resolution.
+Cells whose density stands well above the rest of the occupied area (the
+cells within a bandwidth of any incident) are grouped into 8-connected
+components; each becomes a Hotspot outlined by the convex hull of its cells
+and scored by the weighted incidents inside it. The map serves the stored
+rows, so nothing here runs in the web process.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from scipy import ndimage
+from scipy.spatial import ConvexHull
+
+from .models import Hotspot, HotspotBin, Incident
+from .trends import day_runs, local_day
+
+
+# Weight of an incident by Incident.severity_rank; unranked counts as LOW
+SEVERITY_WEIGHTS = {1: 1.0, 2: 2.0, 3: 4.0, 4: 8.0}
+REBIN_WINDOW_DAYS = 31
+MAX_GRID_CELLS = 4_000_000
+
+
+def severity_weight(rank):
+    return SEVERITY_WEIGHTS.get(rank, 1.0)
+
+
+def located_incidents():
+    return Incident.objects.order_by().filter(map_x__isnull=False, map_y__isnull=False)
+
+
+# -- bins ------------------------------------------------------------------
+
+def bin_incidents(start, end, cell_size):
+    """HotspotBin rows for the located incidents dated within [start, end)"""
+    bins = {}
+    rows = located_incidents().filter(date_time__gte=start, date_time__lt=end).values_list(
+        'date_time', 'map_x', 'map_y', 'severity_rank'
+    )
+    for moment, x, y, rank in rows.iterator(chunk_size=5000):
+        key = (timezone.localdate(moment), math.floor(x / cell_size), math.floor(y / cell_size))
+        entry = bins.setdefault(key, [0, 0.0])
+        entry[0] += 1
+        entry[1] += severity_weight(rank)
+    return [
+        HotspotBin(date=date, cell_x=cell_x, cell_y=cell_y, count=count, weight=weight)
+        for (date, cell_x, cell_y), (count, weight) in bins.items()
+    ]
+
+
+def rebin_window(first, stop, cell_size):
+    """Replace the bins of the local dates [first, stop); returns the bin count"""
+    with transaction.atomic():
+        bins = bin_incidents(local_day(first), local_day(stop), cell_size)
+        HotspotBin.objects.filter(date__gte=first, date__lt=stop).delete()
+        HotspotBin.objects.bulk_create(bins, batch_size=1000)
+    return len(bins)
+
+
+def rebin_days(dates, cell_size):
+    """Rebin the given local dates, one window per run of consecutive days"""
+    for first, stop in day_runs(dates):
+        rebin_window(first, stop, cell_size)
+
+
+def rebuild_bins(cell_size):
+    """Rebin the whole history; returns the number of days covered"""
+    bounds = located_incidents().aggregate(first=Min('date_time'), last=Max('date_time'))
+    HotspotBin.objects.all().delete()
+    if bounds['first'] is None:
+        return 0
+    first = timezone.localdate(bounds['first'])
+    last = timezone.localdate(bounds['last']) + timedelta(days=1)
+    date = first
+    while date < last:
+        stop = min(date + timedelta(days=REBIN_WINDOW_DAYS), last)
+        rebin_window(date, stop, cell_size)
+        date = stop
+    return (last - first).days
+
+
+def changed_days(since):
+    """Local dates of incidents saved since `since`, located or not"""
+    moments = Incident.objects.order_by().filter(updated_at__gte=since).values_list('date_time', flat=True)
+    return {timezone.localdate(moment) for moment in moments.iterator(chunk_size=5000)}
+
+
+def drifted_days(first):
+    """Local dates from `first` on whose bins no longer count the incidents located on them"""
+    located = dict(
+        located_incidents().filter(date_time__gte=local_day(first))
+        .annotate(day=TruncDate('date_time')).values('day')
+        .annotate(count=Count('id')).values_list('day', 'count')
+    )
+    binned = dict(
+        HotspotBin.objects.filter(date__gte=first).order_by()
+        .values('date').annotate(count=Sum('count')).values_list('date', 'count')
+    )
+    return {date for date in located.keys() | binned.keys() if located.get(date, 0) != binned.get(date, 0)}
+
+
+# -- detection -------------------------------------------------------------
+
+def window_cells(first, stop):
+    """(cell_x, cell_y, count, weight) rows summed over the bins of the local dates [first, stop)"""
+    rows = (
+        HotspotBin.objects.filter(date__gte=first, date__lt=stop).order_by()
+        .values('cell_x', 'cell_y').annotate(total=Sum('count'), weighted=Sum('weight'))
+        .values_list('cell_x', 'cell_y', 'total', 'weighted')
+    )
+    return np.array(list(rows), dtype=float).reshape(-1, 4)
+
+
+def cell_outline(cells, origin, cell_size):
+    """Convex hull, in map metres, of the corners of the given (i, j) grid cells"""
+    corners = np.unique(np.concatenate([cells + offset for offset in ((0, 0), (1, 0), (0, 1), (1, 1))]), axis=0)
+    hull = corners[ConvexHull(corners).vertices]
+    return [[round(float(origin[0] + i) * cell_size, 1), round(float(origin[1] + j) * cell_size, 1)] for i, j in hull]
+
+
+def find_hotspots(cells, cell_size, bandwidth, z=2.0, min_score=5.0):
+    """
+    Hotspots in the (cell_x, cell_y, count, weight) rows of window_cells,
+    highest score first. The weights are smoothed with a Gaussian of
+    `bandwidth` metres; cells more than `z` standard deviations above the
+    mean density of the occupied area are hot, and each connected group of
+    them scoring at least `min_score` weighted incidents is a hotspot.
+    """
+    if not len(cells):
+        return []
+    sigma = bandwidth / cell_size
+    pad = int(math.ceil(4 * sigma)) + 1
+    cell_x, cell_y = cells[:, 0].astype(np.int64), cells[:, 1].astype(np.int64)
+    origin = (int(cell_x.min()) - pad, int(cell_y.min()) - pad)
+    shape = (int(cell_x.max()) - origin[0] + pad + 1, int(cell_y.max()) - origin[1] + pad + 1)
+    if shape[0] * shape[1] > MAX_GRID_CELLS:
+        raise ValueError(
+            f'{shape[0]} x {shape[1]} grid exceeds {MAX_GRID_CELLS} cells; use a larger cell size'
+        )
+
+    counts = np.zeros(shape)
+    weights = np.zeros(shape)
+    counts[cell_x - origin[0], cell_y - origin[1]] = cells[:, 2]
+    weights[cell_x - origin[0], cell_y - origin[1]] = cells[:, 3]
+    density = ndimage.gaussian_filter(weights, sigma, mode='constant') if sigma > 0 else weights
+
+    # The occupied area: cells within one bandwidth of an incident
+    support = density[ndimage.binary_dilation(weights > 0, iterations=max(1, round(sigma)))]
+    hot = density > support.mean() + z * support.std()
+    labels, found = ndimage.label(hot, structure=np.ones((3, 3)))
+    if not found:
+        return []
+    index = np.arange(1, found + 1)
+    scores = ndimage.sum_labels(weights, labels, index)
+    totals = ndimage.sum_labels(counts, labels, index)
+    peaks = ndimage.maximum(density, labels, index)
+    centres = ndimage.center_of_mass(density, labels, index)
+
+    hotspots = []
+    for label, slices in enumerate(ndimage.find_objects(labels), start=1):
+        score = float(scores[label - 1])
+        if score < min_score:
+            continue
+        i, j = np.nonzero(labels[slices] == label)
+        members = np.column_stack([i + slices[0].start, j + slices[1].start])
+        ci, cj = centres[label - 1]
+        hotspots.append({
+            'score': round(score, 2),
+            'peak_density': round(float(peaks[label - 1]), 3),
+            'incident_count': int(totals[label - 1]),
+            'center_x': round((origin[0] + ci + 0.5) * cell_size, 1),
+            'center_y': round((origin[1] + cj + 0.5) * cell_size, 1),
+            'polygon': cell_outline(members, origin, cell_size),
+        })
+    hotspots.sort(key=lambda hotspot: -hotspot['score'])
+    return hotspots
+
+
+def store(hotspots, window_start, window_end, computed_at):
+    """Replace the stored hotspots with these, ranked in order"""
+    with transaction.atomic():
+        Hotspot.objects.all().delete()
+        Hotspot.objects.bulk_create([
+            Hotspot(
+                rank=rank, window_start=window_start, window_end=window_end, computed_at=computed_at, **hotspot
+            )
+            for rank, hotspot in enumerate(hotspots, start=1)
+        ])
@@ -0,0 +1,278 @@
+"""
+Resized WebP/AVIF copies of uploaded images for responsive <picture> markup.
+
+CaseFile.image and GangMember.photo hold full-size uploads, often megabytes
+each. Once an upload commits, make_variants writes copies at each of WIDTHS
+(never wider than the original) in every format Pillow can encode, next to
+the original in the same storage: case_files/evidence.png gets
+case_files/evidence.png.640w.webp and so on, named after the whole stored
+name so evidence.png and evidence.jpg never share a variant. An existing file
+is never overwritten; the storage picks a free name instead. The names are
+recorded in the
+model's <field>_variants JSON field together with the original's name and
+size, so templates build srcset lists without touching storage, and a record
+made from another original is ignored until the next refresh replaces it.
+The generate_image_variants command backfills existing images.
+
+Resizing happens off the request: saving a row with a new image queues an
+image_variants job (see intelligence.jobs) that run_worker picks up, and pages
+show the original until the record matches it. The job also hashes the upload:
+one identical to an image already processed for another row of the model is
+dropped and the row pointed at the existing file and variants, which are
+shared from then on and only deleted once no row uses them. Jobs claim the
+upload's digest (an ImageClaim row) before resizing, so of two identical
+uploads processed at once only one is resized; the other job is retried and
+then shares the result. A claim left by a dead worker lapses after the job
+lease. The record keeps
+a little metadata read from the original (format, EXIF capture time, camera,
+whether it carries a GPS position). The original itself is stored untouched,
+as evidence; the variants carry no EXIF data.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps, features
+
+from . import jobs, versions
+from .models import CaseFile, GangMember, ImageClaim
+
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960)
+# (format, Pillow save options), smallest files first; formats this Pillow cannot write are skipped.
+# AVIF needs Pillow 11.2 or later; older builds only write WebP
+ENCODERS = [
+    (fmt, options) for fmt, options in (
+        ('avif', {'quality': 50, 'speed': 8}),
+        ('webp', {'quality': 75, 'method': 4}),
+    )
+    if features.check(fmt)
+]
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+# Models with derived images, and the image field whose <field>_variants records them
+IMAGE_FIELDS = {CaseFile: 'image', GangMember: 'photo'}
+
+
+class DigestClaimed(Exception):
+    """An identical upload is being resized for another row; the job is retried once it is done"""
+
+
+def variant_name(name, width, fmt):
+    return f'{name}.{width}w.{fmt}'
+
+
+def current_variants(fieldfile, record):
+    """The variants record if it was made from this file, else {}"""
+    if fieldfile and record and record.get('source') == fieldfile.name:
+        return record
+    return {}
+
+
+def variant_names(record):
+    return {name for fmt in MIME_TYPES for name in (record or {}).get(fmt, {}).values()}
+
+
+def file_digest(fieldfile):
+    digest = hashlib.sha256()
+    with fieldfile.open('rb') as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_metadata(image):
+    """Format, colour mode and the EXIF fields worth keeping of an opened image"""
+    exif = image.getexif()
+    details = exif.get_ifd(ExifTags.IFD.Exif)
+    metadata = {
+        'format': image.format,
+        'mode': image.mode,
+        'taken_at': details.get(ExifTags.Base.DateTimeOriginal) or exif.get(ExifTags.Base.DateTime),
+        'camera': ' '.join(str(exif[tag]).strip() for tag in (ExifTags.Base.Make, ExifTags.Base.Model) if exif.get(tag)),
+        'has_gps': bool(exif.get_ifd(ExifTags.IFD.GPSInfo)),
+    }
+    return {key: value for key, value in metadata.items() if value not in (None, '')}
+
+
+def make_variants(fieldfile):
+    """Write the resized copies of an image file; returns the record for its variants field"""
+    storage = fieldfile.storage
+    with fieldfile.open('rb') as f:
+        image = Image.open(f)
+        metadata = image_metadata(image)
+        image = ImageOps.exif_transpose(image)
+    # has_transparency_data: Pillow 10.1+
+    image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    width, height = image.size
+
+    record = {'source': fieldfile.name, 'width': width, 'height': height, 'metadata': metadata}
+    # Largest first, each copy resized from the previous one
+    for target in sorted({min(w, width) for w in WIDTHS}, reverse=True):
+        if target < image.width:
+            image = image.resize(
+                (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS, reducing_gap=3.0
+            )
+        for fmt, options in ENCODERS:
+            buffer = BytesIO()
+            image.save(buffer, fmt.upper(), **options)
+            # Saved under a free name if taken: the file may be another row's variant
+            name = variant_name(fieldfile.name, target, fmt)
+            record.setdefault(fmt, {})[str(target)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return record
+
+
+def delete_variants(storage, record, keep=()):
+    for name in variant_names(record) - set(keep):
+        storage.delete(name)
+
+
+def in_use(model, name, exclude_pk):
+    """Whether another row of the model still holds this image file"""
+    return bool(name) and model._base_manager.filter(**{IMAGE_FIELDS[model]: name}).exclude(pk=exclude_pk).exists()
+
+
+def referenced(model, exclude_pk):
+    """Every variant file named by the records of the model's other rows"""
+    field = IMAGE_FIELDS[model]
+    records = (
+        model._base_manager.exclude(pk=exclude_pk).exclude(**{f'{field}_variants__isnull': True})
+        .values_list(f'{field}_variants', flat=True)
+    )
+    return {name for record in records.iterator() for name in variant_names(record)}
+
+
+def release(model, pk, fieldfile, record, keep=()):
+    """Delete the variant files of a record a row no longer uses, except any another row's record names"""
+    if not variant_names(record) - set(keep):
+        return
+    if not in_use(model, (record or {}).get('source'), pk):
+        delete_variants(fieldfile.storage, record, set(keep) | referenced(model, pk))
+
+
+def find_duplicate(model, pk, digest):
+    """(name, record) of another row's processed image with this SHA-256, or None"""
+    field = IMAGE_FIELDS[model]
+    rows = (
+        model._base_manager.filter(**{f'{field}_variants__sha256': digest}).exclude(pk=pk)
+        .values_list(field, f'{field}_variants')
+    )
+    for name, record in rows:
+        if name and record.get('source') == name and 'error' not in record:
+            return name, record
+    return None
+
+
+def _claim_key(model, digest):
+    return f'{model._meta.label}:{digest}'
+
+
+def claim_digest(model, pk, digest):
+    """Claim resizing the image with this SHA-256 for a row; returns the pk of the row holding the claim"""
+    key, now = _claim_key(model, digest), timezone.now()
+    try:
+        with transaction.atomic():
+            ImageClaim.objects.create(key=key, row_id=pk, claimed_at=now)
+        return pk
+    except IntegrityError:
+        pass
+    # Ours already, or left by a worker that died mid-resize
+    lapsed = Q(row_id=pk) | Q(claimed_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS))
+    if ImageClaim.objects.filter(lapsed, key=key).update(row_id=pk, claimed_at=now):
+        return pk
+    return ImageClaim.objects.filter(key=key).values_list('row_id', flat=True).first()
+
+
+def release_digest(model, pk, digest):
+    ImageClaim.objects.filter(key=_claim_key(model, digest), row_id=pk).delete()
+
+
+def refresh(model, pk, force=False):
+    """Make, replace or drop one row's variants so they match its current image"""
+    field = IMAGE_FIELDS[model]
+    record_field = f'{field}_variants'
+    row = model._base_manager.filter(pk=pk).only(field, record_field).first()
+    if row is None:
+        return None
+    fieldfile = getattr(row, field)
+    previous = getattr(row, record_field) or {}
+    if not force and (current_variants(fieldfile, previous) or not (fieldfile or previous)):
+        return previous
+
+    record, name, claimed = {}, fieldfile.name, None
+    try:
+        if fieldfile:
+            try:
+                digest = file_digest(fieldfile)
+                # Claimed before looking for a duplicate, so an identical upload being resized right now is found
+                owner = pk if force else claim_digest(model, pk, digest)
+                if owner == pk and not force:
+                    claimed = digest
+                duplicate = None if force else find_duplicate(model, pk, digest)
+                if duplicate:
+                    name, record = duplicate
+                elif owner != pk:
+                    raise DigestClaimed(f"{fieldfile.name} is identical to the image being resized for row {owner}")
+                else:
+                    record = make_variants(fieldfile)
+                    record['sha256'] = digest
+            except (OSError, Image.DecompressionBombError) as e:
+                # Recorded so the broken upload is not retried on every save; pages fall back to the original
+                logger.warning(f"Could not resize {fieldfile.name}: {e}")
+                record = {'source': fieldfile.name, 'error': str(e)}
+        return _store(model, pk, field, fieldfile, previous, record, name)
+    finally:
+        # Released once the record is saved, where find_duplicate sees it
+        if claimed:
+            release_digest(model, pk, claimed)
+
+
+def _store(model, pk, field, fieldfile, previous, record, name):
+    """Save a refreshed record (and the shared file's name) unless the image changed meanwhile"""
+    record_field = f'{field}_variants'
+    # Only if the image was not replaced meanwhile; the replacement's own job handles it
+    unchanged = Q(**{field: fieldfile.name}) if fieldfile else Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+    updates = {record_field: record} if name == fieldfile.name else {field: name, record_field: record}
+    # update() skips auto_now; the cached list cards are keyed on it
+    updates['updated_at'] = timezone.now()
+    if not model._base_manager.filter(unchanged, pk=pk).update(**updates):
+        if name == fieldfile.name:
+            delete_variants(fieldfile.storage, record)
+        return None
+    if name != fieldfile.name:
+        logger.info(f"{fieldfile.name} duplicates {name}; sharing its file and variants")
+        if not in_use(model, fieldfile.name, pk):
+            fieldfile.storage.delete(fieldfile.name)
+    release(model, pk, fieldfile, previous, keep=variant_names(record))
+    versions.bump(model)
+    return record
+
+
+def run_refresh(model, pk, force=False):
+    """image_variants job handler; `model` is the model's label"""
+    refresh(apps.get_model(model), pk, force)
+
+
+def schedule_refresh(instance):
+    """Queue an image_variants job for the instance, run by run_worker after the transaction commits"""
+    label = instance._meta.label
+    jobs.enqueue('image_variants', key=f'{label}:{instance.pk}', model=label, pk=instance.pk)
+
+
+def schedule_delete(instance):
+    """Delete a removed row's variant files once the surrounding transaction commits"""
+    model, pk = type(instance), instance.pk
+    fieldfile = getattr(instance, IMAGE_FIELDS[model])
+    record = getattr(instance, f'{IMAGE_FIELDS[model]}_variants')
+    if variant_names(record):
+        transaction.on_commit(lambda: release(model, pk, fieldfile, record))
@@ -0,0 +1,125 @@
+"""
+A small database-backed job queue for work that should not hold up a request.
+
+Jobs are rows of the Job table: a kind naming its handler in HANDLERS and a
+JSON payload of keyword arguments. enqueue() adds one inside the caller's
+transaction, so a job never runs for a write that rolled back, and skips it
+when a due job with the same kind and key is already waiting, since that one
+will see the same rows (one held back for a retry does not count). The run_worker command claims due jobs, runs their
+handlers in a process pool and records the outcome.
+
+Claiming is a conditional UPDATE from PENDING to RUNNING, so any number of
+workers can poll the same table without a broker or row locks. A claimed job
+holds a lease of settings.JOB_LEASE_SECONDS; one whose worker died is returned
+to the queue once the lease runs out. A handler that raises is retried with
+exponential backoff up to MAX_ATTEMPTS times and then left FAILED with its
+traceback. With settings.JOBS_INLINE, jobs run in the web process as soon as
+their transaction commits instead, for development without a worker.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> dotted path of the function called with the job's payload
+HANDLERS = {
+    'image_variants': 'intelligence.images.run_refresh',
+}
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)     # doubled after each failed attempt
+DONE_RETENTION = timedelta(days=7)
+
+
+def enqueue(kind, key='', **payload):
+    """Queue a job as part of the current transaction; returns it, or None if one is already pending"""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    # A pending job waiting out a retry delay would run too late for this write
+    if key and Job.objects.filter(kind=kind, key=key, status=Job.PENDING, run_after__lte=timezone.now()).exists():
+        return None
+    job = Job.objects.create(kind=kind, key=key, payload=payload)
+    if settings.JOBS_INLINE:
+        transaction.on_commit(lambda: run_now(job.pk))
+    return job
+
+
+def requeue_expired():
+    """Return jobs whose worker let the lease run out to the queue, or fail them when out of attempts"""
+    now = timezone.now()
+    expired = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS))
+    failed = expired.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=Job.FAILED, finished_at=now, locked_by='', locked_at=None, last_error='Lease expired'
+    )
+    requeued = expired.update(status=Job.PENDING, run_after=now, locked_by='', locked_at=None)
+    return requeued + failed
+
+
+def claim(worker, limit=1):
+    """Mark up to `limit` due jobs as running for this worker and return them"""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id').values_list('pk', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for pk in candidates:
+        # Another worker may have taken it since the SELECT; only one UPDATE matches
+        if Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def execute(kind, payload):
+    """Run a job's handler; returns None on success or the traceback. Runs in the pool's processes."""
+    try:
+        import_string(HANDLERS[kind])(**payload)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def finish(job, worker, error=None):
+    """Record a claimed job's outcome, scheduling a retry for a failure with attempts left"""
+    now = timezone.now()
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker)
+    if error is None:
+        mine.update(status=Job.DONE, finished_at=now, locked_by='', locked_at=None, last_error='')
+    elif job.attempts >= MAX_ATTEMPTS:
+        logger.error(f"{job} failed after {job.attempts} attempts:\n{error}")
+        mine.update(status=Job.FAILED, finished_at=now, locked_by='', locked_at=None, last_error=error)
+    else:
+        logger.warning(f"{job} failed, retrying:\n{error}")
+        mine.update(
+            status=Job.PENDING, run_after=now + RETRY_DELAY * 2 ** (job.attempts - 1),
+            locked_by='', locked_at=None, last_error=error,
+        )
+
+
+def run_now(pk, worker='inline'):
+    """Claim and run one job in this process, if it is still pending"""
+    if not Job.objects.filter(pk=pk, status=Job.PENDING).update(
+        status=Job.RUNNING, locked_by=worker, locked_at=timezone.now(), attempts=F('attempts') + 1
+    ):
+        return
+    job = Job.objects.get(pk=pk)
+    finish(job, worker, execute(job.kind, job.payload))
+
+
+def prune():
+    """Delete finished jobs older than DONE_RETENTION; failed ones are kept for inspection"""
+    return Job.objects.filter(status=Job.DONE, finished_at__lt=timezone.now() - DONE_RETENTION).delete()[0]
+
@@ -0,0 +1,119 @@
+"""
+Measure sign-ins per second in one process, the old login flow against the current one.
+
+Each scenario signs in repeatedly for --seconds through the credential check
+and django.contrib.auth.login() (session rotation, last_login), the part of
+the login view that differs between the two flows; the response rendering
+is the same for both and left out. The old flow is kept here as it was:
+quick access re-hashed and saved the agent on every sign-in, and a failed
+regular sign-in hashed twice. Throttling is switched off, since it would
+refuse most of the repeated attempts, and everything runs in a transaction
+that is rolled back, so the database is left as it was.
+
+Usage:
+    python manage.py bench_login
+    python manage.py bench_login --seconds 5
+"""
+import time
+
+from django.contrib.auth import authenticate, login
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from intelligence import agents
+
+
+BENCH_USERNAME = 'bench_agent'
+BENCH_PASSCODE = 'bench-passcode-1'
+
+SCENARIOS = [
+    ('quick access', 'doj_agent', agents.QUICK_ACCESS_PASSCODE),
+    ('regular agent', BENCH_USERNAME, BENCH_PASSCODE),
+    ('regular agent, other case', BENCH_USERNAME.upper(), BENCH_PASSCODE),
+    ('wrong passcode', BENCH_USERNAME, 'wrong-passcode'),
+    ('unknown agent', 'no_such_agent', 'wrong-passcode'),
+]
+
+
+def old_sign_in(request, agent_id, passcode):
+    """The login view's credential handling before agents.py"""
+    if agent_id.lower().startswith('doj_agent') and passcode == 'agent123':
+        username = agent_id.lower()
+        user, created = User.objects.get_or_create(
+            username=username,
+            defaults={'email': f'{username}@doj.com', 'is_staff': True, 'is_superuser': True, 'is_active': True},
+        )
+        user.is_staff = True
+        user.is_superuser = True
+        user.is_active = True
+        user.set_password('agent123')
+        user.save()
+        login(request, user)
+        return user
+    user = authenticate(request, username=agent_id, password=passcode)
+    if user is not None:
+        if user.is_active:
+            login(request, user)
+            return user
+        return None
+    try:
+        user = User.objects.get(username__iexact=agent_id)
+    except (User.DoesNotExist, User.MultipleObjectsReturned):
+        return None
+    if user.check_password(passcode) and user.is_active:
+        login(request, user)
+        return user
+    return None
+
+
+def new_sign_in(request, agent_id, passcode):
+    """The login view's credential handling now"""
+    try:
+        user = agents.authenticate_agent(request, agent_id, passcode)
+    except agents.LoginFailed:
+        return None
+    login(request, user)
+    return user
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sign-ins per second per worker, old login flow against the current one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help='Time spent on each scenario and flow')
+
+    def handle(self, *args, **options):
+        if options['seconds'] <= 0:
+            raise CommandError('--seconds must be positive')
+        self.factory = RequestFactory()
+        self.stdout.write(f'{"Scenario":<28}{"old /s":>10}{"new /s":>10}{"speed-up":>10}')
+        with override_settings(LOGIN_THROTTLE_ENABLED=False), transaction.atomic():
+            User.objects.filter(username=BENCH_USERNAME).delete()
+            User.objects.create_user(BENCH_USERNAME, password=BENCH_PASSCODE)
+            for name, agent_id, passcode in SCENARIOS:
+                old = self.rate(old_sign_in, agent_id, passcode, options['seconds'])
+                new = self.rate(new_sign_in, agent_id, passcode, options['seconds'])
+                self.stdout.write(f'{name:<28}{old:>10.1f}{new:>10.1f}{new / old:>9.1f}x')
+            transaction.set_rollback(True)
+
+    def request(self, agent_id, passcode):
+        request = self.factory.post('/login/', {'agent_id': agent_id, 'passcode': passcode})
+        request.session = SessionStore()
+        request.user = AnonymousUser()
+        return request
+
+    def rate(self, sign_in, agent_id, passcode, seconds):
+        """Sign-ins per second; the first, which may create the quick access account, is not timed"""
+        sign_in(self.request(agent_id, passcode), agent_id, passcode)
+        count = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while True:
+            sign_in(self.request(agent_id, passcode), agent_id, passcode)
+            count += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                return count / (now - start)
@@ -0,0 +1,177 @@
+"""
+Prepare the database and static files for a container start.
+
+Runs migrate, import_data and collectstatic, skipping each step whose inputs
+hash the same as when it last succeeded:
+
+    migrate        the migration files of every installed app
+    import_data    the data fixture
+    collectstatic  every file the static finders would collect
+
+Fingerprints for the database steps are stored in the database (BootStep), so
+a new or reset database is always migrated and loaded. The collectstatic
+fingerprint is written into STATIC_ROOT, so a fresh container always collects.
+A failed import is reported but does not stop the boot.
+
+Usage:
+    python manage.py boot
+    python manage.py boot --fixture data_export.jsonl.gz
+    python manage.py boot --force
+"""
+import hashlib
+import os
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.db.migrations.loader import MigrationLoader
+
+from intelligence.datafiles import FULL_EXPORT, LEGACY_EXPORT, default_source
+from intelligence.models import BootStep
+
+
+STATIC_FINGERPRINT_FILE = '.boot-fingerprint'
+IGNORE_PATTERNS = ['CVS', '.*', '*~']  # collectstatic's defaults
+
+
+def _hash_file(digest, name, path):
+    digest.update(name.encode('utf-8') + b'\0')
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+def migrations_fingerprint():
+    """Hash of every migration file of every installed app"""
+    digest = hashlib.sha256()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        spec = find_spec(module_name) if module_name else None
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for directory in spec.submodule_search_locations:
+            for path in sorted(Path(directory).glob('*.py')):
+                _hash_file(digest, f'{app_config.label}/{path.name}', path)
+    return digest.hexdigest()
+
+
+def fixture_fingerprint(path):
+    digest = hashlib.sha256()
+    _hash_file(digest, os.path.basename(path), path)
+    return digest.hexdigest()
+
+
+def static_fingerprint():
+    """Hash of the files collectstatic would copy, plus what decides how it copies them"""
+    digest = hashlib.sha256()
+    digest.update(f'{django.get_version()}\0{settings.STATICFILES_STORAGE}\0'.encode('utf-8'))
+    found = {}
+    for finder in get_finders():
+        for name, storage in finder.list(IGNORE_PATTERNS):
+            prefix = getattr(storage, 'prefix', None) or ''
+            # First finder to supply a name wins, as in collectstatic
+            found.setdefault(os.path.join(prefix, name), storage.path(name))
+    for name in sorted(found):
+        _hash_file(digest, name, found[name])
+    return digest.hexdigest()
+
+
+def _static_fingerprint_path():
+    return Path(settings.STATIC_ROOT) / STATIC_FINGERPRINT_FILE
+
+
+class Command(BaseCommand):
+    help = 'Run migrate, import_data and collectstatic, skipping steps whose inputs are unchanged'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixture',
+            help=f'Data file passed to import_data (default: {FULL_EXPORT}, else {LEGACY_EXPORT})',
+        )
+        parser.add_argument('--force', action='store_true', help='Run every step regardless of fingerprints')
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        self.child_verbosity = max(options['verbosity'] - 1, 0)
+        self.timings = []
+        start = time.monotonic()
+
+        self.step(
+            'migrate',
+            migrations_fingerprint,
+            lambda: call_command('migrate', interactive=False, verbosity=self.child_verbosity),
+            recorded=self.recorded_in_database,
+            record=self.record_in_database,
+        )
+
+        fixture = options['fixture'] or default_source()
+        if os.path.exists(fixture):
+            self.step(
+                'import_data',
+                lambda: fixture_fingerprint(fixture),
+                lambda: call_command('import_data', fixture, verbosity=self.child_verbosity),
+                recorded=self.recorded_in_database,
+                record=self.record_in_database,
+                required=False,
+            )
+        else:
+            self.timings.append(('import_data', f'no {fixture}', 0.0))
+
+        self.step(
+            'collectstatic',
+            static_fingerprint,
+            lambda: call_command('collectstatic', interactive=False, verbosity=self.child_verbosity),
+            recorded=self.recorded_in_static_root,
+            record=self.record_in_static_root,
+        )
+
+        for name, outcome, seconds in self.timings:
+            self.stdout.write(f'  {name:<14} {outcome:<24} {seconds:7.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'Boot finished in {time.monotonic() - start:.2f}s'))
+
+    def step(self, name, fingerprint, run, recorded, record, required=True):
+        """Run one step unless its fingerprint matches the last successful run"""
+        started = time.monotonic()
+        current = fingerprint()
+        if not self.force and recorded(name) == current:
+            self.timings.append((name, 'skipped (unchanged)', time.monotonic() - started))
+            return
+
+        try:
+            run()
+        except Exception as e:
+            self.timings.append((name, 'failed', time.monotonic() - started))
+            if required:
+                raise CommandError(f'{name} failed: {e}') from e
+            self.stderr.write(self.style.WARNING(f'{name} failed, continuing: {e}'))
+            return
+
+        duration = time.monotonic() - started
+        record(name, current, duration)
+        self.timings.append((name, 'ran', duration))
+
+    def recorded_in_database(self, name):
+        try:
+            return BootStep.objects.filter(name=name).values_list('fingerprint', flat=True).first()
+        except DatabaseError:
+            # Table not created yet: nothing has been recorded
+            return None
+
+    def record_in_database(self, name, fingerprint, duration):
+        BootStep.objects.update_or_create(name=name, defaults={'fingerprint': fingerprint, 'duration': duration})
+
+    def recorded_in_static_root(self, name):
+        try:
+            return _static_fingerprint_path().read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+
+    def record_in_static_root(self, name, fingerprint, duration):
+        _static_fingerprint_path().write_text(fingerprint, encoding='utf-8')
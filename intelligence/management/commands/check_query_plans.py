@@ -0,0 +1,108 @@
+"""
+Run EXPLAIN on the querysets behind each list view and fail if any of them
+falls back to a sequential scan over a table larger than --max-seq-rows.
+
+Usage:
+    python manage.py check_query_plans
+    python manage.py check_query_plans --max-seq-rows 500 --verbose
+"""
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from intelligence.models import Gang, GangMember, Incident, CaseFile
+
+
+def view_access_paths():
+    """(label, queryset) pairs mirroring the filter/order paths used by the views"""
+    return [
+        ('dashboard: active gangs', Gang.objects.filter(is_active=True)),
+        ('dashboard: active members', GangMember.objects.filter(status='ACTIVE')),
+        ('dashboard: open incidents', Incident.objects.filter(status__in=['OPEN', 'INVESTIGATING'])),
+        ('dashboard: recent incidents', Incident.objects.all()[:5]),
+        ('dashboard: critical gangs', Gang.objects.filter(threat_level='CRITICAL', is_active=True)[:5]),
+        ('gang_intelligence', Gang.objects.filter(is_active=True).order_by('-threat_rank', 'name')),
+        ('member_profiles', GangMember.objects.filter(status='ACTIVE').select_related('gang')),
+        ('member_profiles: gang', GangMember.objects.filter(status='ACTIVE', gang_id=1)),
+        ('member_profiles: threat', GangMember.objects.filter(status='ACTIVE', threat_level='HIGH')),
+        ('member_profiles: sort threat', GangMember.objects.filter(status='ACTIVE').order_by('-threat_rank', 'name')),
+        ('incident_reports', Incident.objects.all()[:25]),
+        ('incident_reports: status', Incident.objects.filter(status='OPEN')[:25]),
+        ('incident_reports: severity', Incident.objects.filter(severity='HIGH')[:25]),
+        ('incident_reports: status+severity', Incident.objects.filter(status='OPEN', severity='HIGH')[:25]),
+        ('incident_reports: sort severity', Incident.objects.order_by('-severity_rank', '-date_time', '-id')[:25]),
+        (
+            'incident_reports: status, sort severity',
+            Incident.objects.filter(status='OPEN').order_by('-severity_rank', '-date_time', '-id')[:25],
+        ),
+        ('dashboard: priority cases', CaseFile.objects.filter(priority_rank__gte=3)[:5]),
+        ('case_files', CaseFile.objects.all()),
+        ('case_files: status', CaseFile.objects.filter(status='OPEN')),
+        ('case_files: priority', CaseFile.objects.filter(priority='HIGH')),
+        ('case_files: status+priority', CaseFile.objects.filter(status='OPEN', priority='HIGH')),
+    ]
+
+
+# Postgres: "Seq Scan on intelligence_gang"; SQLite: "SCAN intelligence_gang" without "USING INDEX"
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)')
+
+
+def sequential_scans(plan):
+    """Return the table names a query plan scans sequentially"""
+    if connection.vendor == 'postgresql':
+        return set(POSTGRES_SEQ_SCAN.findall(plan))
+    tables = set()
+    for line in plan.splitlines():
+        match = SQLITE_SCAN.search(line)
+        if match and 'USING' not in line:
+            tables.add(match.group(1))
+    return tables
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN each view queryset and fail on sequential scans over large tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-seq-rows',
+            type=int,
+            default=1000,
+            help='Largest table (in rows) allowed to be read with a sequential scan',
+        )
+        parser.add_argument('--verbose', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        max_rows = options['max_seq_rows']
+        table_models = {model._meta.db_table: model for model in apps.get_models()}
+        row_counts = {}
+        failures = []
+
+        for label, queryset in view_access_paths():
+            plan = queryset.explain()
+            if options['verbose']:
+                self.stdout.write(f'--- {label}\n{plan}\n')
+
+            path_failures = []
+            for table in sorted(sequential_scans(plan)):
+                model = table_models.get(table)
+                if model is None:
+                    continue
+                if table not in row_counts:
+                    row_counts[table] = model._default_manager.count()
+                if row_counts[table] > max_rows:
+                    path_failures.append(f'{label}: sequential scan on {table} ({row_counts[table]} rows)')
+
+            if path_failures:
+                failures.extend(path_failures)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK   {label}'))
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f'FAIL {failure}'))
+            raise CommandError(f'{len(failures)} access path(s) fall back to a sequential scan above {max_rows} rows')
+
+        self.stdout.write(self.style.SUCCESS('All view access paths use indexes'))
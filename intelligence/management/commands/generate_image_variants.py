@@ -0,0 +1,55 @@
+"""
+Create the resized WebP/AVIF copies of existing case file images and member photos.
+
+Rows whose variants already match their image are skipped unless --force is
+given, so the command can be re-run after an import or a deploy at little
+cost; images that failed to resize before are tried again.
+
+Usage:
+    python manage.py generate_image_variants
+    python manage.py generate_image_variants --model member --force
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from intelligence import images
+from intelligence.models import CaseFile, GangMember
+
+
+MODELS = {'case': CaseFile, 'member': GangMember}
+
+
+class Command(BaseCommand):
+    help = 'Create missing resized image variants for case files and member photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), help='Only this model (default: both)')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that are already current')
+
+    def handle(self, *args, **options):
+        if not images.ENCODERS:
+            self.stderr.write(self.style.WARNING('This Pillow build can write neither AVIF nor WebP'))
+        models = [MODELS[options['model']]] if options['model'] else list(MODELS.values())
+        for model in models:
+            field = images.IMAGE_FIELDS[model]
+            rows = (
+                model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .order_by('pk').values_list('pk', field, f'{field}_variants')
+            )
+            made = skipped = failed = 0
+            start = time.monotonic()
+            for pk, name, record in rows.iterator():
+                if not options['force'] and record and record.get('source') == name and 'error' not in record:
+                    skipped += 1
+                    continue
+                record = images.refresh(model, pk, force=True) or {}
+                if 'error' in record:
+                    failed += 1
+                    self.stderr.write(f'  {model.__name__} #{pk}: {record["error"]}')
+                else:
+                    made += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}: {made} resized, {skipped} already current, {failed} failed '
+                f'({time.monotonic() - start:.1f}s)'
+            ))
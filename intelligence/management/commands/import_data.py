@@ -0,0 +1,389 @@
+"""
+Bulk-load an export produced by export_data (or a legacy dumpdata JSON file).
+
+Rows are inserted per model with bulk_create/bulk_update in batches, each
+batch in its own transaction. M2M links are written in a second pass over the
+file once every row exists. Records are matched to existing rows by natural
+key (gang tag, case number, username, member name within a gang, incident
+title and time, ...), never by primary key alone, so re-running an import
+updates rather than duplicates, and an import into a database with rows of
+its own leaves unrelated rows that happen to share a pk alone. Progress is checkpointed after every
+batch; an interrupted import resumes from the last committed batch.
+
+Usage:
+    python manage.py import_data data_export.jsonl
+    python manage.py import_data data_export.json --batch-size 500
+    python manage.py import_data data_export.jsonl.gz --skip-existing
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from intelligence import alliances, autocomplete, graph, rollups, spatial, stats, tiles, trends, versions
+from intelligence.datafiles import EXPORT_MODELS, FULL_EXPORT, LEGACY_EXPORT, default_source, read_records
+
+
+# Fields used to recognise a record that already exists in the database.
+# Models not listed are matched on primary key.
+MATCH_KEYS = {
+    'contenttypes.contenttype': ('app_label', 'model'),
+    'auth.group': ('name',),
+    'auth.user': ('username',),
+    'intelligence.gang': ('tag',),
+    'intelligence.gangmember': ('name', 'gang_id'),
+    'intelligence.incident': ('title', 'date_time'),
+    'intelligence.gangrelationship': ('gang_1_id', 'gang_2_id'),
+    'intelligence.casefile': ('case_number',),
+}
+
+# Rows managed by Django itself; existing ones are never overwritten
+NEVER_UPDATE = {'contenttypes.contenttype'}
+
+
+def match_value(value):
+    # The serializer keeps milliseconds only, so compare datetimes at that precision
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+
+@contextmanager
+def preserve_timestamps(model):
+    """Keep exported created_at/updated_at values instead of auto_now(_add) stamping them"""
+    toggled = []
+    for field in model._meta.concrete_fields:
+        for attr in ('auto_now', 'auto_now_add'):
+            if getattr(field, attr, False):
+                setattr(field, attr, False)
+                toggled.append((field, attr))
+    try:
+        yield
+    finally:
+        for field, attr in toggled:
+            setattr(field, attr, True)
+
+
+def reset_sequences(models):
+    """Explicit-pk inserts leave Postgres sequences behind; bump them past the highest pk like loaddata does"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+class References:
+    """Translates exported primary keys and natural keys into database ids"""
+
+    def __init__(self, pk_maps=None):
+        # model label -> {exported pk: database pk}, only where they differ
+        self.pk_maps = defaultdict(dict)
+        for label, pairs in (pk_maps or {}).items():
+            self.pk_maps[label] = {exported: actual for exported, actual in pairs}
+        self.natural = {}
+
+    def remember(self, label, exported_pk, actual_pk):
+        if exported_pk is not None and exported_pk != actual_pk:
+            self.pk_maps[label][exported_pk] = actual_pk
+
+    def resolve(self, model, value):
+        if value is None:
+            return None
+        if isinstance(value, list):
+            return self._natural_keys(model).get(tuple(value))
+        return self.pk_maps[model._meta.label_lower].get(value, value)
+
+    def add_natural(self, obj):
+        label = obj._meta.label_lower
+        if label in self.natural and hasattr(obj, 'natural_key'):
+            self.natural[label][tuple(obj.natural_key())] = obj.pk
+
+    def _natural_keys(self, model):
+        label = model._meta.label_lower
+        if label not in self.natural:
+            rows = model._default_manager.select_related()
+            self.natural[label] = {tuple(obj.natural_key()): obj.pk for obj in rows}
+        return self.natural[label]
+
+    def serializable(self):
+        return {label: list(pairs.items()) for label, pairs in self.pk_maps.items() if pairs}
+
+
+class Checkpoint:
+    """Progress file next to the source, tied to the source's size and mtime"""
+
+    def __init__(self, source):
+        self.path = f'{source}.checkpoint.json'
+        stat = os.stat(source)
+        self.fingerprint = [stat.st_size, int(stat.st_mtime)]
+        self.phase = 'rows'
+        self.position = 0
+        self.pk_maps = {}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('fingerprint') != self.fingerprint:
+            return False
+        self.phase = data['phase']
+        self.position = data['position']
+        self.pk_maps = data.get('pk_maps', {})
+        return True
+
+    def save(self, phase, position, references):
+        self.phase, self.position = phase, position
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fingerprint': self.fingerprint,
+                'phase': phase,
+                'position': position,
+                'pk_maps': references.serializable(),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load an export_data file: batched, idempotent and resumable'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', nargs='?', help=f'Export file to load (default: {FULL_EXPORT}, else {LEGACY_EXPORT})'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert / transaction')
+        parser.add_argument('--skip-existing', action='store_true', help='Insert new rows only; leave matches untouched')
+        parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint and start from the top')
+
+    def handle(self, *args, **options):
+        source = options['source'] or default_source()
+        if not os.path.exists(source):
+            raise CommandError(f'{source} does not exist')
+
+        self.batch_size = options['batch_size']
+        self.skip_existing = options['skip_existing']
+        self.checkpoint = Checkpoint(source)
+        if not options['restart'] and self.checkpoint.load():
+            self.stdout.write(self.style.WARNING(
+                f'Resuming {source} from {self.checkpoint.phase} position {self.checkpoint.position}'
+            ))
+        self.references = References(self.checkpoint.pk_maps)
+        self.timings = defaultdict(lambda: [0, 0.0])  # label -> [rows, seconds]
+        start = time.monotonic()
+
+        if self.checkpoint.phase == 'rows':
+            self.load_rows(source)
+            self.checkpoint.save('links', 0, self.references)
+        self.load_links(source)
+
+        # Every imported model, not only this run's inserts: a resumed run did not see the earlier ones
+        reset_sequences([apps.get_model(label) for label in EXPORT_MODELS])
+        rollups.rebuild_all()
+        trends.rebuild_all()
+        stats.reconcile()
+        tiles.clear()
+        versions.bump(*apps.get_models())
+        # bulk_create sends no signals, so the running processes' indexes are dropped here
+        for index in (graph, spatial, autocomplete, alliances):
+            index.invalidate()
+        spatial.invalidate_territories()
+        self.checkpoint.clear()
+
+        total_rows = sum(rows for rows, _ in self.timings.values())
+        elapsed = time.monotonic() - start
+        for label, (rows, seconds) in self.timings.items():
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f'  {label}: {rows} rows ({rate:,.0f} rows/sec)')
+        rate = total_rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)'
+        ))
+
+    # ===================================
+    # PASS 1: ROWS
+    # ===================================
+
+    def load_rows(self, source):
+        batch, label = [], None
+        for position, record in read_records(source):
+            if position <= self.checkpoint.position:
+                continue
+            if batch and (record['model'] != label or len(batch) >= self.batch_size):
+                self.write_rows(label, batch)
+                batch = []
+            label = record['model']
+            batch.append((position, record))
+        if batch:
+            self.write_rows(label, batch)
+
+    def build(self, model, record):
+        """Unsaved instance from a serialized record, with references translated"""
+        values = {}
+        for name, value in record['fields'].items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                continue
+            if field.is_relation:
+                values[field.attname] = self.references.resolve(field.remote_field.model, value)
+            else:
+                values[field.attname] = field.to_python(value)
+        obj = model(**values)
+        if record.get('pk') is not None:
+            obj.pk = model._meta.pk.to_python(record['pk'])
+        if hasattr(obj, 'canonicalise'):
+            # e.g. relationships exported before pairs were stored low id first
+            obj.canonicalise()
+        return obj
+
+    def write_rows(self, label, batch):
+        model = apps.get_model(label)
+        started = time.monotonic()
+        objs = [(record.get('pk'), self.build(model, record)) for _, record in batch]
+
+        key_fields = MATCH_KEYS.get(label)
+        if key_fields:
+            key_of = lambda obj: tuple(match_value(getattr(obj, field)) for field in key_fields)  # noqa: E731
+            first = key_fields[0]
+            rows = model._default_manager.filter(
+                **{f'{first}__in': {getattr(obj, first) for _, obj in objs}}
+            ).order_by('pk').values_list('pk', *key_fields)
+            # Rows sharing a key are handed out oldest first, each to one record
+            matches = defaultdict(list)
+            for pk, *key in rows:
+                matches[tuple(match_value(value) for value in key)].append(pk)
+        else:
+            key_of = lambda obj: obj.pk  # noqa: E731
+            matches = {
+                pk: [pk] for pk in model._default_manager.filter(
+                    pk__in=[obj.pk for _, obj in objs if obj.pk is not None]
+                ).values_list('pk', flat=True)
+            }
+
+        # Exported pks already used by some other row cannot be reused
+        wanted_pks = [obj.pk for _, obj in objs if obj.pk is not None]
+        taken_pks = set(model._default_manager.filter(pk__in=wanted_pks).values_list('pk', flat=True))
+
+        to_create, to_update = [], []
+        for exported_pk, obj in objs:
+            candidates = matches.get(key_of(obj))
+            match = None
+            if candidates:
+                # The row the record was exported from, when it is one of them
+                match = obj.pk if obj.pk in candidates else candidates[0]
+                candidates.remove(match)
+            if match is not None:
+                obj.pk = match
+                if label not in NEVER_UPDATE and not self.skip_existing:
+                    to_update.append(obj)
+                self.references.remember(label, exported_pk, match)
+                continue
+            if obj.pk in taken_pks:
+                obj.pk = None
+            to_create.append((exported_pk, obj))
+
+        # Only overwrite columns the export actually carries
+        exported = {name for _, record in batch for name in record['fields']}
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key and field.name in exported
+        ]
+        explicit = [obj for _, obj in to_create if obj.pk is not None]
+        generated = [obj for _, obj in to_create if obj.pk is None]
+        with transaction.atomic(), preserve_timestamps(model):
+            model._default_manager.bulk_create(explicit)
+            if explicit and generated:
+                # Otherwise the sequence can hand out a pk just inserted explicitly
+                reset_sequences([model])
+            model._default_manager.bulk_create(generated)
+            if to_update:
+                model._default_manager.bulk_update(to_update, fields)
+
+        for exported_pk, obj in to_create:
+            self.references.remember(label, exported_pk, obj.pk)
+            self.references.add_natural(obj)
+        self.checkpoint.save('rows', batch[-1][0], self.references)
+
+        timing = self.timings[label]
+        timing[0] += len(batch)
+        timing[1] += time.monotonic() - started
+
+    # ===================================
+    # PASS 2: M2M LINKS
+    # ===================================
+
+    def load_links(self, source):
+        batch, label = [], None
+        for position, record in read_records(source):
+            if position <= self.checkpoint.position:
+                continue
+            model = apps.get_model(record['model'])
+            if not any(model._meta.get_field(name).many_to_many for name in record['fields']):
+                continue
+            if batch and (record['model'] != label or len(batch) >= self.batch_size):
+                self.write_links(label, batch)
+                batch = []
+            label = record['model']
+            batch.append((position, record))
+        if batch:
+            self.write_links(label, batch)
+
+    def owner_pk(self, model, record):
+        if record.get('pk') is not None:
+            return self.references.resolve(model, record['pk'])
+        # Natural-primary-key records (users) carry no pk; find them by natural key
+        key_fields = MATCH_KEYS.get(model._meta.label_lower)
+        lookup = {field: record['fields'][field] for field in key_fields}
+        return model._default_manager.filter(**lookup).values_list('pk', flat=True).first()
+
+    def write_links(self, label, batch):
+        model = apps.get_model(label)
+        links = defaultdict(dict)  # m2m field -> {owner pk: [target pks]}
+        for _, record in batch:
+            owner = self.owner_pk(model, record)
+            if owner is None:
+                continue
+            for name, values in record['fields'].items():
+                field = model._meta.get_field(name)
+                if not field.many_to_many or not field.remote_field.through._meta.auto_created:
+                    continue
+                targets = [self.references.resolve(field.remote_field.model, value) for value in values]
+                links[field][owner] = [target for target in dict.fromkeys(targets) if target is not None]
+
+        with transaction.atomic():
+            for field, owners in links.items():
+                through = field.remote_field.through
+                source_column, target_column = field.m2m_column_name(), field.m2m_reverse_name()
+                owned = Q(**{f'{source_column}__in': list(owners)})
+                pairs = {(owner, target) for owner, targets in owners.items() for target in targets}
+                symmetrical = field.remote_field.symmetrical
+                if symmetrical:
+                    # Self-referencing symmetrical M2Ms store both directions
+                    owned |= Q(**{f'{target_column}__in': list(owners)})
+                    pairs |= {(target, owner) for owner, target in pairs}
+                if self.skip_existing:
+                    pairs -= set(through.objects.filter(owned).values_list(source_column, target_column))
+                else:
+                    through.objects.filter(owned).delete()
+                through.objects.bulk_create(
+                    [through(**{source_column: owner, target_column: target}) for owner, target in sorted(pairs)],
+                    ignore_conflicts=symmetrical,
+                )
+        self.checkpoint.save('links', batch[-1][0], self.references)
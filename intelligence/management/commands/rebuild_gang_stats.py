@@ -0,0 +1,17 @@
+"""
+Recompute the GangStats rollup for every gang.
+
+Usage:
+    python manage.py rebuild_gang_stats
+"""
+from django.core.management.base import BaseCommand
+
+from intelligence import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-gang GangStats rollups from scratch'
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {count} gang(s)'))
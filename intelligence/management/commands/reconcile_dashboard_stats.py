@@ -0,0 +1,26 @@
+"""
+Recompute the cached dashboard statistics from the database.
+
+Run periodically (cron / Railway scheduled job) to repair counter drift from
+writes that bypass model signals. The dashboard also reconciles on its own
+once DASHBOARD_STATS_RECONCILE_SECONDS has passed.
+
+Usage:
+    python manage.py reconcile_dashboard_stats
+"""
+from django.core.management.base import BaseCommand
+
+from intelligence import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute cached dashboard counters and repair drift'
+
+    def handle(self, *args, **options):
+        drift = stats.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Dashboard statistics in sync'))
+            return
+        for name, (cached, actual) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f'{name}: cached {cached} -> actual {actual}'))
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(drift)} counter(s)'))
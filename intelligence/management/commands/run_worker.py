@@ -0,0 +1,134 @@
+"""
+Run queued background jobs (see intelligence.jobs), such as resizing uploads.
+
+Polls the Job table, claims due jobs and runs them in a pool of worker
+processes, so a slow or crashing handler never holds up the poll loop or
+takes it down. Several workers can share one database. SIGTERM stops the
+worker claiming new jobs and it exits once the running ones finish; Ctrl-C
+also interrupts the pool's processes, and their jobs are retried later.
+
+Usage:
+    python manage.py run_worker
+    python manage.py run_worker --processes 4 --poll 2
+    python manage.py run_worker --once          # drain due jobs, then exit
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from intelligence import jobs
+
+
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOB_WORKER_PROCESSES,
+            help='Worker processes; 0 runs jobs in this process',
+        )
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--once', action='store_true', help='Exit once no due jobs are left')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0 or options['poll'] <= 0:
+            raise CommandError('--processes must not be negative and --poll must be positive')
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stopping.set())
+
+        where = f'{options["processes"]} processes' if options['processes'] else 'this process'
+        self.stdout.write(f'Worker {self.worker} running jobs in {where}')
+        self.done = self.failed = 0
+        if options['processes']:
+            self.run_pool(options['processes'], options['poll'], options['once'])
+        else:
+            self.run_inline(options['poll'], options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped: {self.done} done, {self.failed} failed'))
+
+    def poll(self, limit):
+        """Housekeeping, then claim up to `limit` due jobs"""
+        close_old_connections()
+        if jobs.requeue_expired():
+            self.stderr.write(self.style.WARNING('Requeued jobs whose lease expired'))
+        if time.monotonic() >= self.next_prune:
+            jobs.prune()
+            self.next_prune = time.monotonic() + PRUNE_INTERVAL
+        return jobs.claim(self.worker, limit) if limit else []
+
+    def record(self, job, error, elapsed):
+        jobs.finish(job, self.worker, error)
+        if error is None:
+            self.done += 1
+            self.stdout.write(f'  {job.kind} #{job.pk} done ({elapsed:.2f}s)')
+        else:
+            self.failed += 1
+            self.stderr.write(f'  {job.kind} #{job.pk} failed on attempt {job.attempts}: {error.strip().splitlines()[-1]}')
+
+    def run_inline(self, poll, once):
+        self.next_prune = 0
+        while not self.stopping.is_set():
+            claimed = self.poll(1)
+            if not claimed:
+                if once:
+                    break
+                self.stopping.wait(poll)
+                continue
+            job = claimed[0]
+            start = time.monotonic()
+            self.record(job, jobs.execute(job.kind, job.payload), time.monotonic() - start)
+
+    def run_pool(self, processes, poll, once):
+        self.next_prune = 0
+        running = {}
+        pool = self.start_pool(processes)
+        try:
+            while running or not self.stopping.is_set():
+                if not self.stopping.is_set():
+                    for job in self.poll(processes - len(running)):
+                        running[pool.submit(jobs.execute, job.kind, job.payload)] = (job, time.monotonic())
+                if not running:
+                    if once:
+                        break
+                    self.stopping.wait(poll)
+                    continue
+                finished, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    job, start = running.pop(future)
+                    try:
+                        error = future.result()
+                    except BrokenProcessPool:
+                        # A process died mid-job (killed, out of memory); every job it had is lost
+                        error = 'Worker process died while running the job'
+                        broken = True
+                    self.record(job, error, time.monotonic() - start)
+                if broken:
+                    pool.shutdown(wait=False)
+                    for future, (job, start) in running.items():
+                        self.record(job, 'Worker process died while running the job', time.monotonic() - start)
+                    running.clear()
+                    pool = self.start_pool(processes)
+        finally:
+            pool.shutdown(wait=True)
+
+    def start_pool(self, processes):
+        # spawn, not fork: a forked child would share this process's database connections.
+        # The initializer has to be importable before Django is set up, so nothing from intelligence.
+        return ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
@@ -0,0 +1,85 @@
+"""
+Run gunicorn and the job worker together, as the deploy start command.
+
+Both run as child processes of this command. A worker that exits is started
+again after RESTART_DELAY seconds, doubled after each crash within
+STABLE_SECONDS of starting, so queued jobs (see intelligence.jobs) keep
+running without a separate worker service, and with media on a volume the
+worker sees the same files as the web server. When gunicorn exits the worker
+is stopped and this command exits with gunicorn's status, leaving the restart
+to the platform. SIGTERM is passed on to both.
+
+Usage:
+    python manage.py serve                  # gunicorn on $PORT plus run_worker
+    python manage.py serve --no-worker      # gunicorn only; run_worker is deployed separately
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+STABLE_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = 'Run gunicorn, plus run_worker restarted whenever it exits'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind', default=f'0.0.0.0:{os.environ.get("PORT", "8000")}',
+            help='Address gunicorn listens on (default 0.0.0.0:$PORT)',
+        )
+        parser.add_argument('--no-worker', action='store_true', help='Run gunicorn only')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        self.children = []
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        web = self.start([sys.executable, '-m', 'gunicorn', 'sa_doj.wsgi:application', '--bind', options['bind']])
+        worker = None
+        started_at = restart_at = delay = 0
+        while web.poll() is None:
+            if not options['no_worker'] and not self.stopping:
+                if worker is not None and worker.poll() is not None:
+                    if time.monotonic() - started_at < STABLE_SECONDS:
+                        delay = min(max(delay * 2, RESTART_DELAY), MAX_RESTART_DELAY)
+                    else:
+                        delay = RESTART_DELAY
+                    restart_at = time.monotonic() + delay
+                    self.stderr.write(self.style.WARNING(
+                        f'Worker exited with status {worker.returncode}; restarting in {delay}s'
+                    ))
+                    self.children.remove(worker)
+                    worker = None
+                if worker is None and time.monotonic() >= restart_at:
+                    worker = self.start([sys.executable, str(settings.BASE_DIR / 'manage.py'), 'run_worker'])
+                    started_at = time.monotonic()
+            time.sleep(1)
+
+        if worker is not None and worker.poll() is None:
+            worker.terminate()
+            worker.wait()
+        if web.returncode and not self.stopping:
+            sys.exit(web.returncode)
+
+    def start(self, command):
+        child = subprocess.Popen(command)
+        self.children.append(child)
+        return child
+
+    def stop(self, signum, frame):
+        """Stop starting workers and pass SIGTERM on; a terminal's Ctrl-C already reaches the children"""
+        self.stopping = True
+        if signum == signal.SIGTERM:
+            for child in self.children:
+                if child.poll() is None:
+                    child.terminate()
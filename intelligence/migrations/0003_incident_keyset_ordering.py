@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0002_casefile_image'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='incident',
+            options={'ordering': ['-date_time', '-id']},
+        ),
+    ]
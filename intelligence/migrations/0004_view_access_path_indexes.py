@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0003_incident_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['status', 'priority', '-opened_date'], name='case_status_prio_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['priority', '-opened_date'], name='case_prio_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gang',
+            index=models.Index(fields=['is_active', 'threat_level'], name='gang_active_threat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gang',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['threat_level', 'name'], name='gang_active_threat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gangmember',
+            index=models.Index(fields=['status', 'threat_level', 'gang'], name='member_status_threat_gang_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gangmember',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['gang', 'name'], name='member_active_gang_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-date_time', '-id'], name='incident_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['status', 'severity', '-date_time', '-id'], name='incident_status_sev_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['severity', '-date_time', '-id'], name='incident_sev_date_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:47
+
+from django.db import migrations, models
+
+
+LEVEL_RANKS = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4, 'URGENT': 4}
+
+RANKED_FIELDS = [
+    ('Gang', 'threat_level', 'threat_rank'),
+    ('GangMember', 'threat_level', 'threat_rank'),
+    ('Incident', 'severity', 'severity_rank'),
+    ('CaseFile', 'priority', 'priority_rank'),
+]
+
+
+def backfill_ranks(apps, schema_editor):
+    for model_name, label, rank in RANKED_FIELDS:
+        model = apps.get_model('intelligence', model_name)
+        for level, value in LEVEL_RANKS.items():
+            model.objects.filter(**{label: level}).update(**{rank: value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0004_view_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='casefile',
+            options={'ordering': ['-priority_rank', '-opened_date']},
+        ),
+        migrations.AlterModelOptions(
+            name='gang',
+            options={'ordering': ['-threat_rank', 'name']},
+        ),
+        migrations.RemoveIndex(
+            model_name='casefile',
+            name='case_status_prio_opened_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='gang',
+            name='gang_active_threat_name_idx',
+        ),
+        migrations.AddField(
+            model_name='casefile',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gang',
+            name='threat_rank',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gangmember',
+            name='threat_rank',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='severity_rank',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['status', '-priority_rank', '-opened_date'], name='case_status_rank_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casefile',
+            index=models.Index(fields=['-priority_rank', '-opened_date'], name='case_rank_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gang',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-threat_rank', 'name'], name='gang_active_rank_name_idx'),
+        ),
+    ]
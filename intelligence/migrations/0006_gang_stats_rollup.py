@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0005_level_rank_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GangStats',
+            fields=[
+                ('gang', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='intelligence.gang')),
+                ('active_member_count', models.PositiveIntegerField(default=0)),
+                ('incident_count', models.PositiveIntegerField(default=0)),
+                ('incidents_by_type', models.JSONField(blank=True, default=dict)),
+                ('incidents_by_severity', models.JSONField(blank=True, default=dict)),
+                ('last_incident_at', models.DateTimeField(blank=True, null=True)),
+                ('open_case_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Gang statistics',
+                'verbose_name_plural': 'Gang statistics',
+            },
+        ),
+    ]
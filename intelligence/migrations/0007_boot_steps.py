@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0006_gang_stats_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BootStep',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('duration', models.FloatField(default=0, help_text='Seconds the step took when it last ran')),
+                ('completed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from intelligence import search
+    search.install(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    from intelligence import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0007_boot_steps'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0008_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberCentrality',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='centrality', serialize=False, to='intelligence.gangmember')),
+                ('degree', models.PositiveIntegerField(default=0, help_text='Distinct members linked to')),
+                ('weighted_degree', models.FloatField(default=0, help_text='Links counted once per shared tie')),
+                ('betweenness', models.FloatField(default=0)),
+                ('pagerank', models.FloatField(default=0)),
+                ('key_player_score', models.FloatField(db_index=True, default=0, help_text='0-100 blend of the percentile ranks')),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Member centrality',
+                'verbose_name_plural': 'Member centrality',
+            },
+        ),
+    ]
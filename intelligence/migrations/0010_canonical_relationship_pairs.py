@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+def canonicalise_pairs(apps, schema_editor):
+    """Store every pair as gang_1 < gang_2, keeping the newest row where both orders exist"""
+    GangRelationship = apps.get_model('intelligence', 'GangRelationship')
+    GangRelationship.objects.filter(gang_1=models.F('gang_2')).delete()
+    for relationship in GangRelationship.objects.filter(gang_1__gt=models.F('gang_2')).order_by('pk'):
+        canonical = GangRelationship.objects.filter(
+            gang_1_id=relationship.gang_2_id, gang_2_id=relationship.gang_1_id
+        ).first()
+        if canonical is not None:
+            if canonical.updated_at >= relationship.updated_at:
+                relationship.delete()
+                continue
+            canonical.delete()
+        GangRelationship.objects.filter(pk=relationship.pk).update(
+            gang_1_id=relationship.gang_2_id, gang_2_id=relationship.gang_1_id
+        )
+    if schema_editor.connection.vendor == 'postgresql':
+        # The swaps queue deferred FK checks, and Postgres refuses the ALTER TABLE
+        # of AddConstraint below while they are pending; run them now
+        schema_editor.connection.check_constraints()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0009_member_centrality'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalise_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='gangrelationship',
+            constraint=models.CheckConstraint(check=models.Q(('gang_1__lt', models.F('gang_2'))), name='relationship_canonical_pair'),
+        ),
+    ]
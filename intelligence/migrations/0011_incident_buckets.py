@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0010_canonical_relationship_pairs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the hour or local day')),
+                ('incident_type', models.CharField(max_length=50)),
+                ('severity', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('gang', models.ForeignKey(blank=True, help_text='Blank for the total over all incidents, whichever gangs were involved', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='incident_buckets', to='intelligence.gang')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='incidentbucket',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'incident_type', 'severity', 'gang'), name='incident_bucket_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='incidentbucket',
+            constraint=models.UniqueConstraint(condition=models.Q(('gang__isnull', True)), fields=('granularity', 'bucket_start', 'incident_type', 'severity'), name='incident_bucket_total_unique'),
+        ),
+    ]
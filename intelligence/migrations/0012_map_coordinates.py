@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0011_incident_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gang',
+            name='territory_area',
+            field=models.JSONField(blank=True, default=list, help_text='Territory polygons, each a list of [x, y] map points'),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='map_x',
+            field=models.FloatField(blank=True, help_text='Map X coordinate in metres (east)', null=True),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='map_y',
+            field=models.FloatField(blank=True, help_text='Map Y coordinate in metres (north)', null=True),
+        ),
+    ]
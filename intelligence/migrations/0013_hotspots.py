@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0012_map_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotspot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(help_text='1 for the highest score')),
+                ('score', models.FloatField(help_text='Incidents inside, weighted by severity')),
+                ('peak_density', models.FloatField(help_text='Highest smoothed weight per grid cell')),
+                ('incident_count', models.PositiveIntegerField(default=0)),
+                ('center_x', models.FloatField()),
+                ('center_y', models.FloatField()),
+                ('polygon', models.JSONField(default=list, help_text='Outline as [[x, y], ...] in map metres')),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HotspotBin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('cell_x', models.IntegerField()),
+                ('cell_y', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('weight', models.FloatField(default=0, help_text='Incidents weighted by severity')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HotspotRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('cell_size', models.FloatField(help_text='Grid cell edge in metres the bins were computed with')),
+                ('window_days', models.PositiveIntegerField()),
+                ('days_rebinned', models.PositiveIntegerField(default=0)),
+                ('hotspot_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'get_latest_by': 'started_at',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hotspotbin',
+            constraint=models.UniqueConstraint(fields=('date', 'cell_x', 'cell_y'), name='hotspot_bin_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0013_hotspots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casefile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the image, kept by intelligence.images'),
+        ),
+        migrations.AddField(
+            model_name='gangmember',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the photo, kept by intelligence.images'),
+        ),
+    ]
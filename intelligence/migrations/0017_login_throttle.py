@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0016_data_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginAttemptCount',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LoginBucket',
+            fields=[
+                ('key', models.CharField(max_length=80, primary_key=True, serialize=False)),
+                ('full_at', models.FloatField(help_text='Unix time at which the bucket is full again')),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0017_login_throttle'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gangmember',
+            index=models.Index(fields=['status', '-threat_rank', 'name'], name='member_status_rank_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['status', '-severity_rank', '-date_time', '-id'], name='incident_status_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['-severity_rank', '-date_time', '-id'], name='incident_rank_date_idx'),
+        ),
+    ]
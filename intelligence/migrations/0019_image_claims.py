@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('intelligence', '0018_rank_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageClaim',
+            fields=[
+                ('key', models.CharField(help_text='<model label>:<sha256>', max_length=170, primary_key=True, serialize=False)),
+                ('row_id', models.BigIntegerField()),
+                ('claimed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
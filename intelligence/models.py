@@ -1,14 +1,91 @@
 from django.db import models
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 
-class Gang(models.Model):
+# Numeric ranks for the LOW..CRITICAL style labels so "most critical first"
+# sorts correctly (the labels sort lexicographically) and from an index
+LEVEL_RANKS = {
+    'LOW': 1,
+    'MEDIUM': 2,
+    'HIGH': 3,
+    'CRITICAL': 4,
+    'URGENT': 4,
+}
+
+
+def level_rank(level):
+    """Numeric rank for a threat/severity/priority label (0 if unknown)"""
+    return LEVEL_RANKS.get(level, 0)
+
+
+def level_rank_expression(level):
+    """level_rank in SQL, for a label given as an expression (F, Case, ...) in an update"""
+    return models.Case(
+        *[
+            models.When(Exact(level, models.Value(label)), then=models.Value(rank))
+            for label, rank in LEVEL_RANKS.items()
+        ],
+        default=models.Value(0),
+        output_field=models.PositiveSmallIntegerField(),
+    )
+
+
+class RankedQuerySet(models.QuerySet):
+    """
+    QuerySet that keeps a model's denormalised rank columns in step with their
+    label fields on bulk writes, which bypass save() and the pre_save signal.
+    Models list their pairs in RANKED_FIELDS, e.g. {'threat_level': 'threat_rank'}.
+    """
+
+    def update(self, **kwargs):
+        for label, rank in self.model.RANKED_FIELDS.items():
+            if label not in kwargs or rank in kwargs:
+                continue
+            value = kwargs[label]
+            if hasattr(value, 'resolve_expression'):
+                kwargs[rank] = level_rank_expression(value)
+            else:
+                kwargs[rank] = level_rank(value)
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        for label, rank in self.model.RANKED_FIELDS.items():
+            if label in fields and rank not in fields:
+                fields.append(rank)
+        for obj in objs:
+            obj.sync_ranks()
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.sync_ranks()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class RankedModelMixin:
+    """Recomputes rank columns from label fields (called from the pre_save signal)"""
+    RANKED_FIELDS = {}
+
+    def sync_ranks(self):
+        for label, rank in self.RANKED_FIELDS.items():
+            setattr(self, rank, level_rank(getattr(self, label)))
+
+
+class Gang(RankedModelMixin, models.Model):
     """Gang organization model"""
+    RANKED_FIELDS = {'threat_level': 'threat_rank'}
+
     name = models.CharField(max_length=200)
     tag = models.CharField(max_length=10, help_text="Gang tag/abbreviation")
     color = models.CharField(max_length=7, default="#FF0000", help_text="Hex color code")
     territory = models.TextField(blank=True, help_text="Territory description")
+    territory_area = models.JSONField(
+        default=list, blank=True, help_text="Territory polygons, each a list of [x, y] map points"
+    )
     threat_level = models.CharField(
         max_length=20,
         choices=[
@@ -19,6 +96,7 @@ class Gang(models.Model):
         ],
         default='MEDIUM'
     )
+    threat_rank = models.PositiveSmallIntegerField(default=0, editable=False)
     founded_date = models.DateField(null=True, blank=True)
     member_count = models.IntegerField(default=0)
     description = models.TextField(blank=True)
@@ -26,20 +104,35 @@ class Gang(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RankedQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-threat_level', 'name']
+        ordering = ['-threat_rank', 'name']
+        indexes = [
+            models.Index(fields=['is_active', 'threat_level'], name='gang_active_threat_idx'),
+            models.Index(
+                fields=['-threat_rank', 'name'],
+                name='gang_active_rank_name_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.tag})"
 
 
-class GangMember(models.Model):
+class GangMember(RankedModelMixin, models.Model):
     """Gang member profile"""
+    RANKED_FIELDS = {'threat_level': 'threat_rank'}
+
     gang = models.ForeignKey(Gang, on_delete=models.CASCADE, related_name='members')
     name = models.CharField(max_length=200)
     alias = models.CharField(max_length=200, blank=True)
     rank = models.CharField(max_length=100, blank=True)
     photo = models.ImageField(upload_to='members/', blank=True, null=True)
+    photo_variants = models.JSONField(
+        default=dict, blank=True, editable=False, help_text="Resized copies of the photo, kept by intelligence.images"
+    )
     date_of_birth = models.DateField(null=True, blank=True)
     known_associates = models.ManyToManyField('self', blank=True, symmetrical=True)
     criminal_record = models.TextField(blank=True)
@@ -65,19 +158,33 @@ class GangMember(models.Model):
         ],
         default='LOW'
     )
+    threat_rank = models.PositiveSmallIntegerField(default=0, editable=False)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RankedQuerySet.as_manager()
+
     class Meta:
         ordering = ['gang', 'name']
+        indexes = [
+            models.Index(fields=['status', 'threat_level', 'gang'], name='member_status_threat_gang_idx'),
+            models.Index(fields=['status', '-threat_rank', 'name'], name='member_status_rank_name_idx'),
+            models.Index(
+                fields=['gang', 'name'],
+                name='member_active_gang_name_idx',
+                condition=models.Q(status='ACTIVE'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.gang.tag}"
 
 
-class Incident(models.Model):
+class Incident(RankedModelMixin, models.Model):
     """Incident report"""
+    RANKED_FIELDS = {'severity': 'severity_rank'}
+
     title = models.CharField(max_length=300)
     incident_type = models.CharField(
         max_length=50,
@@ -94,6 +201,8 @@ class Incident(models.Model):
     gangs_involved = models.ManyToManyField(Gang, related_name='incidents', blank=True)
     members_involved = models.ManyToManyField(GangMember, related_name='incidents', blank=True)
     location = models.CharField(max_length=300)
+    map_x = models.FloatField(null=True, blank=True, help_text="Map X coordinate in metres (east)")
+    map_y = models.FloatField(null=True, blank=True, help_text="Map Y coordinate in metres (north)")
     date_time = models.DateTimeField(default=timezone.now)
     description = models.TextField()
     severity = models.CharField(
@@ -106,6 +215,7 @@ class Incident(models.Model):
         ],
         default='MEDIUM'
     )
+    severity_rank = models.PositiveSmallIntegerField(default=0, editable=False)
     status = models.CharField(
         max_length=20,
         choices=[
@@ -120,15 +230,58 @@ class Incident(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RankedQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-date_time']
+        # id breaks ties so keyset pagination has a total order
+        ordering = ['-date_time', '-id']
+        indexes = [
+            models.Index(fields=['-date_time', '-id'], name='incident_date_id_idx'),
+            models.Index(fields=['status', 'severity', '-date_time', '-id'], name='incident_status_sev_date_idx'),
+            models.Index(fields=['severity', '-date_time', '-id'], name='incident_sev_date_idx'),
+            # Severity sort of the incident list (see KeysetPaginator's rank_field)
+            models.Index(
+                fields=['status', '-severity_rank', '-date_time', '-id'], name='incident_status_rank_date_idx'
+            ),
+            models.Index(fields=['-severity_rank', '-date_time', '-id'], name='incident_rank_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.date_time.strftime('%Y-%m-%d')}"
 
 
+def canonical_pair(gang_a, gang_b):
+    """Two gangs (or gang ids) as the (lower id, higher id) pair relationships are stored under"""
+    a = getattr(gang_a, 'pk', gang_a)
+    b = getattr(gang_b, 'pk', gang_b)
+    return (a, b) if a <= b else (b, a)
+
+
+class RelationshipQuerySet(models.QuerySet):
+    """
+    Relationships are undirected and stored once per pair with gang_1 < gang_2,
+    so a pair lookup is a single indexed equality match in either order.
+    Bulk writes bypass save() and the pre_save signal, so they canonicalise here.
+    """
+
+    def between(self, gang_a, gang_b):
+        gang_1, gang_2 = canonical_pair(gang_a, gang_b)
+        return self.filter(gang_1_id=gang_1, gang_2_id=gang_2)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.canonicalise()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        for obj in objs:
+            obj.canonicalise()
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
 class GangRelationship(models.Model):
-    """Relationship between gangs"""
+    """Relationship between gangs (undirected; stored with gang_1_id < gang_2_id)"""
     gang_1 = models.ForeignKey(Gang, on_delete=models.CASCADE, related_name='relationships_as_gang1')
     gang_2 = models.ForeignKey(Gang, on_delete=models.CASCADE, related_name='relationships_as_gang2')
     relationship_type = models.CharField(
@@ -145,15 +298,27 @@ class GangRelationship(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RelationshipQuerySet.as_manager()
+
     class Meta:
         unique_together = ['gang_1', 'gang_2']
+        constraints = [
+            models.CheckConstraint(check=models.Q(gang_1__lt=models.F('gang_2')), name='relationship_canonical_pair'),
+        ]
 
     def __str__(self):
         return f"{self.gang_1.tag} - {self.relationship_type} - {self.gang_2.tag}"
 
+    def canonicalise(self):
+        """Swap the gangs if needed so gang_1_id < gang_2_id (called from the pre_save signal)"""
+        if self.gang_1_id is not None and self.gang_2_id is not None and self.gang_1_id > self.gang_2_id:
+            self.gang_1_id, self.gang_2_id = self.gang_2_id, self.gang_1_id
+
 
-class CaseFile(models.Model):
+class CaseFile(RankedModelMixin, models.Model):
     """Case file for investigations"""
+    RANKED_FIELDS = {'priority': 'priority_rank'}
+
     case_number = models.CharField(max_length=50, unique=True)
     title = models.CharField(max_length=300)
     gangs = models.ManyToManyField(Gang, related_name='cases', blank=True)
@@ -171,6 +336,7 @@ class CaseFile(models.Model):
         ],
         default='MEDIUM'
     )
+    priority_rank = models.PositiveSmallIntegerField(default=0, editable=False)
     status = models.CharField(
         max_length=20,
         choices=[
@@ -185,12 +351,226 @@ class CaseFile(models.Model):
     closed_date = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
     image = models.ImageField(upload_to='case_files/', blank=True, null=True, help_text="Case file image/evidence")
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False, help_text="Resized copies of the image, kept by intelligence.images"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RankedQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-priority', '-opened_date']
+        ordering = ['-priority_rank', '-opened_date']
+        indexes = [
+            models.Index(fields=['status', '-priority_rank', '-opened_date'], name='case_status_rank_opened_idx'),
+            models.Index(fields=['-priority_rank', '-opened_date'], name='case_rank_opened_idx'),
+            models.Index(fields=['priority', '-opened_date'], name='case_prio_opened_idx'),
+        ]
 
     def __str__(self):
         return f"{self.case_number} - {self.title}"
 
+
+class GangStats(models.Model):
+    """Materialised per-gang rollup, recomputed for dirty gangs on commit by intelligence.rollups"""
+    gang = models.OneToOneField(Gang, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    active_member_count = models.PositiveIntegerField(default=0)
+    incident_count = models.PositiveIntegerField(default=0)
+    incidents_by_type = models.JSONField(default=dict, blank=True)
+    incidents_by_severity = models.JSONField(default=dict, blank=True)
+    last_incident_at = models.DateTimeField(null=True, blank=True)
+    open_case_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Gang statistics'
+        verbose_name_plural = 'Gang statistics'
+
+    def __str__(self):
+        return f"Stats for {self.gang.tag}"
+
+
+class IncidentBucket(models.Model):
+    """Incidents in one hour or day per type, severity and gang, kept current by intelligence.trends"""
+    HOUR = 'HOUR'
+    DAY = 'DAY'
+
+    granularity = models.CharField(max_length=4, choices=[(HOUR, 'Hour'), (DAY, 'Day')])
+    bucket_start = models.DateTimeField(help_text="Start of the hour or local day")
+    incident_type = models.CharField(max_length=50)
+    severity = models.CharField(max_length=20)
+    gang = models.ForeignKey(
+        Gang, on_delete=models.CASCADE, null=True, blank=True, related_name='incident_buckets',
+        help_text="Blank for the total over all incidents, whichever gangs were involved",
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'incident_type', 'severity', 'gang'],
+                name='incident_bucket_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'incident_type', 'severity'],
+                condition=models.Q(gang__isnull=True),
+                name='incident_bucket_total_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.incident_type}/{self.severity} at {self.bucket_start:%Y-%m-%d %H:00}"
+
+
+class MemberCentrality(models.Model):
+    """Network importance scores for a member, written by compute_centrality"""
+    member = models.OneToOneField(GangMember, on_delete=models.CASCADE, primary_key=True, related_name='centrality')
+    degree = models.PositiveIntegerField(default=0, help_text="Distinct members linked to")
+    weighted_degree = models.FloatField(default=0, help_text="Links counted once per shared tie")
+    betweenness = models.FloatField(default=0)
+    pagerank = models.FloatField(default=0)
+    key_player_score = models.FloatField(default=0, db_index=True, help_text="0-100 blend of the percentile ranks")
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Member centrality'
+        verbose_name_plural = 'Member centrality'
+
+    def __str__(self):
+        return f"Centrality for {self.member.name}"
+
+
+class HotspotBin(models.Model):
+    """Located incidents in one map grid cell on one local day, kept by compute_hotspots"""
+    date = models.DateField()
+    cell_x = models.IntegerField()
+    cell_y = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+    weight = models.FloatField(default=0, help_text="Incidents weighted by severity")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'cell_x', 'cell_y'], name='hotspot_bin_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} incident(s) in cell {self.cell_x},{self.cell_y} on {self.date}"
+
+
+class HotspotRun(models.Model):
+    """One compute_hotspots run; the latest tells the next run where to resume"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    cell_size = models.FloatField(help_text="Grid cell edge in metres the bins were computed with")
+    window_days = models.PositiveIntegerField()
+    days_rebinned = models.PositiveIntegerField(default=0)
+    hotspot_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+        get_latest_by = 'started_at'
+
+    def __str__(self):
+        return f"Hotspot run at {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class Hotspot(models.Model):
+    """An incident hotspot found by the latest compute_hotspots run"""
+    rank = models.PositiveIntegerField(help_text="1 for the highest score")
+    score = models.FloatField(help_text="Incidents inside, weighted by severity")
+    peak_density = models.FloatField(help_text="Highest smoothed weight per grid cell")
+    incident_count = models.PositiveIntegerField(default=0)
+    center_x = models.FloatField()
+    center_y = models.FloatField()
+    polygon = models.JSONField(default=list, help_text="Outline as [[x, y], ...] in map metres")
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"Hotspot #{self.rank} ({self.score:.1f})"
+
+
+class Job(models.Model):
+    """A unit of background work, queued by intelligence.jobs and run by run_worker"""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    kind = models.CharField(max_length=50)
+    key = models.CharField(max_length=200, blank=True, help_text="Pending jobs of a kind with the same key run once")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=[(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')],
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['kind', 'key', 'status'], name='job_kind_key_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class ImageClaim(models.Model):
+    """An image upload being resized for one row, by SHA-256, so identical uploads are processed once (see intelligence.images)"""
+    key = models.CharField(max_length=170, primary_key=True, help_text="<model label>:<sha256>")
+    row_id = models.BigIntegerField()
+    claimed_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.key
+
+
+class DataVersion(models.Model):
+    """Change counter of a model's rows or a map tile, behind ETags and cached files (see intelligence.versions)"""
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+
+class LoginBucket(models.Model):
+    """Token bucket of sign-in attempts from one client IP or for one agent ID (see intelligence.throttle)"""
+    key = models.CharField(max_length=80, primary_key=True)
+    full_at = models.FloatField(help_text="Unix time at which the bucket is full again")
+
+    def __str__(self):
+        return self.key
+
+
+class LoginAttemptCount(models.Model):
+    """Sign-in attempts admitted or refused by the throttle, for monitoring"""
+    name = models.CharField(max_length=30, primary_key=True)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.count}"
+
+
+class BootStep(models.Model):
+    """Input fingerprint of the last successful run of each `boot` step"""
+    name = models.CharField(max_length=50, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    duration = models.FloatField(default=0, help_text="Seconds the step took when it last ran")
+    completed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.fingerprint[:12]})"
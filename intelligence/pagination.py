@@ -0,0 +1,140 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Pages are addressed by the sort key of the row at the page boundary instead of
+an OFFSET, so fetching page N costs the same as page 1 and rows inserted while
+an agent is paging never shift or duplicate what they see. A list sorted by a
+rank column first (e.g. severity) keys its pages on (rank, time, id).
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(values):
+    """Encode a sort key tuple as an opaque, URL-safe cursor string"""
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def cursor_starting_at(moment, pk):
+    """An `after` cursor whose page begins with the row keyed (moment, pk)"""
+    return encode_cursor((moment, pk + 1))
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor, ranked=False):
+    """
+    Decode a cursor produced by encode_cursor, returning None if it is malformed
+    or, with `ranked`, lacks the leading rank (and without it, has one)
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != (3 if ranked else 2):
+        return None
+    rank = values.pop(0) if ranked else None
+    moment = parse_datetime(values[0]) if isinstance(values[0], str) else None
+    if moment is None or not _is_int(values[1]) or (ranked and not _is_int(rank)):
+        return None
+    return (rank, moment, values[1]) if ranked else (moment, values[1])
+
+
+class KeysetPage:
+    """A single page of results plus the cursors needed to move off it"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest-first on (time_field, id), or with `rank_field`
+    highest rank first and newest first within a rank.
+
+    Any filters must already be applied to the queryset; the cursor condition
+    is ANDed on top of them so status/severity filters compose with paging.
+    """
+
+    def __init__(self, queryset, time_field, per_page=25, rank_field=None):
+        self.queryset = queryset
+        self.time_field = time_field
+        self.per_page = per_page
+        self.rank_field = rank_field
+        self.fields = ((rank_field,) if rank_field else ()) + (time_field, 'pk')
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _beyond(self, key, lookup):
+        """Rows after `key` in the (fields...) order compared with `lookup` ('lt' or 'gt')"""
+        condition = Q(**{f'{self.fields[-1]}__{lookup}': key[-1]})
+        for field, value in zip(self.fields[-2::-1], key[-2::-1]):
+            condition = Q(**{f'{field}__{lookup}': value}) | (Q(**{field: value}) & condition)
+        return condition
+
+    def _older_than(self, key):
+        return self._beyond(key, 'lt')
+
+    def _newer_than(self, key):
+        return self._beyond(key, 'gt')
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the `after` cursor, or preceding the `before`
+        cursor. With neither (or an unreadable cursor) the newest page is returned.
+        """
+        ranked = self.rank_field is not None
+        after_key = decode_cursor(after, ranked)
+        before_key = decode_cursor(before, ranked)
+        descending = tuple(f'-{field}' for field in self.fields)
+        ascending = self.fields
+
+        if before_key is not None:
+            # Walk backwards towards newer rows, then flip into display order
+            rows = list(
+                self.queryset.filter(self._newer_than(before_key))
+                .order_by(*ascending)[:self.per_page + 1]
+            )
+            items = list(reversed(rows[:self.per_page]))
+            if not items:
+                return self.page()
+            previous_cursor = encode_cursor(self._key(items[0])) if len(rows) > self.per_page else None
+            next_cursor = encode_cursor(self._key(items[-1]))
+            return KeysetPage(items, next_cursor, previous_cursor)
+
+        queryset = self.queryset
+        if after_key is not None:
+            queryset = queryset.filter(self._older_than(after_key))
+        rows = list(queryset.order_by(*descending)[:self.per_page + 1])
+        items = rows[:self.per_page]
+        next_cursor = encode_cursor(self._key(items[-1])) if len(rows) > self.per_page else None
+        previous_cursor = None
+        if after_key is not None and items:
+            previous_cursor = encode_cursor(self._key(items[0]))
+        return KeysetPage(items, next_cursor, previous_cursor)
@@ -0,0 +1,125 @@
+"""
+Materialised per-gang rollups (GangStats).
+
+Writes to GangMember, Incident and CaseFile (including their gang M2Ms) mark
+the affected gangs dirty from model signals; the dirty gangs are recomputed
+once when the surrounding transaction commits, so a burst of writes touching
+the same gang costs one refresh. Pages read the precomputed GangStats rows
+instead of aggregating joins on every request.
+
+The rows are not adjusted by deltas: a refresh recomputes each dirty gang's
+counts from its member, incident and case rows with a few indexed aggregate
+queries per batch, whatever the writes were. That keeps M2M relinks, status
+changes and deletes from drifting the counts, at a cost that grows with the
+gangs touched rather than with the whole table.
+
+rebuild_gang_stats recomputes every gang from scratch.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from . import stats, versions
+from .models import Gang, GangMember, Incident, CaseFile, GangStats
+
+
+IncidentGang = Incident.gangs_involved.through
+CaseGang = CaseFile.gangs.through
+
+# Per-thread set of dirty gangs waiting for the current transaction to commit;
+# left over by a rollback, they are only refreshed once more with the next batch
+_pending = threading.local()
+
+
+def refresh_gang_stats(gang_ids):
+    """Recompute the GangStats rows for the given gangs with a handful of aggregate queries"""
+    gang_ids = set(Gang.objects.filter(id__in=set(gang_ids)).values_list('id', flat=True))
+    if not gang_ids:
+        return
+
+    members = dict(
+        GangMember.objects.filter(gang_id__in=gang_ids, status='ACTIVE')
+        .values('gang_id').annotate(n=Count('id')).values_list('gang_id', 'n')
+    )
+
+    incident_links = IncidentGang.objects.filter(gang_id__in=gang_ids)
+    incidents = {
+        row['gang_id']: row
+        for row in incident_links.values('gang_id').annotate(n=Count('incident_id'), last=Max('incident__date_time'))
+    }
+    by_type = defaultdict(dict)
+    for row in incident_links.values('gang_id', 'incident__incident_type').annotate(n=Count('incident_id')):
+        by_type[row['gang_id']][row['incident__incident_type']] = row['n']
+    by_severity = defaultdict(dict)
+    for row in incident_links.values('gang_id', 'incident__severity').annotate(n=Count('incident_id')):
+        by_severity[row['gang_id']][row['incident__severity']] = row['n']
+
+    open_cases = dict(
+        CaseGang.objects.filter(gang_id__in=gang_ids).exclude(casefile__status='CLOSED')
+        .values('gang_id').annotate(n=Count('casefile_id')).values_list('gang_id', 'n')
+    )
+
+    existing = set(GangStats.objects.filter(gang_id__in=gang_ids).values_list('gang_id', flat=True))
+    now = timezone.now()
+    rows = []
+    for gang_id in gang_ids:
+        incident_row = incidents.get(gang_id, {})
+        rows.append(GangStats(
+            gang_id=gang_id,
+            active_member_count=members.get(gang_id, 0),
+            incident_count=incident_row.get('n', 0),
+            incidents_by_type=by_type.get(gang_id, {}),
+            incidents_by_severity=by_severity.get(gang_id, {}),
+            last_incident_at=incident_row.get('last'),
+            open_case_count=open_cases.get(gang_id, 0),
+            updated_at=now,
+        ))
+
+    fields = [
+        'active_member_count', 'incident_count', 'incidents_by_type',
+        'incidents_by_severity', 'last_incident_at', 'open_case_count', 'updated_at',
+    ]
+    with transaction.atomic():
+        GangStats.objects.bulk_create([row for row in rows if row.gang_id not in existing])
+        GangStats.objects.bulk_update([row for row in rows if row.gang_id in existing], fields)
+    # The dashboard's cached gang list and the gang cards show these counts
+    stats.invalidate_lists()
+    versions.bump(GangStats)
+
+
+def rebuild_all():
+    """Recompute the rollup for every gang; returns the number of gangs refreshed"""
+    gang_ids = list(Gang.objects.values_list('id', flat=True))
+    refresh_gang_stats(gang_ids)
+    return len(gang_ids)
+
+
+def ensure_gang_stats(gangs):
+    """Build rollups for any of the given gangs that do not have one yet"""
+    missing = [gang.id for gang in gangs if not hasattr(gang, 'stats')]
+    if missing:
+        refresh_gang_stats(missing)
+    return bool(missing)
+
+
+def schedule_refresh(gang_ids):
+    """Mark gangs dirty; they are recomputed once the current transaction commits"""
+    gang_ids = {gang_id for gang_id in gang_ids if gang_id is not None}
+    if not gang_ids:
+        return
+    if not hasattr(_pending, 'gang_ids'):
+        _pending.gang_ids = set()
+    _pending.gang_ids.update(gang_ids)
+    # Every call registers a flush, so one survives a rolled back savepoint;
+    # the first to run at commit takes the whole batch and the rest find it empty
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    gang_ids = _pending.gang_ids
+    _pending.gang_ids = set()
+    if gang_ids:
+        refresh_gang_stats(gang_ids)
@@ -0,0 +1,243 @@
+"""
+Full-text search across gangs, members, incidents and case files.
+
+The index lives in the database and is maintained by the database itself, so
+every write path (views, bulk API, import_data, the admin, raw SQL) keeps it
+current without signals:
+
+- PostgreSQL: a generated, weighted `search_vector` tsvector column on each
+  table with a GIN index, queried with ts_rank.
+- SQLite: an external-content FTS5 table per model, kept in sync by insert,
+  update and delete triggers, queried with bm25.
+
+SQLite's schema editor rebuilds a table (dropping its triggers) for most
+ALTERs, so the triggers are reinstalled after every migrate run.
+
+Scores from different tables are not comparable: bm25 and ts_rank depend on
+each table's own term statistics, so a gang named after the search term can
+score below an incident that merely mentions it. Each type is therefore
+ranked on its own and the types are merged by position: every type's best
+hit first, then every type's second best, and so on, ties going to the
+order of SEARCH_FIELDS. A hit's reported score is its relevance relative to
+the best hit of its type.
+"""
+import re
+
+from django.db import NotSupportedError, connection
+
+from .models import Gang, GangMember, Incident, CaseFile
+
+
+# kind -> (model, [(field, weight)]); weight A ranks highest, D lowest
+SEARCH_FIELDS = {
+    'gang': (Gang, [('name', 'A'), ('tag', 'A'), ('territory', 'B'), ('description', 'C')]),
+    'member': (GangMember, [('name', 'A'), ('alias', 'A'), ('criminal_record', 'B'), ('notes', 'C')]),
+    'incident': (Incident, [('title', 'A'), ('location', 'B'), ('description', 'C'), ('evidence', 'C')]),
+    'case': (CaseFile, [('case_number', 'A'), ('title', 'A'), ('description', 'C'), ('notes', 'C')]),
+}
+
+# bm25 column weights standing in for PostgreSQL's setweight labels
+SQLITE_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+
+MAX_TERMS = 8
+
+
+def _table(kind):
+    return SEARCH_FIELDS[kind][0]._meta.db_table
+
+
+def _fts_table(kind):
+    return f'{_table(kind)}_fts'
+
+
+def _postgres_ddl(kind):
+    table = _table(kind)
+    vector = ' || '.join(
+        f"setweight(to_tsvector('english', coalesce({field}, '')), '{weight}')"
+        for field, weight in SEARCH_FIELDS[kind][1]
+    )
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin (search_vector)',
+    ]
+
+
+def _sqlite_ddl(kind):
+    table, fts = _table(kind), _fts_table(kind)
+    fields = [field for field, _ in SEARCH_FIELDS[kind][1]]
+    columns = ', '.join(fields)
+    new = ', '.join(f'new.{field}' for field in fields)
+    old = ', '.join(f'old.{field}' for field in fields)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+        f"content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def install(using=None):
+    """Create (or repair) the index for every searchable model; safe to rerun"""
+    conn = using or connection
+    if conn.vendor == 'postgresql':
+        statements = [sql for kind in SEARCH_FIELDS for sql in _postgres_ddl(kind)]
+    elif conn.vendor == 'sqlite':
+        statements = [sql for kind in SEARCH_FIELDS for sql in _sqlite_ddl(kind)]
+    else:
+        return
+    with conn.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def uninstall(using=None):
+    conn = using or connection
+    with conn.cursor() as cursor:
+        for kind in SEARCH_FIELDS:
+            if conn.vendor == 'postgresql':
+                cursor.execute(f'ALTER TABLE {_table(kind)} DROP COLUMN IF EXISTS search_vector')
+            elif conn.vendor == 'sqlite':
+                fts = _fts_table(kind)
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def is_installed(using=None):
+    conn = using or connection
+    if conn.vendor != 'sqlite':
+        return conn.vendor == 'postgresql'
+    return _fts_table('gang') in conn.introspection.table_names()
+
+
+def repair_after_migrate(sender, using='default', **kwargs):
+    """post_migrate receiver: put back SQLite triggers lost to table rebuilds"""
+    from django.db import connections
+    conn = connections[using]
+    if conn.vendor == 'sqlite' and is_installed(conn):
+        install(conn)
+
+
+def query_terms(query):
+    """Split free text into at most MAX_TERMS plain word tokens"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _match_expression(terms, vendor):
+    # Every term must match; the last one also matches as a prefix so
+    # results appear while the agent is still typing.
+    if vendor == 'postgresql':
+        return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _ranked_ids_sql(kinds, vendor):
+    """
+    One UNION ALL query yielding (kind, id, relevance relative to the kind's
+    best hit), ordered by position within the kind
+    """
+    parts = []
+    for kind in kinds:
+        # Lower score ranks higher within the kind
+        if vendor == 'postgresql':
+            hits = (
+                f"SELECT id, -ts_rank(search_vector, to_tsquery('english', %s)) AS score "
+                f"FROM {_table(kind)} WHERE search_vector @@ to_tsquery('english', %s)"
+            )
+        else:
+            fts = _fts_table(kind)
+            weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for _, weight in SEARCH_FIELDS[kind][1])
+            hits = f'SELECT rowid AS id, bm25({fts}, {weights}) AS score FROM {fts} WHERE {fts} MATCH %s'
+        parts.append(
+            f"SELECT '{kind}' AS kind, {list(SEARCH_FIELDS).index(kind)} AS kind_order, id, "
+            f'COALESCE(score / NULLIF(MIN(score) OVER (), 0), 1) AS relevance, '
+            f'ROW_NUMBER() OVER (ORDER BY score, id) AS position FROM ({hits}) AS {kind}_hits'
+        )
+    return (
+        'SELECT kind, id, relevance FROM (' + ' UNION ALL '.join(parts) + ') AS hits '
+        'ORDER BY position, kind_order, id LIMIT %s OFFSET %s'
+    )
+
+
+class SearchHit:
+    """One ranked result; obj is the matching model instance"""
+
+    def __init__(self, kind, obj, score):
+        self.kind = kind
+        self.obj = obj
+        self.score = score
+
+    def as_dict(self):
+        return {'type': self.kind, 'id': self.obj.pk, 'title': str(self.obj), 'score': round(self.score, 4)}
+
+
+class SearchResults:
+    """A page of hits plus whether another page follows"""
+
+    def __init__(self, query, hits, page, per_page, has_next):
+        self.query = query
+        self.hits = hits
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+
+def _queryset(kind):
+    queryset = SEARCH_FIELDS[kind][0].objects.all()
+    return queryset.select_related('gang') if kind == 'member' else queryset
+
+
+def search(query, kinds=None, page=1, per_page=20):
+    """Ranked full-text search; kinds limits the result types (default: all)"""
+    kinds = [kind for kind in (kinds or SEARCH_FIELDS) if kind in SEARCH_FIELDS]
+    terms = query_terms(query)
+    page = max(page, 1)
+    if not terms or not kinds:
+        return SearchResults(query, [], page, per_page, False)
+
+    vendor = connection.vendor
+    if vendor not in ('postgresql', 'sqlite'):
+        raise NotSupportedError(f'Full-text search is not available on {vendor}')
+
+    expression = _match_expression(terms, vendor)
+    params = []
+    for _ in kinds:
+        params.extend([expression, expression] if vendor == 'postgresql' else [expression])
+    params.extend([per_page + 1, (page - 1) * per_page])
+
+    with connection.cursor() as cursor:
+        cursor.execute(_ranked_ids_sql(kinds, vendor), params)
+        rows = cursor.fetchall()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    # One query per result type for the page's rows
+    ids_by_kind = {}
+    for kind, pk, _ in rows:
+        ids_by_kind.setdefault(kind, []).append(pk)
+    objects = {kind: _queryset(kind).in_bulk(ids) for kind, ids in ids_by_kind.items()}
+
+    hits = [
+        SearchHit(kind, objects[kind][pk], relevance)
+        for kind, pk, relevance in rows
+        if pk in objects[kind]
+    ]
+    return SearchResults(query, hits, page, per_page, has_next)
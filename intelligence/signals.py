@@ -0,0 +1,361 @@
+"""
+Model signal handlers for the intelligence app.
+
+Connected in IntelligenceConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import alliances, autocomplete, graph, images, rollups, spatial, stats, tiles, trends, versions
+from .models import Gang, GangMember, Incident, CaseFile, GangRelationship
+
+
+@receiver(pre_save, sender=Gang)
+@receiver(pre_save, sender=GangMember)
+@receiver(pre_save, sender=Incident)
+@receiver(pre_save, sender=CaseFile)
+def sync_rank_columns(sender, instance, **kwargs):
+    """Keep the numeric rank columns in step with their labels (runs for loaddata too)"""
+    instance.sync_ranks()
+
+
+@receiver(pre_save, sender=Gang)
+@receiver(pre_save, sender=GangMember)
+@receiver(pre_save, sender=Incident)
+@receiver(pre_save, sender=CaseFile)
+def remember_previous_row(sender, instance, raw=False, **kwargs):
+    """Load the row as it was before this save so post_save handlers can diff it"""
+    instance._previous_row = None
+    if not raw and instance.pk is not None:
+        instance._previous_row = sender._base_manager.filter(pk=instance.pk).first()
+
+
+def _changed(instance, *fields):
+    previous = getattr(instance, '_previous_row', None)
+    if previous is None:
+        return True
+    return any(getattr(previous, field) != getattr(instance, field) for field in fields)
+
+
+# ===================================
+# DASHBOARD STATISTICS
+# ===================================
+
+@receiver(post_save, sender=Gang)
+@receiver(post_save, sender=GangMember)
+@receiver(post_save, sender=Incident)
+@receiver(post_save, sender=CaseFile)
+def update_dashboard_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        # Fixture loads skip the bookkeeping; reconcile on the next read
+        stats.mark_stale()
+        return
+    previous = getattr(instance, '_previous_row', None)
+    for name, predicate in stats.counters_for(sender):
+        was_counted = previous is not None and predicate(previous)
+        delta = int(predicate(instance)) - int(was_counted)
+        if delta:
+            stats.adjust(name, delta)
+    if sender in stats.LIST_MODELS:
+        stats.invalidate_lists()
+
+
+@receiver(post_delete, sender=Gang)
+@receiver(post_delete, sender=GangMember)
+@receiver(post_delete, sender=Incident)
+@receiver(post_delete, sender=CaseFile)
+def update_dashboard_on_delete(sender, instance, **kwargs):
+    for name, predicate in stats.counters_for(sender):
+        if predicate(instance):
+            stats.adjust(name, -1)
+    if sender in stats.LIST_MODELS:
+        stats.invalidate_lists()
+
+
+# ===================================
+# GANG ROLLUPS
+# ===================================
+
+@receiver(post_save, sender=Gang)
+def create_gang_stats(sender, instance, created=False, **kwargs):
+    if created:
+        rollups.schedule_refresh([instance.id])
+
+
+@receiver(post_save, sender=GangMember)
+def refresh_gang_stats_for_member(sender, instance, **kwargs):
+    if _changed(instance, 'gang_id', 'status'):
+        previous = getattr(instance, '_previous_row', None)
+        rollups.schedule_refresh([instance.gang_id, previous.gang_id if previous else None])
+
+
+@receiver(post_delete, sender=GangMember)
+def refresh_gang_stats_for_deleted_member(sender, instance, **kwargs):
+    rollups.schedule_refresh([instance.gang_id])
+
+
+@receiver(post_save, sender=Incident)
+def refresh_gang_stats_for_incident(sender, instance, created=False, **kwargs):
+    # New incidents have no gangs until gangs_involved is set (handled by m2m_changed)
+    if not created and _changed(instance, 'incident_type', 'severity', 'date_time'):
+        rollups.schedule_refresh(instance.gangs_involved.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=CaseFile)
+def refresh_gang_stats_for_case(sender, instance, created=False, **kwargs):
+    if not created and _changed(instance, 'status'):
+        rollups.schedule_refresh(instance.gangs.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Incident)
+@receiver(pre_delete, sender=CaseFile)
+def refresh_gang_stats_for_deleted_record(sender, instance, **kwargs):
+    # Capture the gangs now; the M2M rows are gone by post_delete
+    gangs = instance.gangs_involved if sender is Incident else instance.gangs
+    rollups.schedule_refresh(list(gangs.values_list('id', flat=True)))
+
+
+@receiver(m2m_changed, sender=Incident.gangs_involved.through)
+@receiver(m2m_changed, sender=CaseFile.gangs.through)
+def refresh_gang_stats_for_links(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # gang.incidents / gang.cases changed: instance is the gang
+        rollups.schedule_refresh([instance.pk])
+    elif action == 'pre_clear':
+        gangs = instance.gangs_involved if sender is Incident.gangs_involved.through else instance.gangs
+        rollups.schedule_refresh(list(gangs.values_list('id', flat=True)))
+    else:
+        rollups.schedule_refresh(pk_set or [])
+
+
+# ===================================
+# INCIDENT TRENDS
+# ===================================
+
+@receiver(post_save, sender=Incident)
+def refresh_trend_buckets_for_incident(sender, instance, created=False, **kwargs):
+    if created or _changed(instance, 'incident_type', 'severity', 'date_time'):
+        previous = getattr(instance, '_previous_row', None)
+        trends.schedule_refresh([instance.date_time, previous.date_time if previous else None])
+
+
+@receiver(post_delete, sender=Incident)
+def refresh_trend_buckets_for_deleted_incident(sender, instance, **kwargs):
+    trends.schedule_refresh([instance.date_time])
+
+
+@receiver(m2m_changed, sender=Incident.gangs_involved.through)
+def refresh_trend_buckets_for_gangs(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        trends.schedule_refresh([instance.date_time])
+    elif action == 'pre_clear':
+        # gang.incidents.clear(): instance is the gang
+        trends.schedule_refresh(list(instance.incidents.values_list('date_time', flat=True)))
+    else:
+        trends.schedule_refresh(Incident.objects.filter(pk__in=pk_set or []).values_list('date_time', flat=True))
+
+
+# ===================================
+# SPATIAL INDEX
+# ===================================
+
+# Map tiles are touched after the index so their new versions are only handed
+# out once the index they are rendered from has moved on
+
+@receiver(post_save, sender=Incident)
+def update_spatial_index_for_incident(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_row', None)
+    placed = instance.map_x is not None or (previous is not None and previous.map_x is not None)
+    if placed and _changed(instance, 'map_x', 'map_y', 'severity'):
+        spatial.mark_dirty([instance.pk])
+        tiles.touch_points([(instance.map_x, instance.map_y)] + ([(previous.map_x, previous.map_y)] if previous else []))
+
+
+@receiver(post_delete, sender=Incident)
+def remove_incident_from_spatial_index(sender, instance, **kwargs):
+    if instance.map_x is not None:
+        spatial.mark_dirty([instance.pk])
+        tiles.touch_points([(instance.map_x, instance.map_y)])
+
+
+@receiver(post_save, sender=Gang)
+def invalidate_territories_for_gang(sender, instance, **kwargs):
+    if _changed(instance, 'territory_area', 'is_active'):
+        spatial.invalidate_territories()
+    if _changed(instance, 'territory_area', 'is_active', 'color'):
+        previous = getattr(instance, '_previous_row', None)
+        tiles.touch_territory(instance.territory_area)
+        if previous is not None:
+            tiles.touch_territory(previous.territory_area)
+
+
+@receiver(post_delete, sender=Gang)
+def invalidate_territories_on_delete(sender, instance, **kwargs):
+    spatial.invalidate_territories()
+    tiles.touch_territory(instance.territory_area)
+
+
+# ===================================
+# AUTOCOMPLETE INDEX
+# ===================================
+
+@receiver(post_save, sender=Gang)
+def invalidate_autocomplete_for_gang(sender, instance, **kwargs):
+    if _changed(instance, 'name', 'tag'):
+        autocomplete.invalidate()
+
+
+@receiver(post_save, sender=GangMember)
+def invalidate_autocomplete_for_member(sender, instance, **kwargs):
+    if _changed(instance, 'name', 'alias', 'gang_id', 'status'):
+        autocomplete.invalidate()
+
+
+@receiver(post_delete, sender=Gang)
+@receiver(post_delete, sender=GangMember)
+def invalidate_autocomplete_on_delete(sender, instance, **kwargs):
+    autocomplete.invalidate()
+
+
+# ===================================
+# ASSOCIATE GRAPH
+# ===================================
+
+@receiver(post_save, sender=GangMember)
+def add_member_to_graph(sender, instance, created=False, **kwargs):
+    if created:
+        graph.mark_dirty([instance.pk])
+
+
+@receiver(post_delete, sender=GangMember)
+def remove_member_from_graph(sender, instance, **kwargs):
+    graph.mark_dirty([instance.pk])
+
+
+@receiver(pre_delete, sender=Incident)
+@receiver(pre_delete, sender=CaseFile)
+def update_graph_for_deleted_record(sender, instance, **kwargs):
+    # The M2M rows go with the record; capture who was linked through it now
+    members = instance.members_involved if sender is Incident else instance.members
+    graph.mark_dirty(list(members.values_list('id', flat=True)))
+
+
+@receiver(m2m_changed, sender=GangMember.known_associates.through)
+@receiver(m2m_changed, sender=Incident.members_involved.through)
+@receiver(m2m_changed, sender=CaseFile.members.through)
+def update_graph_for_links(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, GangMember):
+        # The member's own links are re-read, which covers both ends of each edge
+        graph.mark_dirty([instance.pk])
+    elif action == 'pre_clear':
+        members = instance.members_involved if isinstance(instance, Incident) else instance.members
+        graph.mark_dirty(list(members.values_list('id', flat=True)))
+    else:
+        graph.mark_dirty(pk_set or [])
+
+
+# ===================================
+# GANG RELATIONSHIPS
+# ===================================
+
+@receiver(pre_save, sender=GangRelationship)
+def canonicalise_relationship(sender, instance, **kwargs):
+    """Store each pair low id first (runs for loaddata too)"""
+    instance.canonicalise()
+
+
+@receiver(post_save, sender=GangRelationship)
+@receiver(post_delete, sender=GangRelationship)
+def invalidate_alliance_graph(sender, instance, **kwargs):
+    alliances.invalidate()
+
+
+# ===================================
+# IMAGE VARIANTS
+# ===================================
+
+@receiver(post_save, sender=CaseFile)
+@receiver(post_save, sender=GangMember)
+def refresh_image_variants(sender, instance, raw=False, **kwargs):
+    """Queue the resizing of new uploads and the removal of replaced or cleared ones' variants"""
+    if raw:
+        return
+    field = images.IMAGE_FIELDS[sender]
+    fieldfile = getattr(instance, field)
+    record = getattr(instance, f'{field}_variants')
+    if (fieldfile or record) and not images.current_variants(fieldfile, record):
+        images.schedule_refresh(instance)
+
+
+@receiver(post_delete, sender=CaseFile)
+@receiver(post_delete, sender=GangMember)
+def delete_image_variants(sender, instance, **kwargs):
+    images.schedule_delete(instance)
+
+
+# ===================================
+# DATA VERSIONS
+# ===================================
+
+@receiver(post_save, sender=Gang)
+@receiver(post_save, sender=GangMember)
+@receiver(post_save, sender=Incident)
+@receiver(post_save, sender=CaseFile)
+@receiver(post_save, sender=GangRelationship)
+@receiver(post_delete, sender=Gang)
+@receiver(post_delete, sender=GangMember)
+@receiver(post_delete, sender=Incident)
+@receiver(post_delete, sender=CaseFile)
+@receiver(post_delete, sender=GangRelationship)
+def bump_data_version(sender, **kwargs):
+    versions.bump(sender)
+
+
+# Link tables and the model declaring them, whose version covers its links whichever side changed them
+VERSIONED_LINKS = {
+    Incident.gangs_involved.through: Incident,
+    Incident.members_involved.through: Incident,
+    CaseFile.gangs.through: CaseFile,
+    CaseFile.members.through: CaseFile,
+}
+
+
+@receiver(m2m_changed, sender=Incident.gangs_involved.through)
+@receiver(m2m_changed, sender=Incident.members_involved.through)
+@receiver(m2m_changed, sender=CaseFile.gangs.through)
+@receiver(m2m_changed, sender=CaseFile.members.through)
+def bump_data_version_on_links(sender, action, instance, reverse, pk_set, **kwargs):
+    """Also touches the owning rows' updated_at, which keys their cached cards (see cards.py)"""
+    owner = VERSIONED_LINKS[sender]
+    if not reverse:
+        owners = [instance.pk]
+    elif action == 'pre_clear':
+        # post_clear no longer knows which rows were linked
+        owner_field = next(f for f in owner._meta.many_to_many if f.remote_field.through is sender)
+        owners = list(sender.objects.filter(**{owner_field.m2m_reverse_field_name(): instance.pk})
+                      .values_list(owner_field.m2m_field_name(), flat=True))
+        instance._cleared_link_owners = owners
+        return
+    elif action == 'post_clear':
+        owners = getattr(instance, '_cleared_link_owners', [])
+    else:
+        owners = pk_set or []
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        owner._base_manager.filter(pk__in=owners).update(updated_at=timezone.now())
+        versions.bump(owner)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_version(sender, update_fields=None, **kwargs):
+    """Agents' names appear on the pages; logging in only touches last_login"""
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        versions.bump(User)
@@ -0,0 +1,442 @@
+"""
+Map coordinates and in-memory spatial indexes.
+
+Incidents carry optional map_x/map_y world coordinates (game-world metres, x
+east and y north) and gangs an optional territory_area: a list of polygons,
+each a list of [x, y] vertices. The map is planar, so distances are plain
+Euclidean and no GIS extension is needed.
+
+IncidentIndex buckets incident points into a uniform grid of CELL_SIZE
+cells. The points live in flat arrays sorted by cell (ids, xs, ys, severity
+ranks), each cell a slice of them, and a pyramid keeps per-cell counts and
+coordinate sums at LEVELS doubling cell sizes. Viewport clustering reads the
+pyramid level whose cells best match the requested cluster size, so its cost
+follows the size of the viewport grid rather than the number of incidents;
+only severity-filtered or fully zoomed-in requests walk individual points.
+Incident writes are patched in the same way as the associate graph: signal
+handlers bump a generation kept in the DataVersion table and log the dirty
+incident ids under it in the default cache, and each process re-reads just
+those rows, folding the patches back into fresh arrays once they pile up, or
+rebuilds when the log is unavailable.
+
+TerritoryIndex holds the active gangs' polygons in a coarse grid of their
+bounding boxes for point-in-territory and radius lookups. It is small and is
+simply reloaded whenever a gang changes (another DataVersion generation).
+"""
+import math
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from . import versions
+from .models import Gang, Incident
+
+
+CELL_SIZE = 50.0                # metres per base grid cell
+LEVELS = 9                      # pyramid levels: 50 m up to 12.8 km cells
+TERRITORY_CELL_SIZE = 500.0
+WORLD_LIMIT = 100000.0          # coordinates are rejected beyond +/- this
+MAX_POLYGON_POINTS = 1000
+
+GENERATION_KEY = 'spatial:generation'
+DIRTY_KEY = 'spatial:dirty:{}'
+DIRTY_LOG_TIMEOUT = 3600
+MAX_PATCH_GENERATIONS = 200
+TERRITORY_GENERATION_KEY = 'spatial:territories:generation'
+
+_lock = threading.Lock()
+_state = {'incidents': None, 'territories': None, 'territory_generation': None}
+
+
+# -- geometry --------------------------------------------------------------
+
+def cell_of(x, y, size=CELL_SIZE):
+    return math.floor(x / size), math.floor(y / size)
+
+
+def cell_ranges(bbox, size=CELL_SIZE, level=0, half_open=False):
+    """Column and row ranges of the grid cells (at a pyramid level) overlapping bbox"""
+    (x0, y0), (x1, y1) = cell_of(bbox[0], bbox[1], size), cell_of(bbox[2], bbox[3], size)
+    if half_open:
+        # Cells starting on the max edges are outside [min, max)
+        x1, y1 = math.ceil(bbox[2] / size) - 1, math.ceil(bbox[3] / size) - 1
+    return range(x0 >> level, (x1 >> level) + 1), range(y0 >> level, (y1 >> level) + 1)
+
+
+def clean_coordinate(value):
+    """A map coordinate from request data: a finite number within the world, or None"""
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value) if not isinstance(value, bool) else math.nan
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or abs(number) > WORLD_LIMIT:
+        raise ValueError(f'Invalid map coordinate {value!r}')
+    return number
+
+
+def clean_territory(value):
+    """Territory polygons as lists of [x, y] floats; raises ValueError when malformed"""
+    if value is None or value == '':
+        return []
+    if not isinstance(value, list):
+        raise ValueError('territory_area must be a list of polygons')
+    polygons = []
+    for polygon in value:
+        if not isinstance(polygon, list) or not 3 <= len(polygon) <= MAX_POLYGON_POINTS + 1:
+            raise ValueError(f'Each territory polygon needs 3 to {MAX_POLYGON_POINTS} [x, y] points')
+        points = []
+        for point in polygon:
+            if not isinstance(point, (list, tuple)) or len(point) != 2 or any(isinstance(v, str) for v in point):
+                raise ValueError(f'Invalid territory point {point!r}')
+            points.append([clean_coordinate(point[0]), clean_coordinate(point[1])])
+            if None in points[-1]:
+                raise ValueError(f'Invalid territory point {point!r}')
+        if points[0] == points[-1]:
+            points.pop()  # closed rings are accepted too
+        if len(points) < 3:
+            raise ValueError(f'Each territory polygon needs 3 to {MAX_POLYGON_POINTS} [x, y] points')
+        polygons.append(points)
+    return polygons
+
+
+def polygon_bounds(polygon):
+    xs = [x for x, _ in polygon]
+    ys = [y for _, y in polygon]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def bbox_overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def contains(polygon, x, y):
+    """Even-odd ray casting point-in-polygon test"""
+    inside = False
+    xj, yj = polygon[-1]
+    for xi, yi in polygon:
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        xj, yj = xi, yi
+    return inside
+
+
+def distance_to_polygon(polygon, x, y):
+    """0 inside the polygon, otherwise the distance to its nearest edge"""
+    if contains(polygon, x, y):
+        return 0.0
+    best = math.inf
+    ax, ay = polygon[-1]
+    for bx, by in polygon:
+        dx, dy = bx - ax, by - ay
+        length = dx * dx + dy * dy
+        t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length))
+        best = min(best, math.hypot(x - (ax + t * dx), y - (ay + t * dy)))
+        ax, ay = bx, by
+    return best
+
+
+# -- territories -----------------------------------------------------------
+
+class TerritoryIndex:
+    """Territory polygons bucketed by bounding box into a coarse grid"""
+
+    def __init__(self, rows):
+        # rows: iterable of (gang id, territory polygons)
+        self.polygons = []      # (gang id, polygon, bounds)
+        self.grid = {}
+        for gang_id, polygons in rows:
+            for polygon in polygons or ():
+                bounds = polygon_bounds(polygon)
+                position = len(self.polygons)
+                self.polygons.append((gang_id, polygon, bounds))
+                columns, rows_ = cell_ranges(bounds, TERRITORY_CELL_SIZE)
+                for cx in columns:
+                    for cy in rows_:
+                        self.grid.setdefault((cx, cy), []).append(position)
+
+    @classmethod
+    def from_database(cls):
+        return cls(Gang.objects.filter(is_active=True).values_list('id', 'territory_area'))
+
+    def _candidates(self, bbox):
+        columns, rows = cell_ranges(bbox, TERRITORY_CELL_SIZE)
+        if len(columns) * len(rows) > len(self.grid):
+            positions = range(len(self.polygons))
+        else:
+            positions = {p for cx in columns for cy in rows for p in self.grid.get((cx, cy), ())}
+        return sorted(p for p in positions if bbox_overlaps(self.polygons[p][2], bbox))
+
+    def gangs_at(self, x, y):
+        """Ids of the gangs whose territory contains the point"""
+        return sorted({
+            gang_id for gang_id, polygon, _ in map(self.polygons.__getitem__, self._candidates((x, y, x, y)))
+            if contains(polygon, x, y)
+        })
+
+    def near(self, x, y, radius):
+        """{gang id: distance} for territories within radius of the point (0 inside them)"""
+        found = {}
+        for position in self._candidates((x - radius, y - radius, x + radius, y + radius)):
+            gang_id, polygon, _ = self.polygons[position]
+            distance = distance_to_polygon(polygon, x, y)
+            if distance <= radius and distance < found.get(gang_id, math.inf):
+                found[gang_id] = distance
+        return found
+
+    def in_bbox(self, bbox=None):
+        """{gang id: [polygons]} for polygons overlapping bbox (all of them without one)"""
+        positions = range(len(self.polygons)) if bbox is None else self._candidates(bbox)
+        found = {}
+        for position in positions:
+            gang_id, polygon, _ = self.polygons[position]
+            found.setdefault(gang_id, []).append(polygon)
+        return found
+
+
+# -- incidents -------------------------------------------------------------
+
+def located_incidents():
+    """(id, x, y, severity rank) for every incident with map coordinates"""
+    return (
+        Incident.objects.filter(map_x__isnull=False, map_y__isnull=False).order_by()
+        .values_list('id', 'map_x', 'map_y', 'severity_rank')
+    )
+
+
+class IncidentIndex:
+    """Incident points in a uniform grid of flat arrays, plus a pyramid of per-cell totals"""
+
+    def __init__(self, rows, generation=None):
+        # rows: iterable of (incident id, x, y, severity rank)
+        self.generation = generation
+        self._load(rows)
+
+    def _load(self, rows):
+        rows = list(rows)
+        cells = [cell_of(x, y) for _, x, y, _ in rows]
+        # Sorting positions on one integer per cell keeps each cell's points contiguous
+        keys = [(cx << 32) + cy for cx, cy in cells]
+        order = sorted(range(len(rows)), key=keys.__getitem__)
+        self.ids = array('q', [rows[i][0] for i in order])
+        self.xs = array('d', [rows[i][1] for i in order])
+        self.ys = array('d', [rows[i][2] for i in order])
+        self.ranks = array('B', [rows[i][3] for i in order])
+        self.cells = {}
+        for position, i in enumerate(order):
+            start, _ = self.cells.get(cells[i], (position, None))
+            self.cells[cells[i]] = (start, position + 1)
+
+        # Lookup of an incident's position by id, for patching
+        order = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        self.sorted_ids = array('q', (self.ids[position] for position in order))
+        self.sorted_positions = array('q', order)
+        self.removed = set()    # positions superseded by patches
+        self.extra = {}         # patched-in incident id -> (x, y, rank)
+        self.extra_cells = {}   # base cell -> ids in extra
+
+        base = {
+            cell: [stop - start, sum(self.xs[start:stop]), sum(self.ys[start:stop])]
+            for cell, (start, stop) in self.cells.items()
+        }
+        self.levels = [base]
+        for _ in range(1, LEVELS):
+            parent = {}
+            for (cx, cy), (count, sum_x, sum_y) in self.levels[-1].items():
+                entry = parent.setdefault((cx >> 1, cy >> 1), [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += sum_x
+                entry[2] += sum_y
+            self.levels.append(parent)
+
+    @classmethod
+    def from_database(cls, generation=None):
+        return cls(located_incidents(), generation)
+
+    def __len__(self):
+        return len(self.ids) - len(self.removed) + len(self.extra)
+
+    # -- points ------------------------------------------------------------
+
+    def _cell_points(self, cell):
+        start, stop = self.cells.get(cell, (0, 0))
+        for position in range(start, stop):
+            if position not in self.removed:
+                yield self.ids[position], self.xs[position], self.ys[position], self.ranks[position]
+        for pk in self.extra_cells.get(cell, ()):
+            x, y, rank = self.extra[pk]
+            yield pk, x, y, rank
+
+    def _occupied(self, columns, rows, level=0):
+        table = self.levels[level]
+        if len(columns) * len(rows) > len(table):
+            return [cell for cell in table if cell[0] in columns and cell[1] in rows]
+        return [(cx, cy) for cx in columns for cy in rows if (cx, cy) in table]
+
+    def points(self, bbox, ranks=None, half_open=False):
+        """
+        (id, x, y, severity rank) of each incident inside bbox, optionally
+        only the given ranks; half_open leaves out the max edges
+        """
+        min_x, min_y, max_x, max_y = bbox
+        for cell in self._occupied(*cell_ranges(bbox, half_open=half_open)):
+            for point in self._cell_points(cell):
+                if not (min_x <= point[1] <= max_x and min_y <= point[2] <= max_y):
+                    continue
+                if half_open and (point[1] == max_x or point[2] == max_y):
+                    continue
+                if ranks is None or point[3] in ranks:
+                    yield point
+
+    def within_radius(self, x, y, radius, ranks=None):
+        """[(distance, incident id)] for incidents within radius of the point, nearest first"""
+        found = []
+        for pk, px, py, _ in self.points((x - radius, y - radius, x + radius, y + radius), ranks):
+            distance = math.hypot(px - x, py - y)
+            if distance <= radius:
+                found.append((distance, pk))
+        found.sort()
+        return found
+
+    def clusters(self, bbox, size, ranks=None, half_open=False):
+        """
+        Incidents in bbox grouped into grid cells at least `size` metres wide,
+        as [(count, mean x, mean y, incident id if count == 1 else None)].
+
+        Cells are aligned to a fixed grid so clusters stay put while panning;
+        a cell on the viewport edge counts all of its points. With half_open
+        and a bbox on cell boundaries (map tiles), every point is counted by
+        exactly one of the boxes sharing an edge.
+        """
+        level = next((k for k in range(LEVELS) if CELL_SIZE * 2 ** k >= size), LEVELS - 1)
+        if ranks is not None or size < CELL_SIZE:
+            return self._scan_clusters(bbox, size, ranks, half_open)
+        found = []
+        for cell in self._occupied(*cell_ranges(bbox, level=level, half_open=half_open), level=level):
+            count, sum_x, sum_y = self.levels[level][cell]
+            found.append((count, sum_x / count, sum_y / count, self._sole(level, cell) if count == 1 else None))
+        return found
+
+    def _scan_clusters(self, bbox, size, ranks, half_open=False):
+        groups = {}
+        for pk, x, y, _ in self.points(bbox, ranks, half_open):
+            group = groups.setdefault(cell_of(x, y, size), [0, 0.0, 0.0, pk])
+            group[0] += 1
+            group[1] += x
+            group[2] += y
+        return [
+            (count, sum_x / count, sum_y / count, pk if count == 1 else None)
+            for count, sum_x, sum_y, pk in groups.values()
+        ]
+
+    def _sole(self, level, cell):
+        """Id of the only incident under a pyramid cell, found by walking down to its base cell"""
+        while level > 0:
+            level -= 1
+            cx, cy = cell
+            cell = next(
+                child for child in ((2 * cx, 2 * cy), (2 * cx + 1, 2 * cy), (2 * cx, 2 * cy + 1), (2 * cx + 1, 2 * cy + 1))
+                if child in self.levels[level]
+            )
+        return next(self._cell_points(cell))[0]
+
+    # -- incremental updates -----------------------------------------------
+
+    def _adjust(self, x, y, delta):
+        cx, cy = cell_of(x, y)
+        for level, table in enumerate(self.levels):
+            key = (cx >> level, cy >> level)
+            entry = table.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += delta
+            entry[1] += delta * x
+            entry[2] += delta * y
+            if entry[0] == 0:
+                del table[key]
+
+    def _remove(self, pk):
+        if pk in self.extra:
+            x, y, _ = self.extra.pop(pk)
+            self.extra_cells[cell_of(x, y)].discard(pk)
+            self._adjust(x, y, -1)
+            return
+        i = bisect_left(self.sorted_ids, pk)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == pk:
+            position = self.sorted_positions[i]
+            if position not in self.removed:
+                self.removed.add(position)
+                self._adjust(self.xs[position], self.ys[position], -1)
+
+    def patch(self, incident_ids):
+        """Re-read the given incidents' coordinates and severity and splice them in"""
+        dirty = set(incident_ids)
+        if not dirty:
+            return
+        for pk, x, y, rank in located_incidents().filter(id__in=dirty):
+            self._remove(pk)
+            dirty.discard(pk)
+            self.extra[pk] = (x, y, rank)
+            self.extra_cells.setdefault(cell_of(x, y), set()).add(pk)
+            self._adjust(x, y, 1)
+        # Deleted, or no longer placed on the map
+        for pk in dirty:
+            self._remove(pk)
+
+        if len(self.extra) + len(self.removed) > max(256, len(self) // 10):
+            self._load([point for cell in list(self.levels[0]) for point in self._cell_points(cell)])
+
+
+# -- process-wide indexes --------------------------------------------------
+
+def get_incident_index():
+    """The process-wide incident index, patched or rebuilt to the latest generation"""
+    with _lock:
+        generation = versions.current_keys(GENERATION_KEY)[0]
+        index = _state['incidents']
+        if index is not None and index.generation == generation:
+            return index
+
+        if index is not None and 0 < generation - index.generation <= MAX_PATCH_GENERATIONS:
+            keys = [DIRTY_KEY.format(n) for n in range(index.generation + 1, generation + 1)]
+            log = cache.get_many(keys)
+            if len(log) == len(keys):
+                index.patch(set().union(*log.values()))
+                index.generation = generation
+                return index
+
+        _state['incidents'] = IncidentIndex.from_database(generation)
+        return _state['incidents']
+
+
+def get_territory_index():
+    """The process-wide territory index, reloaded after any gang change"""
+    generation = versions.current_keys(TERRITORY_GENERATION_KEY)[0]
+    index = _state['territories']
+    if index is not None and _state['territory_generation'] == generation:
+        return index
+    with _lock:
+        if _state['territories'] is None or _state['territory_generation'] != generation:
+            _state['territories'] = TerritoryIndex.from_database()
+            _state['territory_generation'] = generation
+        return _state['territories']
+
+
+def mark_dirty(incident_ids):
+    """Record that these incidents moved (or were added/removed), as part of the current transaction"""
+    incident_ids = {incident_id for incident_id in incident_ids if incident_id is not None}
+    if incident_ids:
+        generation = versions.bump_key(GENERATION_KEY)
+        # As in graph.mark_dirty, a rolled back entry is overwritten by the next writer
+        cache.set(DIRTY_KEY.format(generation), incident_ids, timeout=DIRTY_LOG_TIMEOUT)
+
+
+def invalidate():
+    """Force a full rebuild of the incident index in every process once the transaction commits"""
+    versions.bump_key(GENERATION_KEY)
+
+
+def invalidate_territories():
+    """Reload the territory index in every process once the transaction commits"""
+    versions.bump_keys([TERRITORY_GENERATION_KEY])
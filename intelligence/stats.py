@@ -0,0 +1,142 @@
+"""
+Dashboard statistics service.
+
+The dashboard counters are kept in Django's cache framework and adjusted
+incrementally from model save/delete signals, so a dashboard page view is a
+single cache get_many instead of seven queries. A reconciliation pass
+recomputes everything from the database whenever the freshness marker
+expires (DASHBOARD_STATS_RECONCILE_SECONDS) or when the
+reconcile_dashboard_stats command runs, repairing any drift from writes that
+bypass signals (queryset.update(), raw SQL, rolled back transactions).
+
+The cache alias is DASHBOARD_STATS_CACHE. The default locmem cache is per
+process; point it at a shared backend (Redis, Memcached, database) to keep
+every gunicorn worker on the same numbers between reconciliations.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Gang, GangMember, Incident, CaseFile, level_rank
+
+
+OPEN_INCIDENT_STATUSES = ['OPEN', 'INVESTIGATING']
+ACTIVE_CASE_STATUSES = ['OPEN', 'ACTIVE']
+
+# counter name -> (model, queryset filter, same predicate for a single instance)
+COUNTERS = {
+    'total_gangs': (Gang, {'is_active': True}, lambda gang: bool(gang.is_active)),
+    'total_members': (GangMember, {'status': 'ACTIVE'}, lambda member: member.status == 'ACTIVE'),
+    'open_incidents': (
+        Incident,
+        {'status__in': OPEN_INCIDENT_STATUSES},
+        lambda incident: incident.status in OPEN_INCIDENT_STATUSES,
+    ),
+    'active_cases': (
+        CaseFile,
+        {'status__in': ACTIVE_CASE_STATUSES},
+        lambda case: case.status in ACTIVE_CASE_STATUSES,
+    ),
+}
+
+KEY_PREFIX = 'dashboard:'
+LISTS_KEY = KEY_PREFIX + 'lists'
+FRESH_KEY = KEY_PREFIX + 'fresh'
+
+# Models whose writes can change the top-5 lists on the dashboard
+LIST_MODELS = (Gang, Incident, CaseFile)
+
+
+def _cache():
+    return caches[settings.DASHBOARD_STATS_CACHE]
+
+
+def _counter_key(name):
+    return KEY_PREFIX + name
+
+
+def count_from_database(name):
+    """Recompute a single counter with a COUNT query"""
+    model, filters, _ = COUNTERS[name]
+    return model.objects.filter(**filters).count()
+
+
+def build_lists():
+    """The dashboard's top-5 lists, evaluated so they can be cached"""
+    return {
+        'recent_incidents': list(Incident.objects.all()[:5]),
+        'priority_cases': list(
+            CaseFile.objects.select_related('lead_agent').filter(priority_rank__gte=level_rank('HIGH'))[:5]
+        ),
+        'critical_gangs': list(
+            Gang.objects.select_related('stats').filter(threat_level='CRITICAL', is_active=True)[:5]
+        ),
+    }
+
+
+def reconcile():
+    """
+    Recompute every counter and list from the database and store them.
+
+    Returns a dict of counter name -> (cached value or None, actual value)
+    for the counters that had drifted.
+    """
+    cache = _cache()
+    names = list(COUNTERS)
+    cached = cache.get_many([_counter_key(name) for name in names])
+
+    actual = {name: count_from_database(name) for name in names}
+    drift = {
+        name: (cached.get(_counter_key(name)), value)
+        for name, value in actual.items()
+        if cached.get(_counter_key(name)) != value
+    }
+
+    cache.set_many({_counter_key(name): value for name, value in actual.items()}, timeout=None)
+    cache.set(LISTS_KEY, build_lists(), timeout=None)
+    cache.set(FRESH_KEY, True, timeout=settings.DASHBOARD_STATS_RECONCILE_SECONDS)
+    return drift
+
+
+def get_dashboard_stats():
+    """Counters and top-5 lists for the dashboard, normally from one cache hit"""
+    cache = _cache()
+    counter_keys = [_counter_key(name) for name in COUNTERS]
+    values = cache.get_many(counter_keys + [LISTS_KEY, FRESH_KEY])
+
+    if FRESH_KEY not in values or any(key not in values for key in counter_keys):
+        reconcile()
+        values = cache.get_many(counter_keys + [LISTS_KEY])
+
+    lists = values.get(LISTS_KEY)
+    if lists is None:
+        lists = build_lists()
+        cache.set(LISTS_KEY, lists, timeout=None)
+
+    stats = {name: values.get(_counter_key(name), 0) for name in COUNTERS}
+    stats.update(lists)
+    return stats
+
+
+def adjust(name, delta):
+    """Apply a counter delta once the surrounding transaction commits"""
+    def apply():
+        try:
+            _cache().incr(_counter_key(name), delta)
+        except ValueError:
+            # Counter not cached yet; the next read reconciles from the database
+            pass
+    transaction.on_commit(apply)
+
+
+def invalidate_lists():
+    transaction.on_commit(lambda: _cache().delete(LISTS_KEY))
+
+
+def mark_stale():
+    """Force the next dashboard read to reconcile from the database"""
+    transaction.on_commit(lambda: _cache().delete(FRESH_KEY))
+
+
+def counters_for(model):
+    return [(name, predicate) for name, (counter_model, _, predicate) in COUNTERS.items() if counter_model is model]
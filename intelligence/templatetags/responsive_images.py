@@ -0,0 +1,42 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from intelligence.images import MIME_TYPES, current_variants
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(fieldfile, variants, sizes='100vw', **attrs):
+    """
+    <picture> with a srcset per format from an image field's variants record,
+    around an <img> of the original for browsers that take none of them.
+    Keyword arguments become <img> attributes, with underscores as hyphens:
+
+        {% picture case.image case.image_variants sizes="400px" alt=case.title %}
+    """
+    if not fieldfile:
+        return ''
+    record = current_variants(fieldfile, variants)
+    img_attrs = {'src': fieldfile.url, 'loading': 'lazy', 'decoding': 'async'}
+    if 'width' in record:
+        img_attrs.update(width=record['width'], height=record['height'])
+    img_attrs.update({name.replace('_', '-'): value for name, value in attrs.items()})
+    img = format_html('<img{}>', flatatt(img_attrs))
+
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+        (
+            MIME_TYPES[fmt],
+            ', '.join(
+                f'{fieldfile.storage.url(name)} {width}w'
+                for width, name in sorted(record[fmt].items(), key=lambda item: int(item[0]))
+            ),
+            sizes,
+        )
+        for fmt in MIME_TYPES if record.get(fmt)
+    ))
+    if not sources:
+        return img
+    return format_html('<picture>{}{}</picture>', sources, img)
@@ -0,0 +1,133 @@
+"""
+Token-bucket throttling of sign-in attempts, per client IP and per agent ID.
+
+Every attempt that would hash a passcode takes a token from the bucket of
+the client's IP and then from the bucket of the agent ID it names (see
+agents.authenticate_agent). An attempt finding either bucket empty is
+refused before any hashing, so a burst of bad attempts costs a couple of
+single-row queries each instead of a PBKDF2 hash. A bucket holds up to its
+burst of tokens and regains one every refill interval (LOGIN_THROTTLE_*
+settings).
+
+Buckets are rows of the LoginBucket table, so every gunicorn worker on every
+host sharing the database enforces the same limits. A bucket is a single
+number: the time at which it will be full again. Taking a token moves that
+time one interval later, and the bucket is empty while it lies more than
+(burst - 1) intervals ahead; a missing row is a full bucket. The take is one
+conditional UPDATE, so concurrent attempts cannot share a token. Rows of
+buckets that are full again are pruned by the throttle itself, on about one
+attempt in LOGIN_THROTTLE_PRUNE_EVERY, so the table stays small without any
+background process.
+
+The client IP is REMOTE_ADDR unless LOGIN_THROTTLE_PROXY_COUNT reverse
+proxies append to X-Forwarded-For in front of the app (set automatically on
+Railway). counters() reports admitted and refused attempts.
+"""
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import LoginAttemptCount, LoginBucket
+
+
+COUNTERS = ('allowed', 'throttled_ip', 'throttled_agent')
+
+
+class Throttled(Exception):
+    """An attempt found a bucket empty; `scope` names it, `retry_after` is in whole seconds"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(scope, retry_after)
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with LOGIN_THROTTLE_PROXY_COUNT
+    trusted proxies in front, the X-Forwarded-For entry the outermost of
+    them appended
+    """
+    proxies = settings.LOGIN_THROTTLE_PROXY_COUNT
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _bucket_key(scope, value):
+    # Agent IDs are user input; hashed to a fixed-length key
+    return f'{scope}:{hashlib.sha256(value.encode()).hexdigest()[:64]}'
+
+
+def _take_existing(key, now, headroom, interval):
+    """Whether the bucket's row exists and had a token, which is then taken"""
+    return bool(LoginBucket.objects.filter(key=key, full_at__lte=now + headroom).update(
+        full_at=Greatest(F('full_at'), Value(now)) + interval
+    ))
+
+
+def take(key, burst, interval):
+    """Take a token from a bucket; returns 0, or the seconds until one is available"""
+    now = time.time()
+    headroom = (burst - 1) * interval
+    if _take_existing(key, now, headroom, interval):
+        return 0
+    try:
+        with transaction.atomic():
+            LoginBucket.objects.create(key=key, full_at=now + interval)
+        return 0
+    except IntegrityError:
+        # Created meanwhile by a concurrent attempt; take from it like any other
+        pass
+    if _take_existing(key, now, headroom, interval):
+        return 0
+    full_at = LoginBucket.objects.filter(key=key).values_list('full_at', flat=True).first()
+    return max((full_at or now) - now - headroom, 1)
+
+
+def _count(name):
+    if not LoginAttemptCount.objects.filter(name=name).update(count=F('count') + 1):
+        try:
+            with transaction.atomic():
+                LoginAttemptCount.objects.create(name=name, count=1)
+        except IntegrityError:
+            LoginAttemptCount.objects.filter(name=name).update(count=F('count') + 1)
+
+
+def check(request, agent_id):
+    """Take a token for a sign-in attempt from the IP's and the agent ID's buckets; raises Throttled if either is empty"""
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return
+    if random.random() * settings.LOGIN_THROTTLE_PRUNE_EVERY < 1:
+        prune()
+    buckets = [
+        ('ip', client_ip(request), settings.LOGIN_THROTTLE_IP_BURST, settings.LOGIN_THROTTLE_IP_REFILL_SECONDS),
+        (
+            'agent', agent_id.lower(),
+            settings.LOGIN_THROTTLE_AGENT_BURST, settings.LOGIN_THROTTLE_AGENT_REFILL_SECONDS,
+        ),
+    ]
+    for scope, value, burst, interval in buckets:
+        wait = take(_bucket_key(scope, value), burst, interval)
+        if wait:
+            _count(f'throttled_{scope}')
+            raise Throttled(scope, math.ceil(wait))
+    _count('allowed')
+
+
+def prune():
+    """Delete the rows of buckets that are full again; returns how many"""
+    return LoginBucket.objects.filter(full_at__lte=time.time()).delete()[0]
+
+
+def counters():
+    """Admitted and refused sign-in attempts, for monitoring"""
+    counts = dict(LoginAttemptCount.objects.values_list('name', 'count'))
+    return {name: counts.get(name, 0) for name in COUNTERS}
@@ -0,0 +1,208 @@
+"""
+Map tiles for the territory map, cached on disk.
+
+Tiles split the map into a quadtree of squares: zoom 0 is one tile
+TILE_EXTENT metres wide centred on the origin, and each zoom halves the edge,
+with columns counted east from the west edge and rows south from the north
+edge. The extent is CELL_SIZE times a power of two, so tile edges fall on the
+boundaries of the incident index's pyramid cells and a tile's clusters can be
+read straight from the pyramid without straddling its neighbours. A tile holds
+the active territories clipped to it and its incidents clustered into a
+TILE_GRID by TILE_GRID grid, with single incidents listed individually.
+
+Rendered tiles are written to settings.TILE_CACHE_DIR under a version token
+kept in the DataVersion table (see versions.current_keys), so every web
+process sharing the directory agrees on which file is current. Each tile up
+to VERSION_ZOOM has its own version and deeper tiles share the version of
+their ancestor at VERSION_ZOOM, so an edit bumps at most a handful of
+versions per zoom, in the edit's own transaction: those of the tiles around
+the incident's old and new position or the territory's old and new bounds.
+Every other tile keeps its version and is served from disk. Versions start at
+a random value, so a recreated database never matches a file written under
+an earlier one.
+"""
+import glob
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+from . import versions
+from .models import Gang, Incident, level_rank
+from .spatial import CELL_SIZE, get_incident_index, get_territory_index, polygon_bounds
+
+
+logger = logging.getLogger(__name__)
+
+TILE_EXTENT = CELL_SIZE * 2 ** 12      # 204.8 km, covering spatial.WORLD_LIMIT
+TILE_ORIGIN = -TILE_EXTENT / 2
+MAX_ZOOM = 12                          # 50 m tiles
+TILE_GRID = 8
+VERSION_ZOOM = 8
+
+VERSION_KEY = 'tile:{}:{}:{}'
+
+
+# -- tile geometry ---------------------------------------------------------
+
+def tile_size(z):
+    return TILE_EXTENT / 2 ** z
+
+
+def tile_exists(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y):
+    """(min_x, min_y, max_x, max_y) of a tile in map metres"""
+    size = tile_size(z)
+    top = -TILE_ORIGIN - y * size
+    return TILE_ORIGIN + x * size, top - size, TILE_ORIGIN + (x + 1) * size, top
+
+
+def tile_ranges(bbox, z):
+    """Column and row ranges of the tiles at zoom z overlapping bbox"""
+    size = tile_size(z)
+    last = 2 ** z - 1
+    def clamp(value):
+        return min(max(math.floor(value), 0), last)
+    columns = range(clamp((bbox[0] - TILE_ORIGIN) / size), clamp((bbox[2] - TILE_ORIGIN) / size) + 1)
+    # Rows count down from the north edge, and a tile owns its south edge but not its north one
+    rows = range(
+        clamp(math.ceil((-TILE_ORIGIN - bbox[3]) / size) - 1), clamp(math.ceil((-TILE_ORIGIN - bbox[1]) / size) - 1) + 1
+    )
+    return columns, rows
+
+
+def clip_polygon(polygon, bbox):
+    """Sutherland-Hodgman clip of a polygon to bbox; [] when nothing with an area is left"""
+    points = [tuple(point) for point in polygon]
+    for axis, limit, sign in ((0, bbox[0], 1), (0, bbox[2], -1), (1, bbox[1], 1), (1, bbox[3], -1)):
+        clipped = []
+        previous = points[-1] if points else None
+        for point in points:
+            inside = sign * (point[axis] - limit) >= 0
+            if inside != (sign * (previous[axis] - limit) >= 0):
+                t = (limit - previous[axis]) / (point[axis] - previous[axis])
+                crossing = [previous[0] + t * (point[0] - previous[0]), previous[1] + t * (point[1] - previous[1])]
+                crossing[axis] = limit
+                clipped.append(tuple(crossing))
+            if inside:
+                clipped.append(point)
+            previous = point
+        points = clipped
+    area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]))
+    if len(points) < 3 or abs(area) < 1e-6:
+        return []
+    return [[round(x, 1), round(y, 1)] for x, y in points]
+
+
+# -- rendering -------------------------------------------------------------
+
+def render(z, x, y, severity=None):
+    """Territories and incident clusters of one tile, as a JSON-ready dict"""
+    bbox = tile_bounds(z, x, y)
+    ranks = {level_rank(severity)} if severity else None
+    # Points on the east and north edges belong to the neighbouring tiles
+    clusters = get_incident_index().clusters(bbox, tile_size(z) / TILE_GRID, ranks, half_open=True)
+    singles = {pk: (px, py) for count, px, py, pk in clusters if count == 1}
+    severities = dict(Incident.objects.filter(id__in=singles).order_by().values_list('id', 'severity'))
+
+    territories = get_territory_index().in_bbox(bbox)
+    colors = dict(Gang.objects.filter(id__in=territories).values_list('id', 'color'))
+    clipped = {}
+    for gang_id, polygons in territories.items():
+        pieces = [piece for piece in (clip_polygon(polygon, bbox) for polygon in polygons) if piece]
+        if pieces and gang_id in colors:
+            clipped[gang_id] = pieces
+
+    return {
+        'z': z,
+        'x': x,
+        'y': y,
+        'bbox': bbox,
+        'territories': [
+            {'gang': gang_id, 'color': colors[gang_id], 'polygons': pieces}
+            for gang_id, pieces in clipped.items()
+        ],
+        'clusters': [
+            {'x': round(px, 1), 'y': round(py, 1), 'count': count}
+            for count, px, py, _ in clusters if count > 1
+        ],
+        'incidents': [
+            {'id': pk, 'x': round(px, 1), 'y': round(py, 1), 'severity': severities[pk]}
+            for pk, (px, py) in singles.items() if pk in severities
+        ],
+    }
+
+
+# -- versions and the disk cache -------------------------------------------
+
+def version_key(z, x, y):
+    shift = max(z - VERSION_ZOOM, 0)
+    return VERSION_KEY.format(z - shift, x >> shift, y >> shift)
+
+
+def tile_version(z, x, y):
+    """Current version token of a tile"""
+    return versions.current_keys(version_key(z, x, y))[0]
+
+
+def tile_path(z, x, y, variant, version):
+    return os.path.join(settings.TILE_CACHE_DIR, str(z), str(x), f'{y}.{variant}.{version}.json')
+
+
+def get_tile(z, x, y, severity=None, version=None):
+    """Tile JSON as bytes, read from the disk cache or rendered and written to it"""
+    variant = severity.lower() if severity else 'all'
+    if version is None:
+        version = tile_version(z, x, y)
+    path = tile_path(z, x, y, variant, version)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    body = json.dumps(render(z, x, y, severity), separators=(',', ':')).encode()
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as f:
+            f.write(body)
+        os.replace(f.name, path)
+        for stale in glob.glob(os.path.join(directory, f'{y}.{variant}.*.json')):
+            if stale != path:
+                os.remove(stale)
+    except OSError as e:
+        logger.warning(f"Could not cache map tile {z}/{x}/{y}: {e}")
+    return body
+
+
+def touch(bboxes):
+    """Give the tiles over these map areas new versions as part of the current transaction"""
+    keys = set()
+    for bbox in bboxes:
+        for z in range(VERSION_ZOOM + 1):
+            columns, rows = tile_ranges(bbox, z)
+            keys.update(VERSION_KEY.format(z, column, row) for column in columns for row in rows)
+    versions.bump_keys(keys)
+
+
+def touch_points(points):
+    """touch() the tiles under these (x, y) positions, skipping unplaced ones"""
+    touch((x, y, x, y) for x, y in points if x is not None and y is not None)
+
+
+def touch_territory(polygons):
+    """touch() the tiles under a territory_area"""
+    touch(polygon_bounds(polygon) for polygon in polygons or () if polygon)
+
+
+def clear():
+    """Delete every cached tile, for writes that bypass the model signals"""
+    shutil.rmtree(settings.TILE_CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,258 @@
+"""
+Pre-aggregated incident counts behind the trend charts.
+
+IncidentBucket holds the number of incidents per hour and per local day
+(settings.TIME_ZONE) for each incident type, severity and involved gang.
+Rows without a gang are the totals over all incidents, so an incident
+involving two gangs counts once in the totals and once for each gang.
+
+Writes to Incident (including gangs_involved) mark the local days they touch
+dirty from model signals; when the surrounding transaction commits, the
+buckets of those days are recomputed from the incidents dated inside them,
+so a burst of writes on the same day costs one refresh. rebuild_all
+recomputes everything, a window of days at a time.
+
+trend() serves arbitrary ranges by summing buckets: whole days come from the
+day buckets and the ragged hours at either end from the hour buckets, so a
+year of counts reads a few thousand rows however many incidents there are.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Incident, IncidentBucket
+
+
+IncidentGang = Incident.gangs_involved.through
+
+INTERVALS = ('hour', 'day', 'week', 'month')
+GROUP_FIELDS = {'type': 'incident_type', 'severity': 'severity', 'gang': 'gang_id'}
+MAX_PERIODS = 1000
+REBUILD_WINDOW_DAYS = 31
+
+# Per-thread set of dirty days waiting for the current transaction to commit
+_pending = threading.local()
+
+
+# -- bucket boundaries -----------------------------------------------------
+
+def local_day(date):
+    """Aware start of a calendar date in the current time zone"""
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def day_start(moment):
+    return local_day(timezone.localdate(moment))
+
+
+def hour_start(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def next_hour(moment):
+    # Step in UTC so the hours around a DST change are neither skipped nor repeated
+    return hour_start(moment.astimezone(dt_timezone.utc) + timedelta(hours=1))
+
+
+def period_label(moment, interval):
+    """The local hour, or the first date of the day/week/month, containing `moment`"""
+    if interval == 'hour':
+        return hour_start(moment).isoformat()
+    date = timezone.localdate(moment)
+    if interval == 'week':
+        date -= timedelta(days=date.weekday())
+    elif interval == 'month':
+        date = date.replace(day=1)
+    return date.isoformat()
+
+
+def period_labels(start, end, interval):
+    """Labels of every period overlapping [start, end), oldest first"""
+    labels = []
+    moment = start
+    while moment < end:
+        label = period_label(moment, interval)
+        if not labels or labels[-1] != label:
+            labels.append(label)
+            if len(labels) > MAX_PERIODS:
+                raise ValueError(f'Ranges are limited to {MAX_PERIODS} {interval}s')
+        if interval == 'hour':
+            moment = next_hour(moment)
+        else:
+            moment = local_day(timezone.localdate(moment) + timedelta(days=1))
+    return labels
+
+
+# -- maintenance -----------------------------------------------------------
+
+def count_incidents(start, end):
+    """Unsaved IncidentBucket rows for the incidents dated within [start, end)"""
+    totals = (
+        Incident.objects.filter(date_time__gte=start, date_time__lt=end).order_by()
+        .values_list('date_time', 'incident_type', 'severity')
+    )
+    links = (
+        IncidentGang.objects.filter(incident__date_time__gte=start, incident__date_time__lt=end).order_by()
+        .values_list('gang_id', 'incident__date_time', 'incident__incident_type', 'incident__severity')
+    )
+    counts = Counter()
+    days = {}
+    for gang_id, moment, incident_type, severity in chain(
+        ((None, *row) for row in totals.iterator(chunk_size=2000)),
+        links.iterator(chunk_size=2000),
+    ):
+        hour = hour_start(moment)
+        day = days.get(hour.date())
+        if day is None:
+            day = days[hour.date()] = local_day(hour.date())
+        counts[(IncidentBucket.HOUR, hour, incident_type, severity, gang_id)] += 1
+        counts[(IncidentBucket.DAY, day, incident_type, severity, gang_id)] += 1
+    return [
+        IncidentBucket(
+            granularity=granularity, bucket_start=bucket_start, incident_type=incident_type,
+            severity=severity, gang_id=gang_id, count=count,
+        )
+        for (granularity, bucket_start, incident_type, severity, gang_id), count in counts.items()
+    ]
+
+
+def refresh_window(start, end):
+    """Recompute every bucket starting within [start, end) (both local midnights); returns the bucket count"""
+    with transaction.atomic():
+        buckets = count_incidents(start, end)
+        IncidentBucket.objects.filter(bucket_start__gte=start, bucket_start__lt=end).delete()
+        IncidentBucket.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def day_runs(dates):
+    """Runs of consecutive dates as [first, stop) pairs"""
+    runs = []
+    for date in sorted(set(dates)):
+        if runs and runs[-1][1] == date:
+            runs[-1][1] = date + timedelta(days=1)
+        else:
+            runs.append([date, date + timedelta(days=1)])
+    return runs
+
+
+def refresh_days(dates):
+    """Recompute the buckets of the given local dates, one window per run of consecutive days"""
+    for first, stop in day_runs(dates):
+        refresh_window(local_day(first), local_day(stop))
+
+
+def rebuild_all(since=None):
+    """Recompute all buckets, or those from the local date `since` on; returns the bucket count"""
+    incidents = Incident.objects.order_by()
+    stale = IncidentBucket.objects.all()
+    if since is not None:
+        incidents = incidents.filter(date_time__gte=local_day(since))
+        stale = stale.filter(bucket_start__gte=local_day(since))
+
+    bounds = incidents.aggregate(first=Min('date_time'), last=Max('date_time'))
+    if bounds['first'] is None:
+        stale.delete()
+        return 0
+    first = since or timezone.localdate(bounds['first'])
+    last = timezone.localdate(bounds['last']) + timedelta(days=1)
+    # Buckets beyond the newest incident would never be revisited by the windows below
+    stale.filter(bucket_start__gte=local_day(last)).delete()
+
+    total = 0
+    date = first
+    while date < last:
+        stop = min(date + timedelta(days=REBUILD_WINDOW_DAYS), last)
+        total += refresh_window(local_day(date), local_day(stop))
+        date = stop
+    if since is None:
+        IncidentBucket.objects.filter(bucket_start__lt=local_day(first)).delete()
+    return total
+
+
+def schedule_refresh(moments):
+    """Mark the days of these incident times dirty; they are recomputed once the current transaction commits"""
+    dates = {timezone.localdate(moment) for moment in moments if moment is not None}
+    if not dates:
+        return
+    # Same batching as rollups.schedule_refresh: one pending set per thread, taken by the first flush at commit
+    if not hasattr(_pending, 'dates'):
+        _pending.dates = set()
+    _pending.dates.update(dates)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    dates = _pending.dates
+    _pending.dates = set()
+    if dates:
+        refresh_days(dates)
+
+
+# -- queries ---------------------------------------------------------------
+
+def bucket_filter(start, end, interval):
+    """Buckets that exactly tile [start, end): day buckets where whole days fit, hour buckets elsewhere"""
+    hours = Q(granularity=IncidentBucket.HOUR)
+    if interval != 'hour':
+        first_day = day_start(start)
+        if first_day < start:
+            first_day = local_day(timezone.localdate(start) + timedelta(days=1))
+        last_day = day_start(end)
+        if first_day < last_day:
+            return (
+                Q(granularity=IncidentBucket.DAY, bucket_start__gte=first_day, bucket_start__lt=last_day)
+                | hours & Q(bucket_start__gte=start, bucket_start__lt=first_day)
+                | hours & Q(bucket_start__gte=last_day, bucket_start__lt=end)
+            )
+    return hours & Q(bucket_start__gte=start, bucket_start__lt=end)
+
+
+def trend(start, end, interval='day', group_by=None, incident_types=(), severities=(), gang_id=None):
+    """
+    Incident counts per period between start and end, widened to whole hours.
+
+    Returns {'start', 'end', 'periods': [labels], 'totals': [counts],
+    'series': {group value: [counts]}} with one series per incident type,
+    severity or gang id when group_by is set. Raises ValueError for bad
+    arguments or ranges spanning more than MAX_PERIODS periods.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f'Unknown interval {interval!r}')
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        raise ValueError(f'Cannot group by {group_by!r}')
+    start = hour_start(start)
+    if hour_start(end) != end:
+        end = next_hour(end)
+    if end <= start:
+        raise ValueError('The range must end after it starts')
+
+    periods = period_labels(start, end, interval)
+    position = {label: i for i, label in enumerate(periods)}
+
+    buckets = IncidentBucket.objects.filter(bucket_filter(start, end, interval))
+    if incident_types:
+        buckets = buckets.filter(incident_type__in=incident_types)
+    if severities:
+        buckets = buckets.filter(severity__in=severities)
+    scoped = buckets.filter(gang__isnull=True) if gang_id is None else buckets.filter(gang_id=gang_id)
+
+    totals = [0] * len(periods)
+    for bucket_start, count in scoped.values('bucket_start').annotate(n=Sum('count')).values_list('bucket_start', 'n'):
+        totals[position[period_label(bucket_start, interval)]] += count
+
+    series = {}
+    if group_by is not None:
+        field = GROUP_FIELDS[group_by]
+        grouped = buckets.filter(gang__isnull=False) if group_by == 'gang' and gang_id is None else scoped
+        for bucket_start, key, count in (
+            grouped.values('bucket_start', field).annotate(n=Sum('count')).values_list('bucket_start', field, 'n')
+        ):
+            series.setdefault(key, [0] * len(periods))[position[period_label(bucket_start, interval)]] += count
+
+    return {'start': start, 'end': end, 'periods': periods, 'totals': totals, 'series': series}
@@ -13,6 +13,15 @@ urlpatterns = [
     path('relationships/', views.relationships, name='relationships'),
     path('case-files/', views.case_files, name='case_files'),
     path('system-settings/', views.system_settings, name='system_settings'),
+    path('search/', views.search_results, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/login-throttle/', views.login_throttle_stats, name='login_throttle_stats'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete_api'),
+    path('api/map/incidents/', views.map_incidents, name='map_incidents'),
+    path('api/map/territories/', views.map_territories, name='map_territories'),
+    path('api/map/tiles/<int:z>/<int:x>/<int:y>.json', views.map_tile, name='map_tile'),
+    path('api/map/hotspots/', views.map_hotspots, name='map_hotspots'),
+    path('api/map/point/', views.map_point, name='map_point'),
     
     # CRUD endpoints for edit mode
     path('api/gang/create/', views.create_gang, name='create_gang'),
@@ -20,10 +29,16 @@ urlpatterns = [
     path('api/gang/<int:gang_id>/delete/', views.delete_gang, name='delete_gang'),
     
     path('api/member/create/', views.create_member, name='create_member'),
+    path('api/member/bulk/', views.bulk_members, name='bulk_members'),
     path('api/member/<int:member_id>/update/', views.update_member, name='update_member'),
     path('api/member/<int:member_id>/delete/', views.delete_member, name='delete_member'),
+    path('api/member/<int:member_id>/network/', views.member_network, name='member_network'),
+    path('api/member/<int:member_id>/path/<int:other_id>/', views.member_path, name='member_path'),
     
+    path('api/incident/trends/', views.incident_trends, name='incident_trends'),
     path('api/incident/create/', views.create_incident, name='create_incident'),
+    path('api/incident/bulk/', views.bulk_incidents, name='bulk_incidents'),
+    path('api/incident/<int:incident_id>/links/', views.incident_links, name='incident_links'),
     path('api/incident/<int:incident_id>/update/', views.update_incident, name='update_incident'),
     path('api/incident/<int:incident_id>/delete/', views.delete_incident, name='delete_incident'),
     
@@ -31,6 +46,8 @@ urlpatterns = [
     path('api/case/<int:case_id>/update/', views.update_case, name='update_case'),
     path('api/case/<int:case_id>/delete/', views.delete_case, name='delete_case'),
     
+    path('api/relationship/between/<int:gang_id>/<int:other_id>/', views.relationship_between, name='relationship_between'),
+    path('api/relationship/analysis/', views.relationship_analysis, name='relationship_analysis'),
     path('api/relationship/create/', views.create_relationship, name='create_relationship'),
     path('api/relationship/<int:relationship_id>/update/', views.update_relationship, name='update_relationship'),
     path('api/relationship/<int:relationship_id>/delete/', views.delete_relationship, name='delete_relationship'),
@@ -0,0 +1,139 @@
+"""
+Change versions of the models behind the list pages, for conditional GETs.
+
+Each tracked model has a version number in the DataVersion table, incremented
+by the transaction that saved or deleted one of its rows or changed its M2M
+links (see signals.py; bulk.apply, rollup refreshes, image variant records
+and import_data write around the model signals and bump explicitly). Being
+part of that transaction, a bump is visible to every web process and to the
+run_worker processes as soon as it commits, and vanishes if it rolls back. A
+list view decorated with conditional_page hashes the versions of the models
+it renders together with the request's query string, the user, edit mode,
+the CSRF cookie and the templates into an ETag, and answers a matching
+If-None-Match with 304 Not Modified: one primary-key query on DataVersion
+and none on the tables themselves.
+
+A model's first version is random rather than 1, so the ETags of a database
+that was recreated do not repeat those of the one before. current_keys and
+bump_keys do the same for other labels: the map tiles' versions and the
+generations of the in-memory indexes each process keeps (associate graph,
+spatial indexes, autocomplete, alliances), so a write in any process makes
+every other one reload.
+"""
+import functools
+import hashlib
+import os
+import secrets
+
+from django.conf import settings
+from django.db.models import F
+from django.template import engines
+from django.template.utils import get_app_template_dirs
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def current_keys(*keys):
+    """Current version numbers stored under these DataVersion labels, in order, read with one query"""
+    found = dict(DataVersion.objects.filter(label__in=keys).values_list('label', 'version'))
+    for key in set(keys) - set(found):
+        row, _ = DataVersion.objects.get_or_create(label=key, defaults={'version': secrets.randbits(48)})
+        found[key] = row.version
+    return [found[key] for key in keys]
+
+
+def bump_keys(keys):
+    """Give these DataVersion labels new versions as part of the current transaction"""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    DataVersion.objects.filter(label__in=keys).update(version=F('version') + 1)
+    # Never read yet: a fresh random version is just as new. Inserted rather than
+    # skipped, so a reader creating the row concurrently waits for this transaction
+    DataVersion.objects.bulk_create(
+        [DataVersion(label=key, version=secrets.randbits(48)) for key in keys], ignore_conflicts=True
+    )
+
+
+def bump_key(key):
+    """bump_keys for one label, returning its new version (held by this transaction until it ends)"""
+    bump_keys([key])
+    return DataVersion.objects.filter(label=key).values_list('version', flat=True).get()
+
+
+def current(*models):
+    """Current version numbers of the models' rows, in order, read with one query"""
+    return current_keys(*(_label(model) for model in models))
+
+
+def version(model):
+    """Current version number of a model's rows"""
+    return current(model)[0]
+
+
+def bump(*models):
+    """Give the models new versions as part of the current transaction"""
+    bump_keys(_label(model) for model in models)
+
+
+def _templates_stamp():
+    """Names, sizes and mtimes of every template file, so a deploy changing the markup changes the ETags"""
+    digest = hashlib.sha256()
+    directories = [*engines['django'].engine.dirs, *get_app_template_dirs('templates')]
+    for directory in directories:
+        # Installed packages' templates only change with the code that renders them
+        if not str(directory).startswith(str(settings.BASE_DIR)):
+            continue
+        for root, _, files in sorted(os.walk(directory)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f'{root}/{name}:{stat.st_size}:{stat.st_mtime_ns}\0'.encode())
+    return digest.hexdigest()
+
+
+_deployed_templates_stamp = functools.lru_cache(maxsize=None)(_templates_stamp)
+
+
+def templates_stamp():
+    """Fingerprint of the project's templates: read once per process, or on every call with DEBUG"""
+    return _templates_stamp() if settings.DEBUG else _deployed_templates_stamp()
+
+
+def page_etag(request, models):
+    """ETag of a list page: changes whenever the rows or anything else the page renders from may have"""
+    parts = [
+        templates_stamp(),
+        *current(*models),
+        request.path,
+        sorted(request.GET.lists()),
+        request.user.pk,
+        request.user.get_username(),
+        bool(request.session.get('edit_mode', False)),
+        # The page embeds a CSRF token, which has to keep matching the cookie
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    ]
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def conditional_page(*models):
+    """
+    Decorate a list view so a GET whose If-None-Match still matches gets a
+    304 instead of a re-render. `models` are every model whose rows the page
+    shows; put it under @login_required.
+    """
+    def decorator(view):
+        conditional = condition(etag_func=lambda request, *args, **kwargs: page_etag(request, models))(view)
+
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapped
+    return decorator
@@ -1,17 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout
+from django.template.loader import render_to_string
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Count, Q
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from .models import Gang, GangMember, Incident, GangRelationship, CaseFile
+from .models import Gang, GangMember, Incident, GangRelationship, CaseFile, GangStats, Hotspot, level_rank
+from .agents import LoginFailed, LoginThrottled, authenticate_agent
+from . import throttle
+from .bulk import BulkValidationError, INCIDENT_SPEC, MEMBER_SPEC, apply as apply_bulk
+from .cards import CARDS, card_fragment, render_cards
+from .pagination import KeysetPaginator, cursor_starting_at
+from .alliances import get_alliance_graph
+from .autocomplete import lookup as autocomplete_lookup
+from .graph import ALL_LINKS, LINK_KINDS, get_graph, link_names
+from .rollups import ensure_gang_stats
+from .search import SEARCH_FIELDS, search as run_search
+from .spatial import (
+    bbox_overlaps, clean_coordinate, clean_territory, get_incident_index, get_territory_index, polygon_bounds,
+)
+from .stats import get_dashboard_stats
+from .tiles import get_tile, tile_exists, tile_version
+from .trends import GROUP_FIELDS as TREND_GROUP_FIELDS, local_day, trend as incident_trend
+from .versions import conditional_page
 from datetime import timedelta
 from django.utils import timezone
 import json
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
@@ -35,56 +59,42 @@ def login_view(request):
             messages.error(request, 'Please enter both Agent ID and Passcode.')
             return render(request, 'intelligence/login.html')
         
-        # Quick access for DOJ agents (doj_agent, doj_agent2, doj_agent3, doj_agent4, doj_agent5)
-        if agent_id.lower().startswith('doj_agent') and passcode == 'agent123':
-            username = agent_id.lower()
-            # Get or create the user
-            user, created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'email': f'{username}@doj.com',
-                    'is_staff': True,
-                    'is_superuser': True,
-                    'is_active': True
-                }
-            )
-            # Always ensure correct permissions and password
-            user.is_staff = True
-            user.is_superuser = True
-            user.is_active = True
-            user.set_password('agent123')
-            user.save()
-            
+        # One passcode hash at most per attempt (see agents.py)
+        try:
+            user = authenticate_agent(request, agent_id, passcode)
+        except LoginThrottled as e:
+            messages.error(request, str(e))
+            response = render(request, 'intelligence/login.html', status=429)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+        except LoginFailed as e:
+            messages.error(request, str(e))
+        else:
             login(request, user)
             return redirect('dashboard')
-        
-        # Try normal Django authentication for other users
-        user = authenticate(request, username=agent_id, password=passcode)
-        
-        if user is not None:
-            if user.is_active:
-                login(request, user)
-                return redirect('dashboard')
-            else:
-                messages.error(request, 'Account is inactive.')
-        else:
-            # Try case-insensitive lookup
-            try:
-                user_obj = User.objects.get(username__iexact=agent_id)
-                if user_obj.check_password(passcode):
-                    if user_obj.is_active:
-                        login(request, user_obj)
-                        return redirect('dashboard')
-                    else:
-                        messages.error(request, 'Account is inactive.')
-                else:
-                    messages.error(request, 'Invalid credentials. Access Denied.')
-            except (User.DoesNotExist, User.MultipleObjectsReturned):
-                messages.error(request, 'Invalid credentials. Access Denied.')
     
     return render(request, 'intelligence/login.html')
 
 
+@login_required
+def login_throttle_stats(request):
+    """Sign-in attempts admitted and refused by the throttle, with its limits, for monitoring"""
+    return JsonResponse({
+        'enabled': settings.LOGIN_THROTTLE_ENABLED,
+        'counters': throttle.counters(),
+        'limits': {
+            'ip': {
+                'burst': settings.LOGIN_THROTTLE_IP_BURST,
+                'refill_seconds': settings.LOGIN_THROTTLE_IP_REFILL_SECONDS,
+            },
+            'agent': {
+                'burst': settings.LOGIN_THROTTLE_AGENT_BURST,
+                'refill_seconds': settings.LOGIN_THROTTLE_AGENT_REFILL_SECONDS,
+            },
+        },
+    })
+
+
 def logout_view(request):
     """Logout view"""
     logout(request)
@@ -96,29 +106,11 @@ def logout_view(request):
 def dashboard(request):
     """Main dashboard view"""
     try:
-        # Get statistics - use safe defaults if database is empty
-        total_gangs = Gang.objects.filter(is_active=True).count()
-        total_members = GangMember.objects.filter(status='ACTIVE').count()
-        open_incidents = Incident.objects.filter(status__in=['OPEN', 'INVESTIGATING']).count()
-        active_cases = CaseFile.objects.filter(status__in=['OPEN', 'ACTIVE']).count()
-        
-        # Recent incidents
-        recent_incidents = Incident.objects.all()[:5]
-        
-        # High priority cases - select_related to avoid N+1 queries
-        priority_cases = CaseFile.objects.select_related('lead_agent').filter(priority__in=['HIGH', 'URGENT'])[:5]
-        
-        # Critical gangs
-        critical_gangs = Gang.objects.filter(threat_level='CRITICAL', is_active=True)[:5]
+        # Counters and top-5 lists come from the cached stats service (one cache hit)
+        dashboard_stats = get_dashboard_stats()
         
         context = {
-            'total_gangs': total_gangs,
-            'total_members': total_members,
-            'open_incidents': open_incidents,
-            'active_cases': active_cases,
-            'recent_incidents': recent_incidents,
-            'priority_cases': priority_cases,
-            'critical_gangs': critical_gangs,
+            **dashboard_stats,
             'agent': request.user,
             'edit_mode': request.session.get('edit_mode', False),
         }
@@ -146,11 +138,14 @@ def dashboard(request):
 
 
 @login_required
+@conditional_page(Gang, GangStats)
 def gang_intelligence(request):
-    """Gang intelligence view"""
-    gangs = Gang.objects.filter(is_active=True).annotate(
-        incident_count=Count('incidents')
-    ).order_by('-threat_level', '-incident_count')
+    """Gang intelligence view - counts come from the precomputed GangStats rollup"""
+    gangs = Gang.objects.filter(is_active=True).select_related('stats').order_by(
+        '-threat_rank', '-stats__incident_count'
+    )
+    if ensure_gang_stats(gangs):
+        gangs = gangs.all()
     
     context = {
         'gangs': gangs,
@@ -161,10 +156,20 @@ def gang_intelligence(request):
     return render(request, 'intelligence/gang_intelligence.html', context)
 
 
+# Orderings offered on the member profiles page; members never scored sort last
+MEMBER_SORTS = {
+    'key_player': (F('centrality__key_player_score').desc(nulls_last=True), 'name'),
+    'betweenness': (F('centrality__betweenness').desc(nulls_last=True), 'name'),
+    'pagerank': (F('centrality__pagerank').desc(nulls_last=True), 'name'),
+    'degree': (F('centrality__degree').desc(nulls_last=True), 'name'),
+    'threat': ('-threat_rank', 'name'),
+}
+
+
 @login_required
 def member_profiles(request):
     """Member profiles view"""
-    members = GangMember.objects.filter(status='ACTIVE').select_related('gang')
+    members = GangMember.objects.filter(status='ACTIVE').select_related('gang', 'centrality')
     
     # Filter by gang if provided
     gang_filter = request.GET.get('gang')
@@ -176,13 +181,23 @@ def member_profiles(request):
     if threat_filter:
         members = members.filter(threat_level=threat_filter)
     
+    # Sort by a network score (see compute_centrality) or the hand-set threat level
+    sort = request.GET.get('sort', '')
+    if sort in MEMBER_SORTS:
+        members = members.order_by(*MEMBER_SORTS[sort])
+    
     gangs = Gang.objects.filter(is_active=True)
+    edit_mode = request.session.get('edit_mode', False)
     
     context = {
-        'members': members,
+        # Cards of unchanged members come from the cache (see cards.py)
+        'member_cards': render_cards(request, GangMember, members, edit_mode),
         'gangs': gangs,
+        'gang_filter': gang_filter or '',
+        'threat_filter': threat_filter or '',
+        'sort': sort,
         'agent': request.user,
-        'edit_mode': request.session.get('edit_mode', False),
+        'edit_mode': edit_mode,
     }
     
     return render(request, 'intelligence/member_profiles.html', context)
@@ -203,9 +218,10 @@ def territory_map(request):
 
 
 @login_required
+@conditional_page(Incident, Gang)
 def incident_reports(request):
-    """Incident reports view"""
-    incidents = Incident.objects.all().prefetch_related('gangs_involved', 'members_involved')
+    """Incident reports view - keyset paginated newest first, or most severe first"""
+    incidents = Incident.objects.all()
     
     # Filters
     status_filter = request.GET.get('status')
@@ -216,15 +232,65 @@ def incident_reports(request):
     if severity_filter:
         incidents = incidents.filter(severity=severity_filter)
     
+    # Page on (date_time, id), led by severity_rank when sorting by severity,
+    # so later pages cost the same as the first
+    sort = request.GET.get('sort', '')
+    paginator = KeysetPaginator(
+        incidents, 'date_time', per_page=settings.INCIDENTS_PER_PAGE,
+        rank_field='severity_rank' if sort == 'severity' else None,
+    )
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    
+    # Cursor links carry the active filters along
+    filter_params = request.GET.copy()
+    for key in ('after', 'before'):
+        filter_params.pop(key, None)
+    
+    edit_mode = request.session.get('edit_mode', False)
+    
     context = {
-        'incidents': incidents,
+        # Cached cards for unchanged rows; gangs are prefetched only for the rest (see cards.py)
+        'incident_cards': render_cards(request, Incident, page.items, edit_mode),
+        'page': page,
+        'filter_query': filter_params.urlencode(),
+        'status_filter': status_filter or '',
+        'severity_filter': severity_filter or '',
+        'sort': sort,
         'agent': request.user,
-        'edit_mode': request.session.get('edit_mode', False),
+        'edit_mode': edit_mode,
     }
     
     return render(request, 'intelligence/incident_reports.html', context)
 
 
+def alliance_analysis(limit=None):
+    """Allied blocs, war clusters and conflict candidates with Gang objects filled in"""
+    graph = get_alliance_graph()
+    candidates = graph.conflict_candidates[:limit]
+    gang_ids = set()
+    for group in graph.allied_blocs + graph.war_clusters:
+        gang_ids |= group
+    for candidate in candidates:
+        gang_ids.update(candidate['gangs'], candidate['via'])
+    gangs = Gang.objects.in_bulk(gang_ids)
+    
+    def named(ids):
+        return sorted((gangs[gang_id] for gang_id in ids if gang_id in gangs), key=lambda gang: gang.name)
+    
+    return {
+        'allied_blocs': [named(bloc) for bloc in graph.allied_blocs],
+        'war_clusters': [named(cluster) for cluster in graph.war_clusters],
+        'conflict_candidates': [
+            {
+                'gangs': [gangs[gang_id] for gang_id in candidate['gangs'] if gang_id in gangs],
+                'via': named(candidate['via']),
+                'current': candidate['current'],
+            }
+            for candidate in candidates
+        ],
+    }
+
+
 @login_required
 def relationships(request):
     """Gang relationships view"""
@@ -234,6 +300,7 @@ def relationships(request):
     context = {
         'relationships': relationships,
         'gangs': gangs,
+        'analysis': alliance_analysis(limit=10),
         'agent': request.user,
         'edit_mode': request.session.get('edit_mode', False),
     }
@@ -242,6 +309,7 @@ def relationships(request):
 
 
 @login_required
+@conditional_page(CaseFile, User)
 def case_files(request):
     """Case files view"""
     cases = CaseFile.objects.all().select_related('lead_agent')
@@ -255,10 +323,12 @@ def case_files(request):
     if priority_filter:
         cases = cases.filter(priority=priority_filter)
     
+    edit_mode = request.session.get('edit_mode', False)
+    
     context = {
-        'cases': cases,
+        'case_cards': render_cards(request, CaseFile, cases, edit_mode),
         'agent': request.user,
-        'edit_mode': request.session.get('edit_mode', False),
+        'edit_mode': edit_mode,
     }
     
     return render(request, 'intelligence/case_files.html', context)
@@ -283,6 +353,437 @@ def system_settings(request):
     return render(request, 'intelligence/system_settings.html', context)
 
 
+# List page each search result type links to
+SEARCH_RESULT_PAGES = {
+    'gang': 'gang_intelligence',
+    'member': 'member_profiles',
+    'incident': 'incident_reports',
+    'case': 'case_files',
+}
+
+
+def search_result_url(hit):
+    """The hit's card on its list page; incidents open the keyset page that starts with them"""
+    url = reverse(SEARCH_RESULT_PAGES[hit.kind])
+    if hit.kind == 'incident':
+        url += '?' + urlencode({'after': cursor_starting_at(hit.obj.date_time, hit.obj.pk)})
+    return f'{url}#{CARDS[type(hit.obj)].dom_id(hit.obj.pk)}'
+
+
+def run_search_request(request):
+    """Run the full-text search described by ?q=&type=&page= query parameters"""
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    kinds = [kind for kind in request.GET.getlist('type') if kind in SEARCH_FIELDS]
+    results = run_search(
+        request.GET.get('q', ''),
+        kinds=kinds or None,
+        page=page,
+        per_page=settings.SEARCH_RESULTS_PER_PAGE,
+    )
+    for hit in results:
+        hit.url = search_result_url(hit)
+    return results, kinds
+
+
+@login_required
+def search_results(request):
+    """Full-text search page across gangs, members, incidents and cases"""
+    results, kinds = run_search_request(request)
+    
+    # Page links carry the query and type filter along
+    params = request.GET.copy()
+    params.pop('page', None)
+    
+    context = {
+        'results': results,
+        'query': request.GET.get('q', ''),
+        'type_filter': kinds[0] if len(kinds) == 1 else '',
+        'page_query': params.urlencode(),
+        'agent': request.user,
+        'edit_mode': request.session.get('edit_mode', False),
+    }
+    
+    return render(request, 'intelligence/search.html', context)
+
+
+@login_required
+def search_api(request):
+    """Full-text search as JSON, ranked best match first"""
+    results, _ = run_search_request(request)
+    return JsonResponse({
+        'query': results.query,
+        'page': results.page,
+        'has_next': results.has_next,
+        'results': [dict(hit.as_dict(), url=hit.url) for hit in results],
+    })
+
+
+@login_required
+def autocomplete_api(request):
+    """Typeahead for the gang/member pickers: name, alias or tag prefix matches"""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    query = request.GET.get('q', '')
+    results = autocomplete_lookup(query, kinds=request.GET.getlist('type') or None, limit=limit)
+    return JsonResponse({'query': query, 'results': results})
+
+
+def gang_summary(gang):
+    return {'id': gang.id, 'name': gang.name, 'tag': gang.tag}
+
+
+@login_required
+def relationship_between(request, gang_id, other_id):
+    """How two gangs stand with each other, from the in-memory relationship graph"""
+    return JsonResponse({
+        'gang_ids': sorted([gang_id, other_id]),
+        'relationship_type': get_alliance_graph().relation(gang_id, other_id),
+    })
+
+
+@login_required
+def relationship_analysis(request):
+    """Allied blocs, war clusters and "enemy of my ally" conflict candidates"""
+    analysis = alliance_analysis()
+    return JsonResponse({
+        'allied_blocs': [[gang_summary(gang) for gang in bloc] for bloc in analysis['allied_blocs']],
+        'war_clusters': [[gang_summary(gang) for gang in cluster] for cluster in analysis['war_clusters']],
+        'conflict_candidates': [
+            {
+                'gangs': [gang_summary(gang) for gang in candidate['gangs']],
+                'via': [gang_summary(gang) for gang in candidate['via']],
+                'current': candidate['current'],
+            }
+            for candidate in analysis['conflict_candidates']
+        ],
+    })
+
+
+def requested_links(request):
+    """Link kinds chosen with ?via=associate&via=incident&via=case (default: all)"""
+    mask = 0
+    for name in request.GET.getlist('via'):
+        mask |= LINK_KINDS.get(name, 0)
+    return mask or ALL_LINKS
+
+
+def member_summaries(member_ids):
+    members = GangMember.objects.select_related('gang').in_bulk(member_ids)
+    return {
+        member_id: {
+            'id': member.id,
+            'name': member.name,
+            'alias': member.alias,
+            'gang': member.gang.tag,
+            'status': member.status,
+        }
+        for member_id, member in members.items()
+    }
+
+
+@login_required
+def member_network(request, member_id):
+    """Members within ?hops= links (default 2, max 4) of a member, and the links between them"""
+    graph = get_graph()
+    if member_id not in graph:
+        return JsonResponse({'error': 'Member not found'}, status=404)
+    try:
+        hops = min(max(int(request.GET.get('hops', 2)), 1), 4)
+    except ValueError:
+        hops = 2
+    links = requested_links(request)
+    
+    distances = graph.neighbourhood(member_id, hops=hops, links=links)
+    distances[member_id] = 0
+    summaries = member_summaries(distances)
+    
+    edges = []
+    for source in distances:
+        for target, (kinds, weight) in graph.neighbours(source, links).items():
+            if source < target and target in distances:
+                edges.append({'source': source, 'target': target, 'links': link_names(kinds), 'weight': weight})
+    
+    return JsonResponse({
+        'member_id': member_id,
+        'hops': hops,
+        'nodes': [dict(summaries[node], distance=distance) for node, distance in distances.items() if node in summaries],
+        'edges': edges,
+    })
+
+
+@login_required
+def member_path(request, member_id, other_id):
+    """Shortest chain of links connecting two members"""
+    graph = get_graph()
+    if member_id not in graph or other_id not in graph:
+        return JsonResponse({'error': 'Member not found'}, status=404)
+    
+    path = graph.shortest_path(member_id, other_id, links=requested_links(request))
+    if path is None:
+        return JsonResponse({'path': None, 'hops': None})
+    
+    summaries = member_summaries(path)
+    steps = []
+    for previous, member in zip([None] + path, path):
+        step = dict(summaries[member])
+        if previous is not None:
+            step['links'] = link_names(graph.neighbours(previous)[member][0])
+        steps.append(step)
+    return JsonResponse({'path': steps, 'hops': len(path) - 1})
+
+
+
+def trend_bound(value, end=False):
+    """
+    A ?start=/?end= value: an ISO datetime, or a date meaning that whole local
+    day (so an end date is inclusive). None when absent.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is not None:
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(f'Invalid date {value!r}')
+    return local_day(date + timedelta(days=1) if end else date)
+
+
+@login_required
+def incident_links(request, incident_id):
+    """Gangs and members linked to an incident, labelled as the edit form's pickers show them"""
+    incident = Incident.objects.filter(pk=incident_id).first()
+    if incident is None:
+        return JsonResponse({'error': 'Incident not found'}, status=404)
+    return JsonResponse({
+        'gang_ids': [{'id': pk, 'label': name} for pk, name in incident.gangs_involved.values_list('id', 'name')],
+        'member_ids': [{'id': pk, 'label': name} for pk, name in incident.members_involved.values_list('id', 'name')],
+    })
+
+
+@login_required
+def incident_trends(request):
+    """
+    Incident counts per ?interval= (hour/day/week/month) between ?start= and
+    ?end= (default: the last 30 days), summed from the pre-aggregated buckets.
+    ?type=, ?severity= and ?gang= filter; ?group_by=type|severity|gang adds
+    one series per value.
+    """
+    try:
+        end = trend_bound(request.GET.get('end'), end=True)
+        if end is None:
+            end = local_day(timezone.localdate() + timedelta(days=1))
+        start = trend_bound(request.GET.get('start')) or end - timedelta(days=30)
+        gang_id = int(request.GET['gang']) if request.GET.get('gang') else None
+        group_by = request.GET.get('group_by') or None
+        result = incident_trend(
+            start, end,
+            interval=request.GET.get('interval', 'day'),
+            group_by=group_by,
+            incident_types=request.GET.getlist('type'),
+            severities=request.GET.getlist('severity'),
+            gang_id=gang_id,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if group_by == 'gang':
+        labels = {gang.id: gang.tag for gang in Gang.objects.filter(id__in=result['series'])}
+    elif group_by:
+        labels = dict(Incident._meta.get_field(TREND_GROUP_FIELDS[group_by]).choices)
+    series = [
+        {'key': key, 'label': labels.get(key, key), 'counts': counts, 'total': sum(counts)}
+        for key, counts in result['series'].items()
+    ]
+    series.sort(key=lambda entry: (-entry['total'], str(entry['key'])))
+    
+    return JsonResponse({
+        'start': result['start'].isoformat(),
+        'end': result['end'].isoformat(),
+        'interval': request.GET.get('interval', 'day'),
+        'group_by': group_by,
+        'periods': result['periods'],
+        'totals': result['totals'],
+        'total': sum(result['totals']),
+        'series': series,
+    })
+
+
+# Smallest clustering cell of map_incidents, in metres
+MIN_CLUSTER_CELL = 1.0
+
+
+def parse_bbox(value):
+    """?bbox=min_x,min_y,max_x,max_y in map metres, enclosing a non-empty area"""
+    try:
+        bbox = [clean_coordinate(part) for part in (value or '').split(',')]
+    except ValueError:
+        bbox = []
+    if len(bbox) != 4 or None in bbox or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+        raise ValueError('bbox must be min_x,min_y,max_x,max_y with min below max')
+    return bbox
+
+
+def map_gang_summaries(gang_ids):
+    return {
+        gang.id: dict(gang_summary(gang), color=gang.color)
+        for gang in Gang.objects.filter(id__in=gang_ids)
+    }
+
+
+@login_required
+def map_incidents(request):
+    """
+    Incidents inside ?bbox=, clustered server-side into a ?grid= by grid
+    (default 32, max 128) of cells over the viewport; ?severity= filters.
+    Cells holding a single incident come back as the incident itself.
+    """
+    try:
+        bbox = parse_bbox(request.GET.get('bbox'))
+        grid = min(max(int(request.GET.get('grid', 32)), 1), 128)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    ranks = {level_rank(level) for level in request.GET.getlist('severity')} or None
+    size = max(max(bbox[2] - bbox[0], bbox[3] - bbox[1]) / grid, MIN_CLUSTER_CELL)
+    
+    clusters = get_incident_index().clusters(bbox, size, ranks)
+    singles = {pk: (x, y) for count, x, y, pk in clusters if count == 1}
+    incidents = [
+        dict(row, x=singles[row['id']][0], y=singles[row['id']][1])
+        for row in Incident.objects.filter(id__in=singles).order_by()
+        .values('id', 'title', 'incident_type', 'severity', 'date_time')
+    ]
+    
+    return JsonResponse({
+        'bbox': bbox,
+        'cell_size': size,
+        'total': sum(count for count, *_ in clusters),
+        'clusters': [
+            {'x': x, 'y': y, 'count': count}
+            for count, x, y, _ in clusters if count > 1
+        ],
+        'incidents': incidents,
+    })
+
+
+@login_required
+def map_territories(request):
+    """Territory polygons of active gangs, optionally only those overlapping ?bbox="""
+    try:
+        bbox = parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    territories = get_territory_index().in_bbox(bbox)
+    gangs = map_gang_summaries(territories)
+    return JsonResponse({
+        'territories': [
+            {'gang': gangs[gang_id], 'polygons': polygons}
+            for gang_id, polygons in territories.items() if gang_id in gangs
+        ],
+    })
+
+
+@login_required
+def map_tile(request, z, x, y):
+    """
+    One z/x/y map tile: active territories clipped to it plus its incidents
+    clustered into an 8 by 8 grid, optionally only one ?severity=. Served
+    from the disk tile cache, with an ETag so unchanged tiles revalidate
+    as 304s.
+    """
+    severity = request.GET.get('severity') or None
+    if severity is not None and not level_rank(severity):
+        return JsonResponse({'error': f'Unknown severity {severity!r}'}, status=400)
+    if not tile_exists(z, x, y):
+        return JsonResponse({'error': 'Tile not found'}, status=404)
+    
+    version = tile_version(z, x, y)
+    etag = f'"{(severity or "all").lower()}-{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_tile(z, x, y, severity, version), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def map_hotspots(request):
+    """Hotspots stored by the last compute_hotspots run, optionally only those overlapping ?bbox="""
+    try:
+        bbox = parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    hotspots = [
+        hotspot for hotspot in Hotspot.objects.all()
+        if bbox is None or bbox_overlaps(polygon_bounds(hotspot.polygon), bbox)
+    ]
+    latest = hotspots[0] if hotspots else None
+    return JsonResponse({
+        'computed_at': latest and latest.computed_at.isoformat(),
+        'window_start': latest and latest.window_start.isoformat(),
+        'window_end': latest and latest.window_end.isoformat(),
+        'hotspots': [
+            {
+                'rank': hotspot.rank,
+                'score': hotspot.score,
+                'peak_density': hotspot.peak_density,
+                'incident_count': hotspot.incident_count,
+                'x': hotspot.center_x,
+                'y': hotspot.center_y,
+                'polygon': hotspot.polygon,
+            }
+            for hotspot in hotspots
+        ],
+    })
+
+
+@login_required
+def map_point(request):
+    """Territories containing ?x=&y=, plus territories and incidents within ?radius= metres"""
+    try:
+        x, y = clean_coordinate(request.GET.get('x')), clean_coordinate(request.GET.get('y'))
+        radius = float(request.GET.get('radius', 250))
+        if not math.isfinite(radius):
+            raise ValueError('radius must be a finite number of metres')
+        radius = min(max(radius, 0), 5000)
+        if x is None or y is None:
+            raise ValueError('x and y are required')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    territories = get_territory_index()
+    nearby = territories.near(x, y, radius)
+    found = get_incident_index().within_radius(x, y, radius)[:50]
+    rows = Incident.objects.filter(id__in=[pk for _, pk in found]).order_by().in_bulk()
+    gangs = map_gang_summaries(nearby)
+    
+    return JsonResponse({
+        'x': x,
+        'y': y,
+        'radius': radius,
+        'inside': [gangs[gang_id] for gang_id in territories.gangs_at(x, y) if gang_id in gangs],
+        'nearby_territories': [
+            dict(gangs[gang_id], distance=round(distance, 1))
+            for gang_id, distance in sorted(nearby.items(), key=lambda item: item[1]) if gang_id in gangs
+        ],
+        'incidents': [
+            {
+                'id': pk,
+                'title': rows[pk].title,
+                'severity': rows[pk].severity,
+                'distance': round(distance, 1),
+            }
+            for distance, pk in found if pk in rows
+        ],
+    })
+
 # ===================================
 # CRUD VIEWS FOR EDIT MODE
 # ===================================
@@ -292,6 +793,28 @@ def check_edit_mode(request):
     return request.session.get('edit_mode', False)
 
 
+def alliance_fragment(request):
+    """The relationships page's analysis panels, which any relationship change can reshape"""
+    html = render_to_string(
+        'intelligence/includes/alliance_analysis.html', {'analysis': alliance_analysis(limit=10)}, request=request
+    )
+    return {'alliance-analysis': html.strip()}
+
+
+def saved_response(request, model, pk, message, also=None, **payload):
+    """
+    JSON reply of the CRUD endpoints. With ?fragment=1 it carries the changed
+    card, and whatever else `also` renders, as {DOM id: HTML} under
+    'fragments' for edit-mode.js to patch into the page without a reload.
+    """
+    payload.update(success=True, message=message)
+    if request.GET.get('fragment') == '1':
+        payload['fragments'] = card_fragment(request, model, pk)
+        if also:
+            payload['fragments'].update(also(request))
+    return JsonResponse(payload)
+
+
 # Gang CRUD
 @login_required
 @require_http_methods(["POST"])
@@ -307,12 +830,13 @@ def create_gang(request):
             tag=data.get('tag', ''),
             color=data.get('color', '#FF0000'),
             territory=data.get('territory', ''),
+            territory_area=clean_territory(data.get('territory_area')),
             threat_level=data.get('threat_level', 'MEDIUM'),
             member_count=data.get('member_count', 0),
             description=data.get('description', ''),
             is_active=data.get('is_active', True)
         )
-        return JsonResponse({'success': True, 'id': gang.id, 'message': 'Gang created successfully'})
+        return saved_response(request, Gang, gang.id, 'Gang created successfully', id=gang.id)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -332,13 +856,15 @@ def update_gang(request, gang_id):
             if field in data:
                 setattr(gang, field, data[field])
         
+        if 'territory_area' in data:
+            gang.territory_area = clean_territory(data['territory_area'])
         if 'member_count' in data:
             gang.member_count = int(data['member_count'])
         if 'is_active' in data:
             gang.is_active = bool(data['is_active'])
         
         gang.save()
-        return JsonResponse({'success': True, 'message': 'Gang updated successfully'})
+        return saved_response(request, Gang, gang.id, 'Gang updated successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -353,7 +879,7 @@ def delete_gang(request, gang_id):
     try:
         gang = get_object_or_404(Gang, id=gang_id)
         gang.delete()
-        return JsonResponse({'success': True, 'message': 'Gang deleted successfully'})
+        return saved_response(request, Gang, gang_id, 'Gang deleted successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -379,7 +905,7 @@ def create_member(request):
             criminal_record=data.get('criminal_record', ''),
             notes=data.get('notes', '')
         )
-        return JsonResponse({'success': True, 'id': member.id, 'message': 'Member created successfully'})
+        return saved_response(request, GangMember, member.id, 'Member created successfully', id=member.id)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -404,7 +930,7 @@ def update_member(request, member_id):
             member.gang = gang
         
         member.save()
-        return JsonResponse({'success': True, 'message': 'Member updated successfully'})
+        return saved_response(request, GangMember, member.id, 'Member updated successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -419,11 +945,35 @@ def delete_member(request, member_id):
     try:
         member = get_object_or_404(GangMember, id=member_id)
         member.delete()
-        return JsonResponse({'success': True, 'message': 'Member deleted successfully'})
+        return saved_response(request, GangMember, member_id, 'Member deleted successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def bulk_write(request, spec, label):
+    """Shared body of the bulk endpoints: a JSON list, or {"items": [...]}"""
+    if not check_edit_mode(request):
+        return JsonResponse({'error': 'Edit mode not enabled'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        items = data.get('items') if isinstance(data, dict) else data
+        results = apply_bulk(spec, items, user=request.user)
+        return JsonResponse({'success': True, 'results': results, 'message': f'{len(results)} {label} saved'})
+    except BulkValidationError as e:
+        return JsonResponse({'error': str(e), 'results': e.errors}, status=400)
+    except ValueError as e:
+        # Unreadable JSON; anything else is a server error, not the client's
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_members(request):
+    """Create and/or update many gang members in one transaction"""
+    return bulk_write(request, MEMBER_SPEC, 'members')
+
+
 # Incident CRUD
 @login_required
 @require_http_methods(["POST"])
@@ -434,24 +984,28 @@ def create_incident(request):
     
     try:
         data = json.loads(request.body)
-        incident = Incident.objects.create(
-            title=data.get('title', ''),
-            incident_type=data.get('incident_type', 'OTHER'),
-            location=data.get('location', ''),
-            description=data.get('description', ''),
-            severity=data.get('severity', 'MEDIUM'),
-            status=data.get('status', 'OPEN'),
-            evidence=data.get('evidence', ''),
-            reported_by=request.user
-        )
-        
-        # Add gangs and members if provided
-        if 'gang_ids' in data:
-            incident.gangs_involved.set(data['gang_ids'])
-        if 'member_ids' in data:
-            incident.members_involved.set(data['member_ids'])
+        # One transaction, so the rollups and trend buckets refresh once on commit
+        with transaction.atomic():
+            incident = Incident.objects.create(
+                title=data.get('title', ''),
+                incident_type=data.get('incident_type', 'OTHER'),
+                location=data.get('location', ''),
+                map_x=clean_coordinate(data.get('map_x')),
+                map_y=clean_coordinate(data.get('map_y')),
+                description=data.get('description', ''),
+                severity=data.get('severity', 'MEDIUM'),
+                status=data.get('status', 'OPEN'),
+                evidence=data.get('evidence', ''),
+                reported_by=request.user
+            )
+            
+            # Add gangs and members if provided
+            if 'gang_ids' in data:
+                incident.gangs_involved.set(data['gang_ids'])
+            if 'member_ids' in data:
+                incident.members_involved.set(data['member_ids'])
         
-        return JsonResponse({'success': True, 'id': incident.id, 'message': 'Incident created successfully'})
+        return saved_response(request, Incident, incident.id, 'Incident created successfully', id=incident.id)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -470,14 +1024,18 @@ def update_incident(request, incident_id):
         for field in ['title', 'incident_type', 'location', 'description', 'severity', 'status', 'evidence']:
             if field in data:
                 setattr(incident, field, data[field])
+        for field in ['map_x', 'map_y']:
+            if field in data:
+                setattr(incident, field, clean_coordinate(data[field]))
         
-        if 'gang_ids' in data:
-            incident.gangs_involved.set(data['gang_ids'])
-        if 'member_ids' in data:
-            incident.members_involved.set(data['member_ids'])
-        
-        incident.save()
-        return JsonResponse({'success': True, 'message': 'Incident updated successfully'})
+        with transaction.atomic():
+            if 'gang_ids' in data:
+                incident.gangs_involved.set(data['gang_ids'])
+            if 'member_ids' in data:
+                incident.members_involved.set(data['member_ids'])
+            
+            incident.save()
+        return saved_response(request, Incident, incident.id, 'Incident updated successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -492,11 +1050,18 @@ def delete_incident(request, incident_id):
     try:
         incident = get_object_or_404(Incident, id=incident_id)
         incident.delete()
-        return JsonResponse({'success': True, 'message': 'Incident deleted successfully'})
+        return saved_response(request, Incident, incident_id, 'Incident deleted successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@login_required
+@require_http_methods(["POST"])
+def bulk_incidents(request):
+    """Create and/or update many incidents in one transaction"""
+    return bulk_write(request, INCIDENT_SPEC, 'incidents')
+
+
 # CaseFile CRUD
 @login_required
 @require_http_methods(["POST"])
@@ -542,7 +1107,7 @@ def create_case(request):
                 member_ids = data.get('member_ids', [])
             case.members.set(member_ids)
         
-        return JsonResponse({'success': True, 'id': case.id, 'message': 'Case created successfully'})
+        return saved_response(request, CaseFile, case.id, 'Case created successfully', id=case.id)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -590,7 +1155,7 @@ def update_case(request, case_id):
             case.members.set(member_ids)
         
         case.save()
-        return JsonResponse({'success': True, 'message': 'Case updated successfully'})
+        return saved_response(request, CaseFile, case.id, 'Case updated successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -605,7 +1170,7 @@ def delete_case(request, case_id):
     try:
         case = get_object_or_404(CaseFile, id=case_id)
         case.delete()
-        return JsonResponse({'success': True, 'message': 'Case deleted successfully'})
+        return saved_response(request, CaseFile, case_id, 'Case deleted successfully')
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -629,7 +1194,10 @@ def create_relationship(request):
             relationship_type=data.get('relationship_type', 'NEUTRAL'),
             notes=data.get('notes', '')
         )
-        return JsonResponse({'success': True, 'id': relationship.id, 'message': 'Relationship created successfully'})
+        return saved_response(
+            request, GangRelationship, relationship.id, 'Relationship created successfully',
+            also=alliance_fragment, id=relationship.id,
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -650,7 +1218,9 @@ def update_relationship(request, relationship_id):
                 setattr(relationship, field, data[field])
         
         relationship.save()
-        return JsonResponse({'success': True, 'message': 'Relationship updated successfully'})
+        return saved_response(
+            request, GangRelationship, relationship.id, 'Relationship updated successfully', also=alliance_fragment
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -665,7 +1235,9 @@ def delete_relationship(request, relationship_id):
     try:
         relationship = get_object_or_404(GangRelationship, id=relationship_id)
         relationship.delete()
-        return JsonResponse({'success': True, 'message': 'Relationship deleted successfully'})
+        return saved_response(
+            request, GangRelationship, relationship_id, 'Relationship deleted successfully', also=alliance_fragment
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
@@ -196,3 +196,51 @@ if not CSRF_TRUSTED_ORIGINS:
             if first_host and first_host != '*':
                 CSRF_TRUSTED_ORIGINS = [f'https://{first_host}']
 
+
+# Incident reports page size (keyset pagination)
+INCIDENTS_PER_PAGE = int(os.environ.get('INCIDENTS_PER_PAGE', '25'))
+
+# Full-text search page size (see intelligence/search.py)
+SEARCH_RESULTS_PER_PAGE = int(os.environ.get('SEARCH_RESULTS_PER_PAGE', '20'))
+
+# Cache
+# locmem is per process; set CACHE_BACKEND/CACHE_LOCATION to a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) for multi-worker deployments
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'sa-doj'),
+    }
+}
+
+# Dashboard statistics (see intelligence/stats.py)
+DASHBOARD_STATS_CACHE = os.environ.get('DASHBOARD_STATS_CACHE', 'default')
+DASHBOARD_STATS_RECONCILE_SECONDS = int(os.environ.get('DASHBOARD_STATS_RECONCILE_SECONDS', '300'))
+
+# Rendered territory map tiles (see intelligence/tiles.py)
+TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR', str(BASE_DIR / 'tile_cache'))
+if 'TILE_CACHE_DIR' not in os.environ and 'RAILWAY_VOLUME_MOUNT_PATH' in os.environ:
+    TILE_CACHE_DIR = os.path.join(os.environ.get('RAILWAY_VOLUME_MOUNT_PATH'), 'tile_cache')
+
+# Background jobs (see intelligence/jobs.py and the run_worker command)
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', '2'))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '600'))
+# Run jobs in the web process after each commit instead, for development without a worker
+JOBS_INLINE = os.environ.get('JOBS_INLINE', 'False') == 'True'
+
+# Largest batch accepted by the bulk JSON API endpoints
+BULK_API_MAX_ITEMS = int(os.environ.get('BULK_API_MAX_ITEMS', '500'))
+
+# Sign-in throttling (see intelligence/throttle.py): token buckets per client IP and per agent ID,
+# kept in the database and each holding up to BURST attempts and regaining one every REFILL_SECONDS
+LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', 'True') == 'True'
+LOGIN_THROTTLE_IP_BURST = int(os.environ.get('LOGIN_THROTTLE_IP_BURST', '20'))
+LOGIN_THROTTLE_IP_REFILL_SECONDS = float(os.environ.get('LOGIN_THROTTLE_IP_REFILL_SECONDS', '6'))
+LOGIN_THROTTLE_AGENT_BURST = int(os.environ.get('LOGIN_THROTTLE_AGENT_BURST', '5'))
+LOGIN_THROTTLE_AGENT_REFILL_SECONDS = float(os.environ.get('LOGIN_THROTTLE_AGENT_REFILL_SECONDS', '60'))
+# Full buckets' rows are deleted on about one attempt in this many
+LOGIN_THROTTLE_PRUNE_EVERY = int(os.environ.get('LOGIN_THROTTLE_PRUNE_EVERY', '100'))
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 trusts REMOTE_ADDR only.
+# Railway's edge proxy is one, so every client would otherwise share its address
+ON_RAILWAY = any(name in os.environ for name in ('RAILWAY_ENVIRONMENT', 'RAILWAY_ENVIRONMENT_NAME', 'RAILWAY_PROJECT_ID'))
+LOGIN_THROTTLE_PROXY_COUNT = int(os.environ.get('LOGIN_THROTTLE_PROXY_COUNT', '1' if ON_RAILWAY else '0'))
@@ -50,6 +50,149 @@ async function apiCall(url, method, data) {
     }
 }
 
+// Patch the page with the re-rendered cards of a ?fragment=1 reply ({DOM id: HTML})
+// instead of reloading it. A card not on the page yet goes first in `container`;
+// an empty fragment means the element should go.
+function applyFragments(result, container) {
+    if (!result.fragments) {
+        location.reload();
+        return;
+    }
+    for (const [id, html] of Object.entries(result.fragments)) {
+        const current = document.getElementById(id);
+        const template = document.createElement('template');
+        template.innerHTML = html;
+        const replacement = template.content.firstElementChild;
+        if (current && replacement) {
+            current.replaceWith(replacement);
+        } else if (current) {
+            current.remove();
+        } else if (replacement) {
+            document.querySelector(container)?.prepend(replacement);
+        }
+    }
+}
+
+// ===================================
+// GANG / MEMBER PICKERS
+// ===================================
+
+// Wait this long after the last keystroke before asking for suggestions
+const PICKER_DEBOUNCE_MS = 200;
+
+// Typeahead pickers: <div class="id-picker" data-type="gang" data-field="gang_ids">
+function initIdPicker(picker) {
+    const input = picker.querySelector('.picker-input');
+    const chips = picker.querySelector('.picker-chips');
+    const suggestions = picker.querySelector('.picker-suggestions');
+    picker.selected = new Map();
+    picker.dirty = false;
+    let requestSeq = 0;
+
+    function renderChips() {
+        chips.innerHTML = '';
+        picker.selected.forEach((label, id) => {
+            const chip = document.createElement('span');
+            chip.className = 'picker-chip';
+            chip.textContent = label;
+            const remove = document.createElement('button');
+            remove.type = 'button';
+            remove.textContent = '×';
+            remove.onclick = () => {
+                picker.selected.delete(id);
+                picker.dirty = true;
+                renderChips();
+            };
+            chip.appendChild(remove);
+            chips.appendChild(chip);
+        });
+    }
+
+    picker.reset = () => {
+        picker.selected.clear();
+        picker.dirty = false;
+        input.disabled = false;
+        input.value = '';
+        suggestions.innerHTML = '';
+        renderChips();
+    };
+
+    // Show a record's current links, [{id, label}]; picks made meanwhile are kept
+    picker.fill = items => {
+        items.forEach(item => picker.selected.set(item.id, item.label));
+        input.disabled = false;
+        renderChips();
+    };
+
+    let debounceTimer;
+    input.addEventListener('input', () => {
+        clearTimeout(debounceTimer);
+        const seq = ++requestSeq;
+        const query = input.value.trim();
+        if (!query) {
+            suggestions.innerHTML = '';
+            return;
+        }
+        debounceTimer = setTimeout(() => suggest(query, seq), PICKER_DEBOUNCE_MS);
+    });
+
+    async function suggest(query, seq) {
+        const params = new URLSearchParams({ q: query, type: picker.dataset.type, limit: 8 });
+        const response = await fetch(`/api/autocomplete/?${params}`);
+        if (!response.ok || seq !== requestSeq) return;  // a newer keystroke won
+        const { results } = await response.json();
+        suggestions.innerHTML = '';
+        results.forEach(result => {
+            const item = document.createElement('li');
+            item.textContent = result.detail ? `${result.label} (${result.detail})` : result.label;
+            item.onclick = () => {
+                picker.selected.set(result.id, result.label);
+                picker.dirty = true;
+                input.value = '';
+                suggestions.innerHTML = '';
+                renderChips();
+            };
+            suggestions.appendChild(item);
+        });
+    }
+}
+
+// Ids chosen in a form's pickers, e.g. {gang_ids: [1, 4]}; untouched pickers are left out
+function pickerValues(form) {
+    const values = {};
+    form.querySelectorAll('.id-picker').forEach(picker => {
+        if (picker.dirty) {
+            values[picker.dataset.field] = Array.from(picker.selected.keys());
+        }
+    });
+    return values;
+}
+
+function resetPickers(form) {
+    form.pickerLoad = (form.pickerLoad || 0) + 1;  // drops links still loading for a previous record
+    form.querySelectorAll('.id-picker').forEach(picker => picker.reset());
+}
+
+// Reset a form's pickers and show the record's links from `url`, {field: [{id, label}]}.
+// The inputs stay disabled until the links arrive, so a pick cannot replace links never loaded.
+async function loadPickers(form, url) {
+    resetPickers(form);
+    const load = form.pickerLoad;
+    const pickers = form.querySelectorAll('.id-picker');
+    pickers.forEach(picker => { picker.querySelector('.picker-input').disabled = true; });
+    try {
+        const response = await fetch(url);
+        if (!response.ok) return;
+        const links = await response.json();
+        if (load !== form.pickerLoad) return;
+        pickers.forEach(picker => picker.fill(links[picker.dataset.field] || []));
+    } catch (error) {
+        console.error('Could not load links:', error);
+    }
+}
+
+document.querySelectorAll('.id-picker').forEach(initIdPicker);
+
 // ===================================
 // GANG CRUD OPERATIONS
 // ===================================
@@ -92,15 +235,26 @@ document.getElementById('gangForm')?.addEventListener('submit', async (e) => {
     const gangId = document.getElementById('gangId').value;
     
     try {
+        const areas = document.getElementById('gangTerritoryArea')?.value.trim();
+        if (areas) {
+            formData.territory_area = JSON.parse(areas);
+        }
+    } catch (error) {
+        alert('Territory map areas must be valid JSON');
+        return;
+    }
+    
+    try {
+        let result;
         if (gangId) {
-            await apiCall(`/api/gang/${gangId}/update/`, 'POST', formData);
+            result = await apiCall(`/api/gang/${gangId}/update/?fragment=1`, 'POST', formData);
             alert('Gang updated successfully!');
         } else {
-            await apiCall('/api/gang/create/', 'POST', formData);
+            result = await apiCall('/api/gang/create/?fragment=1', 'POST', formData);
             alert('Gang created successfully!');
         }
         closeGangModal();
-        location.reload();
+        applyFragments(result, '.gangs-grid');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -112,9 +266,9 @@ async function deleteGang(gangId) {
     }
     
     try {
-        await apiCall(`/api/gang/${gangId}/delete/`, 'POST', {});
+        const result = await apiCall(`/api/gang/${gangId}/delete/?fragment=1`, 'POST', {});
         alert('Gang deleted successfully!');
-        location.reload();
+        applyFragments(result, '.gangs-grid');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -159,15 +313,16 @@ document.getElementById('memberForm')?.addEventListener('submit', async (e) => {
     const memberId = document.getElementById('memberId').value;
     
     try {
+        let result;
         if (memberId) {
-            await apiCall(`/api/member/${memberId}/update/`, 'POST', formData);
+            result = await apiCall(`/api/member/${memberId}/update/?fragment=1`, 'POST', formData);
             alert('Member updated successfully!');
         } else {
-            await apiCall('/api/member/create/', 'POST', formData);
+            result = await apiCall('/api/member/create/?fragment=1', 'POST', formData);
             alert('Member created successfully!');
         }
         closeMemberModal();
-        location.reload();
+        applyFragments(result, '.members-grid');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -179,9 +334,9 @@ async function deleteMember(memberId) {
     }
     
     try {
-        await apiCall(`/api/member/${memberId}/delete/`, 'POST', {});
+        const result = await apiCall(`/api/member/${memberId}/delete/?fragment=1`, 'POST', {});
         alert('Member deleted successfully!');
-        location.reload();
+        applyFragments(result, '.members-grid');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -194,6 +349,7 @@ async function deleteMember(memberId) {
 function openCreateIncidentModal() {
     document.getElementById('incidentId').value = '';
     document.getElementById('incidentForm').reset();
+    resetPickers(document.getElementById('incidentForm'));
     document.getElementById('incidentModalTitle').textContent = 'Create New Incident';
     document.getElementById('incidentModal').style.display = 'block';
 }
@@ -202,6 +358,7 @@ function editIncident(incidentId) {
     document.getElementById('incidentId').value = incidentId;
     document.getElementById('incidentModalTitle').textContent = 'Edit Incident';
     document.getElementById('incidentModal').style.display = 'block';
+    loadPickers(document.getElementById('incidentForm'), `/api/incident/${incidentId}/links/`);
     // TODO: Fetch and populate incident data
 }
 
@@ -219,21 +376,31 @@ document.getElementById('incidentForm')?.addEventListener('submit', async (e) =>
         description: document.getElementById('incidentDescription').value,
         severity: document.getElementById('incidentSeverity').value,
         status: document.getElementById('incidentStatus').value,
-        evidence: document.getElementById('incidentEvidence').value
+        evidence: document.getElementById('incidentEvidence').value,
+        ...pickerValues(e.target)
     };
     
+    // Coordinates are optional; blank fields leave the incident's position alone
+    for (const [field, id] of [['map_x', 'incidentMapX'], ['map_y', 'incidentMapY']]) {
+        const value = document.getElementById(id)?.value;
+        if (value) {
+            formData[field] = parseFloat(value);
+        }
+    }
+    
     const incidentId = document.getElementById('incidentId').value;
     
     try {
+        let result;
         if (incidentId) {
-            await apiCall(`/api/incident/${incidentId}/update/`, 'POST', formData);
+            result = await apiCall(`/api/incident/${incidentId}/update/?fragment=1`, 'POST', formData);
             alert('Incident updated successfully!');
         } else {
-            await apiCall('/api/incident/create/', 'POST', formData);
+            result = await apiCall('/api/incident/create/?fragment=1', 'POST', formData);
             alert('Incident created successfully!');
         }
         closeIncidentModal();
-        location.reload();
+        applyFragments(result, '.incidents-list');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -245,9 +412,9 @@ async function deleteIncident(incidentId) {
     }
     
     try {
-        await apiCall(`/api/incident/${incidentId}/delete/`, 'POST', {});
+        const result = await apiCall(`/api/incident/${incidentId}/delete/?fragment=1`, 'POST', {});
         alert('Incident deleted successfully!');
-        location.reload();
+        applyFragments(result, '.incidents-list');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -492,7 +659,7 @@ document.getElementById('caseForm')?.addEventListener('submit', async (e) => {
         formData.append('image', imageFile);
         
         try {
-            const url = caseId ? `/api/case/${caseId}/update/` : '/api/case/create/';
+            const url = caseId ? `/api/case/${caseId}/update/?fragment=1` : '/api/case/create/?fragment=1';
             const response = await fetch(url, {
                 method: 'POST',
                 headers: {
@@ -515,7 +682,7 @@ document.getElementById('caseForm')?.addEventListener('submit', async (e) => {
             }
             croppedImageBlob = null;
             closeCaseModal();
-            location.reload();
+            applyFragments(result, '.cases-grid');
         } catch (error) {
             console.error('API Error:', error);
             alert('Error: ' + error.message);
@@ -538,11 +705,12 @@ document.getElementById('caseForm')?.addEventListener('submit', async (e) => {
         }
         
         try {
+            let result;
             if (caseId) {
-                await apiCall(`/api/case/${caseId}/update/`, 'POST', formData);
+                result = await apiCall(`/api/case/${caseId}/update/?fragment=1`, 'POST', formData);
             alert('Case updated successfully!');
         } else {
-            await apiCall('/api/case/create/', 'POST', formData);
+            result = await apiCall('/api/case/create/?fragment=1', 'POST', formData);
             alert('Case created successfully!');
         }
         // Clean up
@@ -552,7 +720,7 @@ document.getElementById('caseForm')?.addEventListener('submit', async (e) => {
         }
         croppedImageBlob = null;
         closeCaseModal();
-        location.reload();
+        applyFragments(result, '.cases-grid');
         } catch (error) {
             // Error already handled in apiCall
         }
@@ -565,9 +733,9 @@ async function deleteCase(caseId) {
     }
     
     try {
-        await apiCall(`/api/case/${caseId}/delete/`, 'POST', {});
+        const result = await apiCall(`/api/case/${caseId}/delete/?fragment=1`, 'POST', {});
         alert('Case deleted successfully!');
-        location.reload();
+        applyFragments(result, '.cases-grid');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -608,15 +776,16 @@ document.getElementById('relationshipForm')?.addEventListener('submit', async (e
     const relationshipId = document.getElementById('relationshipId').value;
     
     try {
+        let result;
         if (relationshipId) {
-            await apiCall(`/api/relationship/${relationshipId}/update/`, 'POST', formData);
+            result = await apiCall(`/api/relationship/${relationshipId}/update/?fragment=1`, 'POST', formData);
             alert('Relationship updated successfully!');
         } else {
-            await apiCall('/api/relationship/create/', 'POST', formData);
+            result = await apiCall('/api/relationship/create/?fragment=1', 'POST', formData);
             alert('Relationship created successfully!');
         }
         closeRelationshipModal();
-        location.reload();
+        applyFragments(result, '.relationships-list');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -628,9 +797,9 @@ async function deleteRelationship(relationshipId) {
     }
     
     try {
-        await apiCall(`/api/relationship/${relationshipId}/delete/`, 'POST', {});
+        const result = await apiCall(`/api/relationship/${relationshipId}/delete/?fragment=1`, 'POST', {});
         alert('Relationship deleted successfully!');
-        location.reload();
+        applyFragments(result, '.relationships-list');
     } catch (error) {
         // Error already handled in apiCall
     }
@@ -0,0 +1,355 @@
+// Territory map for the SA-DOJ Intelligence System
+// Pans and zooms over map coordinates (metres, y pointing north), drawing
+// z/x/y tiles of gang territories and server-clustered incidents, with the
+// precomputed incident hotspots between the two layers. Tiles are kept until "Reset view", which
+// fetches them again; the server revalidates them by ETag, so unchanged ones
+// come back as 304s
+
+(function () {
+    const frame = document.getElementById('territoryMap');
+    if (!frame) return;
+
+    const canvas = document.getElementById('territoryMapCanvas');
+    const ctx = canvas.getContext('2d');
+    const statusEl = document.getElementById('mapStatus');
+    const severityEl = document.getElementById('mapSeverity');
+    const infoEl = document.getElementById('mapInfo');
+    const hotspotsEl = document.getElementById('mapHotspots');
+
+    // Playable area of the San Andreas map, in metres
+    const WORLD = {minX: -4000, minY: -4000, maxX: 4500, maxY: 8000};
+    // Must match intelligence/tiles.py
+    const TILE_EXTENT = 204800;
+    const MAX_ZOOM = 12;
+    const TILE_PX = 256;
+    const MAX_TILES = 512;
+    const SEVERITY_COLORS = {CRITICAL: '#c0392b', HIGH: '#e67e22', MEDIUM: '#f39c12', LOW: '#27ae60'};
+
+    const view = {x: 0, y: 0, scale: 1};  // centre in metres, metres per pixel
+    const tiles = new Map();  // "severity/z/x/y" -> tile data, or null while loading
+    const tileBase = frame.dataset.tileUrl.replace(/0\/0\/0\.json$/, '');
+    let hotspots = [];
+    let loadTimer = null;
+    let drag = null;
+
+    // -- coordinates -------------------------------------------------------
+
+    function resize() {
+        const ratio = window.devicePixelRatio || 1;
+        canvas.width = canvas.clientWidth * ratio;
+        canvas.height = canvas.clientHeight * ratio;
+        ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+    }
+
+    function resetView() {
+        view.x = (WORLD.minX + WORLD.maxX) / 2;
+        view.y = (WORLD.minY + WORLD.maxY) / 2;
+        view.scale = Math.max(
+            (WORLD.maxX - WORLD.minX) / canvas.clientWidth,
+            (WORLD.maxY - WORLD.minY) / canvas.clientHeight
+        );
+    }
+
+    function toScreen(x, y) {
+        return [
+            canvas.clientWidth / 2 + (x - view.x) / view.scale,
+            canvas.clientHeight / 2 - (y - view.y) / view.scale,
+        ];
+    }
+
+    function toWorld(px, py) {
+        return [
+            view.x + (px - canvas.clientWidth / 2) * view.scale,
+            view.y - (py - canvas.clientHeight / 2) * view.scale,
+        ];
+    }
+
+    function eventPoint(e) {
+        const rect = canvas.getBoundingClientRect();
+        return [e.clientX - rect.left, e.clientY - rect.top];
+    }
+
+    // -- data --------------------------------------------------------------
+
+    async function getJSON(url) {
+        const response = await fetch(url, {headers: {'Accept': 'application/json'}});
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        return response.json();
+    }
+
+    function visibleTiles() {
+        const z = Math.min(Math.max(Math.round(Math.log2(TILE_EXTENT / (TILE_PX * view.scale))), 0), MAX_ZOOM);
+        const size = TILE_EXTENT / 2 ** z;
+        const last = 2 ** z - 1;
+        const clamp = value => Math.min(Math.max(Math.floor(value), 0), last);
+        const [minX, maxY] = toWorld(0, 0);
+        const [maxX, minY] = toWorld(canvas.clientWidth, canvas.clientHeight);
+        const keys = [];
+        for (let x = clamp((minX + TILE_EXTENT / 2) / size); x <= clamp((maxX + TILE_EXTENT / 2) / size); x++) {
+            for (let y = clamp((TILE_EXTENT / 2 - maxY) / size); y <= clamp((TILE_EXTENT / 2 - minY) / size); y++) {
+                keys.push(`${severityEl.value}/${z}/${x}/${y}`);
+            }
+        }
+        return keys;
+    }
+
+    async function loadTile(key) {
+        const [severity, z, x, y] = key.split('/');
+        tiles.set(key, null);
+        try {
+            const tile = await getJSON(`${tileBase}${z}/${x}/${y}.json${severity ? `?severity=${severity}` : ''}`);
+            tiles.set(key, tile);
+        } catch (error) {
+            tiles.delete(key);
+            statusEl.textContent = 'Could not load map tiles';
+            return;
+        }
+        draw();
+    }
+
+    function loadTiles() {
+        const wanted = visibleTiles();
+        for (const key of wanted) {
+            if (!tiles.has(key)) loadTile(key);
+        }
+        // Forget the oldest tiles once the cache outgrows MAX_TILES (Maps iterate in insertion order)
+        for (const key of tiles.keys()) {
+            if (tiles.size <= Math.max(MAX_TILES, wanted.length)) break;
+            if (!wanted.includes(key)) tiles.delete(key);
+        }
+    }
+
+    function scheduleLoad() {
+        clearTimeout(loadTimer);
+        loadTimer = setTimeout(loadTiles, 150);
+    }
+
+    async function lookup(px, py) {
+        const [x, y] = toWorld(px, py);
+        const params = new URLSearchParams({
+            x: x.toFixed(1),
+            y: y.toFixed(1),
+            radius: Math.round(Math.max(25, 20 * view.scale)),
+        });
+        try {
+            renderInfo(await getJSON(`${frame.dataset.pointUrl}?${params}`));
+        } catch (error) {
+            infoEl.textContent = 'Could not look up this point';
+        }
+    }
+
+    // -- drawing -----------------------------------------------------------
+
+    function drawGrid(width, height) {
+        let step = 1000;
+        while (step / view.scale < 40) step *= 2;
+        const [minX, maxY] = toWorld(0, 0);
+        const [maxX, minY] = toWorld(width, height);
+        ctx.strokeStyle = 'rgba(44, 62, 80, 0.6)';
+        ctx.lineWidth = 1;
+        ctx.beginPath();
+        for (let x = Math.ceil(minX / step) * step; x <= maxX; x += step) {
+            const [px] = toScreen(x, 0);
+            ctx.moveTo(px, 0);
+            ctx.lineTo(px, height);
+        }
+        for (let y = Math.ceil(minY / step) * step; y <= maxY; y += step) {
+            const [, py] = toScreen(0, y);
+            ctx.moveTo(0, py);
+            ctx.lineTo(width, py);
+        }
+        ctx.stroke();
+    }
+
+    function drawTerritories(tile) {
+        const [minX, minY, maxX, maxY] = tile.bbox;
+        // Edges the server cut along the tile border belong to no territory outline
+        const onBorder = (a, b) => (a[0] === b[0] && (a[0] === minX || a[0] === maxX))
+            || (a[1] === b[1] && (a[1] === minY || a[1] === maxY));
+        ctx.lineWidth = 2;
+        for (const territory of tile.territories) {
+            ctx.fillStyle = `${territory.color}40`;
+            ctx.strokeStyle = territory.color;
+            for (const polygon of territory.polygons) {
+                ctx.beginPath();
+                polygon.forEach(([x, y], i) => {
+                    const [px, py] = toScreen(x, y);
+                    if (i) ctx.lineTo(px, py); else ctx.moveTo(px, py);
+                });
+                ctx.closePath();
+                ctx.fill();
+                ctx.beginPath();
+                polygon.forEach((point, i) => {
+                    const next = polygon[(i + 1) % polygon.length];
+                    if (onBorder(point, next)) return;
+                    ctx.moveTo(...toScreen(...point));
+                    ctx.lineTo(...toScreen(...next));
+                });
+                ctx.stroke();
+            }
+        }
+    }
+
+    function drawHotspots() {
+        if (!hotspotsEl.checked) return;
+        const strongest = Math.max(1, ...hotspots.map(hotspot => hotspot.score));
+        ctx.lineWidth = 1;
+        ctx.setLineDash([4, 3]);
+        ctx.strokeStyle = '#e74c3c';
+        for (const hotspot of hotspots) {
+            ctx.beginPath();
+            hotspot.polygon.forEach(([x, y], i) => {
+                const [px, py] = toScreen(x, y);
+                if (i) ctx.lineTo(px, py); else ctx.moveTo(px, py);
+            });
+            ctx.closePath();
+            ctx.fillStyle = `rgba(231, 76, 60, ${(0.15 + 0.35 * hotspot.score / strongest).toFixed(2)})`;
+            ctx.fill();
+            ctx.stroke();
+        }
+        ctx.setLineDash([]);
+    }
+
+    function drawIncidents(tile) {
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'middle';
+        ctx.font = '600 11px sans-serif';
+        for (const cluster of tile.clusters) {
+            const [px, py] = toScreen(cluster.x, cluster.y);
+            ctx.beginPath();
+            ctx.arc(px, py, 10 + 3 * Math.log2(cluster.count), 0, 2 * Math.PI);
+            ctx.fillStyle = 'rgba(0, 212, 255, 0.35)';
+            ctx.fill();
+            ctx.strokeStyle = '#00d4ff';
+            ctx.stroke();
+            ctx.fillStyle = '#ecf0f1';
+            ctx.fillText(cluster.count, px, py);
+        }
+        for (const incident of tile.incidents) {
+            const [px, py] = toScreen(incident.x, incident.y);
+            ctx.beginPath();
+            ctx.arc(px, py, 5, 0, 2 * Math.PI);
+            ctx.fillStyle = SEVERITY_COLORS[incident.severity] || '#95a5a6';
+            ctx.fill();
+        }
+    }
+
+    function draw() {
+        const width = canvas.clientWidth;
+        const height = canvas.clientHeight;
+        ctx.clearRect(0, 0, width, height);
+        drawGrid(width, height);
+        const loaded = visibleTiles().map(key => tiles.get(key)).filter(Boolean);
+        loaded.forEach(drawTerritories);
+        drawHotspots();
+        loaded.forEach(drawIncidents);
+
+        const total = loaded.reduce(
+            (sum, tile) => sum + tile.incidents.length + tile.clusters.reduce((n, cluster) => n + cluster.count, 0), 0
+        );
+        statusEl.textContent = `${total} incident${total === 1 ? '' : 's'} in view`;
+    }
+
+    function renderInfo(data) {
+        infoEl.replaceChildren();
+        const sections = [
+            ['Inside territory of', data.inside.map(gang => `${gang.name} (${gang.tag})`)],
+            ['Territories within ' + data.radius + ' m', data.nearby_territories.map(
+                gang => `${gang.name} (${gang.tag}) — ${gang.distance} m`
+            )],
+            ['Incidents within ' + data.radius + ' m', data.incidents.map(
+                incident => `${incident.title} [${incident.severity}] — ${incident.distance} m`
+            )],
+        ];
+        const heading = document.createElement('h3');
+        heading.textContent = `Point ${data.x.toFixed(0)}, ${data.y.toFixed(0)}`;
+        infoEl.appendChild(heading);
+        for (const [title, lines] of sections) {
+            const label = document.createElement('strong');
+            label.textContent = title;
+            const list = document.createElement('ul');
+            for (const line of lines.length ? lines : ['None']) {
+                const item = document.createElement('li');
+                item.textContent = line;
+                list.appendChild(item);
+            }
+            infoEl.append(label, list);
+        }
+    }
+
+    // -- interaction -------------------------------------------------------
+
+    canvas.addEventListener('mousedown', (e) => {
+        drag = {x: e.clientX, y: e.clientY, moved: false};
+        canvas.classList.add('dragging');
+    });
+
+    window.addEventListener('mousemove', (e) => {
+        if (!drag) return;
+        const dx = e.clientX - drag.x;
+        const dy = e.clientY - drag.y;
+        if (Math.abs(dx) + Math.abs(dy) > 2) drag.moved = true;
+        view.x -= dx * view.scale;
+        view.y += dy * view.scale;
+        drag.x = e.clientX;
+        drag.y = e.clientY;
+        draw();
+    });
+
+    window.addEventListener('mouseup', (e) => {
+        if (!drag) return;
+        const moved = drag.moved;
+        drag = null;
+        canvas.classList.remove('dragging');
+        if (moved) {
+            scheduleLoad();
+        } else if (e.target === canvas) {
+            lookup(...eventPoint(e));
+        }
+    });
+
+    canvas.addEventListener('wheel', (e) => {
+        e.preventDefault();
+        const [px, py] = eventPoint(e);
+        const [beforeX, beforeY] = toWorld(px, py);
+        view.scale = Math.min(Math.max(view.scale * (e.deltaY < 0 ? 0.8 : 1.25), 0.05), 50);
+        // Keep the point under the cursor in place
+        const [afterX, afterY] = toWorld(px, py);
+        view.x += beforeX - afterX;
+        view.y += beforeY - afterY;
+        draw();
+        scheduleLoad();
+    }, {passive: false});
+
+    window.addEventListener('resize', () => {
+        resize();
+        draw();
+        scheduleLoad();
+    });
+
+    severityEl.addEventListener('change', () => {
+        draw();
+        loadTiles();
+    });
+    hotspotsEl.addEventListener('change', draw);
+
+    document.getElementById('mapReset').addEventListener('click', () => {
+        tiles.clear();
+        resetView();
+        draw();
+        loadTiles();
+    });
+
+    resize();
+    resetView();
+    draw();
+    loadTiles();
+    getJSON(frame.dataset.hotspotsUrl)
+        .then((data) => {
+            hotspots = data.hotspots;
+            draw();
+        })
+        .catch(() => {
+            statusEl.textContent = 'Could not load hotspots';
+        });
+})();
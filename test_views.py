@@ -6,19 +6,19 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sa_doj.settings')
 django.setup()
 
 from intelligence.models import Gang, GangMember, Incident, CaseFile
-from django.db.models import Count
 
 print("=== TESTING VIEW QUERIES ===")
 
 # Test gang_intelligence query
 print("\n1. Gang Intelligence Query:")
-gangs = Gang.objects.filter(is_active=True).annotate(
-    incident_count=Count('incidents')
-).order_by('-threat_level', '-incident_count')
+gangs = Gang.objects.filter(is_active=True).select_related('stats').order_by(
+    '-threat_rank', '-stats__incident_count'
+)
 print(f"   Found {gangs.count()} active gangs")
 if gangs.exists():
     for g in gangs[:3]:
-        print(f"   - {g.name} (active={g.is_active}, incidents={g.incident_count})")
+        incident_count = g.stats.incident_count if hasattr(g, 'stats') else 'n/a'
+        print(f"   - {g.name} (active={g.is_active}, incidents={incident_count})")
 
 # Test member_profiles query
 print("\n2. Member Profiles Query:")